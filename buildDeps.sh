@@ -21,7 +21,8 @@ tar -xzf cfitsio.tar.gz
 rm cfitsio.tar.gz
 
 cd cfitsio-3.48
-./configure --prefix=`pwd`/../build --disable-curl
+# Reentrant so FITSReader can read from multiple handles concurrently
+./configure --prefix=`pwd`/../build --disable-curl --enable-reentrant
 make install -j 4
 
 cd ..
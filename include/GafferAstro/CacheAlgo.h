@@ -0,0 +1,79 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+#pragma once
+
+#include "GafferAstro/Export.h"
+
+#include "IECore/CompoundData.h"
+
+#include <string>
+
+namespace GafferAstro
+{
+
+/// Functions for monitoring and tuning the caches used by the readers
+/// (open files, parsed headers etc). Caches are identified by name, and
+/// are only registered once they are first used.
+namespace CacheAlgo
+{
+
+enum EvictionPolicy
+{
+	/// Evicts the least recently used entry.
+	LRU,
+	/// Evicts large entries in preference to small ones, while still
+	/// ageing out entries that are no longer used. This is the
+	/// "GreedyDual-Size" algorithm, and maximises hit rate for caches
+	/// with widely varying costs.
+	CostWeighted
+};
+
+/// Returns a CompoundData containing the statistics for each cache,
+/// keyed by name. Each contains the number of "hits", "misses" and
+/// "evictions", the number of "entries", the "currentCost" and
+/// "maxCost" and the "evictionPolicy".
+GAFFERASTRO_API IECore::CompoundDataPtr statistics();
+/// Resets the hit, miss and eviction counts of all caches.
+GAFFERASTRO_API void resetStatistics();
+
+/// Sets the eviction policy for the named cache. The policy may be set
+/// before the cache is first used. Changing the policy of a cache clears it.
+GAFFERASTRO_API void setEvictionPolicy( const std::string &cacheName, EvictionPolicy policy );
+GAFFERASTRO_API EvictionPolicy getEvictionPolicy( const std::string &cacheName );
+
+} // namespace CacheAlgo
+
+} // namespace GafferAstro
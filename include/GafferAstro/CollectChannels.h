@@ -42,6 +42,9 @@
 #include "GafferImage/ImageProcessor.h"
 
 #include "Gaffer/StringPlug.h"
+#include "Gaffer/TypedObjectPlug.h"
+
+#include "IECore/CompoundObject.h"
 
 namespace GafferAstro
 {
@@ -69,6 +72,11 @@ class GAFFERASTRO_API CollectChannels : public GafferImage::ImageProcessor
 
 	protected :
 
+		void hash( const Gaffer::ValuePlug *output, const Gaffer::Context *context, IECore::MurmurHash &h ) const override;
+		void compute( Gaffer::ValuePlug *output, const Gaffer::Context *context ) const override;
+		Gaffer::ValuePlug::CachePolicy hashCachePolicy( const Gaffer::ValuePlug *output ) const override;
+		Gaffer::ValuePlug::CachePolicy computeCachePolicy( const Gaffer::ValuePlug *output ) const override;
+
 		void hashFormat( const GafferImage::ImagePlug *parent, const Gaffer::Context *context, IECore::MurmurHash &h ) const override;
 		GafferImage::Format computeFormat( const Gaffer::Context *context, const GafferImage::ImagePlug *parent ) const override;
 
@@ -92,6 +100,14 @@ class GAFFERASTRO_API CollectChannels : public GafferImage::ImageProcessor
 
 	private :
 
+		// Maps each output channel to its source channel, so that
+		// per-tile computes don't need to resolve it again.
+		Gaffer::ObjectPlug *channelMapPlug();
+		const Gaffer::ObjectPlug *channelMapPlug() const;
+
+		void hashChannelMap( const Gaffer::Context *context, IECore::MurmurHash &h ) const;
+		IECore::ConstCompoundObjectPtr computeChannelMap( const Gaffer::Context *context ) const;
+
 		static size_t g_firstPlugIndex;
 
 };
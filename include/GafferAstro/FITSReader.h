@@ -43,6 +43,7 @@
 
 #include "Gaffer/StringPlug.h"
 #include "Gaffer/NumericPlug.h"
+#include "Gaffer/TypedPlug.h"
 
 
 namespace GafferAstro
@@ -63,10 +64,33 @@ class GAFFERASTRO_API FITSReader : public GafferImage::FlatImageSource
 		Gaffer::IntPlug *refreshCountPlug();
 		const Gaffer::IntPlug *refreshCountPlug() const;
 
+		/// When on, integer data is scaled so the largest
+		/// representable value maps to 1.
+		Gaffer::BoolPlug *normalizePlug();
+		const Gaffer::BoolPlug *normalizePlug() const;
+
+		/// The index of the HDU to read, or -1 to read
+		/// the first HDU containing an image.
+		Gaffer::IntPlug *hduPlug();
+		const Gaffer::IntPlug *hduPlug() const;
+
+		/// When greater than 0, a reduced resolution preview is output,
+		/// halving the size of the image for each level. Previews are
+		/// generated once per file, and cached in memory.
+		Gaffer::IntPlug *mipLevelPlug();
+		const Gaffer::IntPlug *mipLevelPlug() const;
+
 		void affects( const Gaffer::Plug *input, AffectedPlugsContainer &outputs ) const override;
 
+		static void setOpenFilesLimit( size_t maxOpenFiles );
+		static size_t getOpenFilesLimit();
+
 	protected :
 
+		void hash( const Gaffer::ValuePlug *output, const Gaffer::Context *context, IECore::MurmurHash &h ) const override;
+		void compute( Gaffer::ValuePlug *output, const Gaffer::Context *context ) const override;
+		Gaffer::ValuePlug::CachePolicy computeCachePolicy( const Gaffer::ValuePlug *output ) const override;
+
 		void hashFormat( const GafferImage::ImagePlug *parent, const Gaffer::Context *context, IECore::MurmurHash &h ) const override;
 		void hashDataWindow( const GafferImage::ImagePlug *parent, const Gaffer::Context *context, IECore::MurmurHash &h ) const override;
 		void hashMetadata( const GafferImage::ImagePlug *parent, const Gaffer::Context *context, IECore::MurmurHash &h ) const override;
@@ -81,8 +105,13 @@ class GAFFERASTRO_API FITSReader : public GafferImage::FlatImageSource
 
 	private :
 
+		Gaffer::ObjectVectorPlug *tileBatchPlug();
+		const Gaffer::ObjectVectorPlug *tileBatchPlug() const;
+
 		void hashFileName( const Gaffer::Context *context, IECore::MurmurHash &h ) const;
 
+		void plugSet( Gaffer::Plug *plug );
+
 		static size_t g_firstPlugIndex;
 };
 
@@ -0,0 +1,100 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#pragma once
+
+#include "GafferAstro/Export.h"
+#include "GafferAstro/TypeIds.h"
+
+#include "GafferDispatch/TaskNode.h"
+
+#include "GafferImage/ImagePlug.h"
+
+#include "Gaffer/StringPlug.h"
+
+namespace GafferAstro
+{
+
+/// Writes images to the primary HDU of a FITS file. Single channel images
+/// are written as two dimensional images, and multiple channels as a cube
+/// with one plane per channel. Tiles are computed in parallel ahead of the
+/// write, but only a single row of tiles is held at any time, so large
+/// images can be written without computing them in full.
+class GAFFERASTRO_API FITSWriter : public GafferDispatch::TaskNode
+{
+
+	public :
+
+		FITSWriter( const std::string &name=defaultName<FITSWriter>() );
+		~FITSWriter() override;
+
+		GAFFER_NODE_DECLARE_TYPE( GafferAstro::FITSWriter, FITSWriterTypeId, GafferDispatch::TaskNode );
+
+		GafferImage::ImagePlug *inPlug();
+		const GafferImage::ImagePlug *inPlug() const;
+
+		Gaffer::StringPlug *fileNamePlug();
+		const Gaffer::StringPlug *fileNamePlug() const;
+
+		/// The names of the channels to write, matched using
+		/// `StringAlgo::matchMultiple()`.
+		Gaffer::StringPlug *channelsPlug();
+		const Gaffer::StringPlug *channelsPlug() const;
+
+		/// Either "float", to write 32 bit floating point data, or
+		/// "uint16", to write unsigned 16 bit data (stored with a
+		/// BZERO of 32768), mapping 0-1 to the full range.
+		Gaffer::StringPlug *dataTypePlug();
+		const Gaffer::StringPlug *dataTypePlug() const;
+
+		/// A direct pass-through of the input image.
+		GafferImage::ImagePlug *outPlug();
+		const GafferImage::ImagePlug *outPlug() const;
+
+	protected :
+
+		IECore::MurmurHash hash( const Gaffer::Context *context ) const override;
+		void execute() const override;
+
+	private :
+
+		static size_t g_firstPlugIndex;
+
+};
+
+IE_CORE_DECLAREPTR( FITSWriter )
+
+} // namespace GafferAstro
@@ -0,0 +1,195 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+#pragma once
+
+#include "GafferAstro/CacheAlgo.h"
+#include "GafferAstro/Export.h"
+
+#include "boost/noncopyable.hpp"
+
+#include <atomic>
+#include <condition_variable>
+#include <cstdint>
+#include <functional>
+#include <map>
+#include <mutex>
+#include <set>
+#include <string>
+
+namespace GafferAstro
+{
+
+namespace Private
+{
+
+/// Base class for caches, providing the statistics and settings that
+/// are independent of the key and value types. All caches register
+/// themselves by name, so they can be monitored and tuned via CacheAlgo.
+class GAFFERASTRO_API CacheBase : boost::noncopyable
+{
+
+	public :
+
+		typedef size_t Cost;
+
+		struct Statistics
+		{
+			uint64_t hits;
+			uint64_t misses;
+			uint64_t evictions;
+			size_t entries;
+			Cost currentCost;
+			Cost maxCost;
+		};
+
+		const std::string &name() const;
+
+		void setMaxCost( Cost maxCost );
+		Cost getMaxCost() const;
+
+		/// Changing the policy clears the cache.
+		void setEvictionPolicy( CacheAlgo::EvictionPolicy policy );
+		CacheAlgo::EvictionPolicy getEvictionPolicy() const;
+
+		virtual void clear() = 0;
+
+		Statistics statistics() const;
+		void resetStatistics();
+
+		/// Calls `f( cache )` for every registered cache.
+		static void forEach( const std::function<void ( CacheBase *cache )> &f );
+		/// Returns the registered cache with the specified name, or nullptr.
+		static CacheBase *find( const std::string &name );
+
+	protected :
+
+		CacheBase( const std::string &name, Cost maxCost );
+		virtual ~CacheBase();
+
+		/// Must be implemented to return the number of entries and the
+		/// total cost of the entries.
+		virtual void usage( size_t &entries, Cost &currentCost ) const = 0;
+		/// Must be implemented to evict entries until the total cost
+		/// is no greater than `getMaxCost()`.
+		virtual void limitCost() = 0;
+
+		std::atomic<uint64_t> m_hits;
+		std::atomic<uint64_t> m_misses;
+		std::atomic<uint64_t> m_evictions;
+
+	private :
+
+		const std::string m_name;
+		std::atomic<Cost> m_maxCost;
+		std::atomic<CacheAlgo::EvictionPolicy> m_evictionPolicy;
+
+};
+
+/// A thread-safe cache which computes values on demand using a getter
+/// function, evicting values when their total cost exceeds a limit.
+/// Concurrent requests for the same key are computed only once, with
+/// other threads waiting for the result. Exceptions thrown by the getter
+/// are propagated to all waiting threads, but are not cached. Values still
+/// being computed when the cache is cleared are returned to the threads
+/// that requested them, but are not cached.
+///
+/// Since waiting threads block, the getter should not spawn TBB tasks
+/// which might wait on the cache themselves.
+///
+/// An alternative GetterKey may be used to pass additional information
+/// to the getter, provided it is implicitly convertible to Key.
+template<typename Key, typename Value, typename GetterKey = Key>
+class Cache : public CacheBase
+{
+
+	public :
+
+		typedef std::function<Value ( const GetterKey &key, Cost &cost )> GetterFunction;
+
+		Cache( const std::string &name, GetterFunction getter, Cost maxCost );
+		~Cache() override;
+
+		/// Returns the cached value for `key`, computing it if necessary.
+		Value get( const GetterKey &key );
+
+		void clear() override;
+
+	protected :
+
+		void usage( size_t &entries, Cost &currentCost ) const override;
+		void limitCost() override;
+
+	private :
+
+		typedef std::pair<double, Key> QueueEntry;
+
+		struct Entry
+		{
+			bool pending = true;
+			Value value = Value();
+			Cost cost = 0;
+			// Entries are evicted in order of increasing priority.
+			double priority = 0;
+		};
+
+		typedef std::map<Key, Entry> Entries;
+
+		void touch( const Key &key, Entry &entry );
+		// Moves evicted entries into `evicted`, so that the caller
+		// can destroy them after releasing the lock.
+		void limitCostInternal( Entries &evicted );
+
+		GetterFunction m_getter;
+
+		mutable std::mutex m_mutex;
+		std::condition_variable m_pendingDone;
+		Entries m_entries;
+		std::set<QueueEntry> m_queue;
+		Cost m_currentCost;
+		// For LRU, incremented on every use. For CostWeighted, the "inflation"
+		// value, set to the priority of the last evicted entry.
+		double m_clock;
+		// Incremented by `clear()`, so that values computed
+		// from stale data aren't cached.
+		uint64_t m_generation;
+
+};
+
+} // namespace Private
+
+} // namespace GafferAstro
+
+#include "GafferAstro/Private/Cache.inl"
@@ -0,0 +1,221 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+#pragma once
+
+#include <algorithm>
+
+namespace GafferAstro
+{
+
+namespace Private
+{
+
+template<typename Key, typename Value, typename GetterKey>
+Cache<Key, Value, GetterKey>::Cache( const std::string &name, GetterFunction getter, Cost maxCost )
+	:	CacheBase( name, maxCost ), m_getter( getter ), m_currentCost( 0 ), m_clock( 0 ), m_generation( 0 )
+{
+}
+
+template<typename Key, typename Value, typename GetterKey>
+Cache<Key, Value, GetterKey>::~Cache()
+{
+}
+
+template<typename Key, typename Value, typename GetterKey>
+Value Cache<Key, Value, GetterKey>::get( const GetterKey &getterKey )
+{
+	const Key &key = getterKey;
+
+	// Evicted values are destroyed after the lock is released, as
+	// destroying them may be expensive (closing files etc).
+	Entries evicted;
+
+	std::unique_lock<std::mutex> lock( m_mutex );
+	while( true )
+	{
+		auto it = m_entries.find( key );
+		if( it == m_entries.end() )
+		{
+			break;
+		}
+
+		if( it->second.pending )
+		{
+			// Another thread is computing the value. Wait for it, and then
+			// look again, since it may have failed or been evicted.
+			m_pendingDone.wait( lock );
+			continue;
+		}
+
+		m_hits++;
+		touch( key, it->second );
+		return it->second.value;
+	}
+
+	// Insert a pending entry, so other threads know to wait
+	// for us, and compute the value outside the lock.
+
+	m_misses++;
+	m_entries[key];
+	const uint64_t generation = m_generation;
+	lock.unlock();
+
+	Value value;
+	Cost cost = 0;
+	try
+	{
+		value = m_getter( getterKey, cost );
+	}
+	catch( ... )
+	{
+		lock.lock();
+		if( generation == m_generation )
+		{
+			m_entries.erase( key );
+		}
+		lock.unlock();
+		m_pendingDone.notify_all();
+		throw;
+	}
+
+	lock.lock();
+
+	if( generation != m_generation )
+	{
+		// The cache was cleared while we were computing, so the value may
+		// be stale. Our entry has already been removed, and any entry for
+		// the key now belongs to another thread, so we return the value
+		// without caching it.
+	}
+	else if( cost > getMaxCost() )
+	{
+		// Too big to cache.
+		m_entries.erase( key );
+	}
+	else
+	{
+		Entry &entry = m_entries[key];
+		entry.pending = false;
+		entry.value = value;
+		entry.cost = cost;
+		m_currentCost += cost;
+		touch( key, entry );
+		limitCostInternal( evicted );
+	}
+
+	lock.unlock();
+	m_pendingDone.notify_all();
+
+	return value;
+}
+
+template<typename Key, typename Value, typename GetterKey>
+void Cache<Key, Value, GetterKey>::clear()
+{
+	// Values are destroyed outside the lock, as destroying
+	// them may be expensive (closing files etc).
+	Entries entries;
+	{
+		std::lock_guard<std::mutex> lock( m_mutex );
+		// Pending entries are removed too, and the new generation stops
+		// their getters caching values computed from stale data. Threads
+		// waiting on them will compute the values again.
+		entries.swap( m_entries );
+		m_generation++;
+		m_queue.clear();
+		m_currentCost = 0;
+		m_clock = 0;
+	}
+	m_pendingDone.notify_all();
+}
+
+template<typename Key, typename Value, typename GetterKey>
+void Cache<Key, Value, GetterKey>::usage( size_t &entries, Cost &currentCost ) const
+{
+	std::lock_guard<std::mutex> lock( m_mutex );
+	entries = m_queue.size();
+	currentCost = m_currentCost;
+}
+
+template<typename Key, typename Value, typename GetterKey>
+void Cache<Key, Value, GetterKey>::limitCost()
+{
+	Entries evicted;
+	std::lock_guard<std::mutex> lock( m_mutex );
+	limitCostInternal( evicted );
+}
+
+template<typename Key, typename Value, typename GetterKey>
+void Cache<Key, Value, GetterKey>::touch( const Key &key, Entry &entry )
+{
+	m_queue.erase( QueueEntry( entry.priority, key ) );
+
+	if( getEvictionPolicy() == CacheAlgo::CostWeighted )
+	{
+		entry.priority = m_clock + 1.0 / std::max<Cost>( entry.cost, 1 );
+	}
+	else
+	{
+		entry.priority = ++m_clock;
+	}
+
+	m_queue.insert( QueueEntry( entry.priority, key ) );
+}
+
+template<typename Key, typename Value, typename GetterKey>
+void Cache<Key, Value, GetterKey>::limitCostInternal( Entries &evicted )
+{
+	const Cost maxCost = getMaxCost();
+	while( m_currentCost > maxCost && !m_queue.empty() )
+	{
+		const QueueEntry queueEntry = *m_queue.begin();
+		m_queue.erase( m_queue.begin() );
+
+		auto it = m_entries.find( queueEntry.second );
+		m_currentCost -= it->second.cost;
+		evicted.insert( m_entries.extract( it ) );
+		m_evictions++;
+
+		if( getEvictionPolicy() == CacheAlgo::CostWeighted )
+		{
+			m_clock = queueEntry.first;
+		}
+	}
+}
+
+} // namespace Private
+
+} // namespace GafferAstro
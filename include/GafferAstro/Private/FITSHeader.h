@@ -0,0 +1,163 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#pragma once
+
+#include "GafferAstro/Export.h"
+
+#include "IECore/CompoundData.h"
+#include "IECore/RefCounted.h"
+
+#include <iosfwd>
+#include <string>
+#include <vector>
+
+namespace GafferAstro
+{
+
+namespace Private
+{
+
+/// A lightweight parser for FITS headers. This allows simple queries
+/// (dimensions, data type etc.) to be answered without the overhead
+/// of opening the file via cfitsio.
+class GAFFERASTRO_API FITSHeader : public IECore::RefCounted
+{
+
+	public :
+
+		IE_CORE_DECLAREMEMBERPTR( FITSHeader );
+
+		struct Card
+		{
+			enum Type
+			{
+				None,
+				String,
+				Logical,
+				Integer,
+				Float
+			};
+
+			std::string keyword;
+			/// The value, with any quotes and trailing
+			/// whitespace removed from strings.
+			std::string value;
+			std::string comment;
+			Type type;
+		};
+
+		/// Parses a header from `stream`, which must be positioned at the start
+		/// of an HDU. Reads whole 2880 byte blocks up to and including the one
+		/// containing the END card. Throws if the header is invalid.
+		FITSHeader( std::istream &stream, int hdu = 0 );
+		~FITSHeader() override;
+
+		const std::vector<Card> &cards() const;
+
+		/// Returns the first card with the specified keyword,
+		/// or nullptr if there is no such card.
+		const Card *card( const std::string &keyword ) const;
+
+		long long intValue( const std::string &keyword, long long defaultValue = 0 ) const;
+		double floatValue( const std::string &keyword, double defaultValue = 0.0 ) const;
+
+		/// Returns the values of all non-structural cards, converted to the
+		/// equivalent IECore::Data type. COMMENT and HISTORY cards are joined
+		/// into single newline separated strings. This is computed when the
+		/// header is parsed, so is cheap to call.
+		const IECore::CompoundData *metadata() const;
+
+		/// Returns a card for a keyword whose value and comment are stored
+		/// separately, as in the FITSKeyword elements of XISF files. The value
+		/// should be formatted as it would be in a header, with strings quoted.
+		static Card makeCard( const std::string &keyword, const std::string &value, const std::string &comment = "" );
+		/// Converts cards to metadata, in the same way as `metadata()`.
+		static IECore::CompoundDataPtr cardsMetadata( const std::vector<Card> &cards );
+		/// Returns true if `keyword` describes the structure of the HDU rather
+		/// than its contents. Such keywords are omitted from `metadata()`.
+		static bool isStructuralKeyword( const std::string &keyword );
+
+		/// The zero-based index of the HDU within the file.
+		int hdu() const;
+
+		/// Returns true if the HDU contains an image with at least two axes.
+		bool isImage() const;
+
+		/// Returns true if the HDU contains a tile compressed image, stored
+		/// in a binary table as written by `fpack`.
+		bool isCompressed() const;
+
+		/// As for `intValue()`, but for compressed images returns the value of
+		/// the equivalent `Z` prefixed keyword (ZBITPIX, ZNAXISn etc), which
+		/// describes the uncompressed image rather than the binary table.
+		long long imageIntValue( const std::string &keyword, long long defaultValue = 0 ) const;
+
+		/// The offset of the header within the file.
+		size_t offset() const;
+		/// The size of the header in the file, including padding.
+		size_t size() const;
+		/// The offset of the HDU's data unit within the file.
+		size_t dataOffset() const;
+		/// The size of the data unit in the file, including padding.
+		size_t dataSize() const;
+
+		/// Returns the header of the specified HDU in the file, or the first HDU
+		/// containing an image if `hdu` is -1. Headers are cached, keyed on the
+		/// file's path and modification time, so this is cheap to call repeatedly.
+		static ConstPtr read( const std::string &fileName, int hdu = -1 );
+		static void clearCache();
+
+		/// Returns the key used to cache the file's headers, built from its path,
+		/// modification time and size. Other caches of data read from the file
+		/// should use it too, so that they stay consistent with the headers.
+		static std::string fileKey( const std::string &fileName );
+
+	private :
+
+		std::vector<Card> m_cards;
+		IECore::CompoundDataPtr m_metadata;
+		int m_hdu;
+		size_t m_offset;
+		size_t m_size;
+
+};
+
+IE_CORE_DECLAREPTR( FITSHeader );
+
+} // namespace Private
+
+} // namespace GafferAstro
@@ -0,0 +1,105 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#pragma once
+
+#include "GafferAstro/Export.h"
+
+#include "IECore/VectorTypedData.h"
+
+#include "OpenEXR/ImathVec.h"
+
+#include <functional>
+#include <memory>
+#include <string>
+#include <vector>
+
+namespace GafferAstro
+{
+
+namespace Private
+{
+
+/// Reduced resolution copies of image planes, used by the readers to
+/// provide fast previews of large images. Each level of the pyramid is
+/// half the size of the level below it, where level 0 is the original
+/// plane. Levels are generated from the level below with a box filter,
+/// and are cached in memory, so each is generated once per version of
+/// a file.
+namespace MipPyramid
+{
+
+/// Returns the size of `level` of the pyramid for a plane of the
+/// specified size.
+GAFFERASTRO_API Imath::V2i levelSize( const Imath::V2i &size, int level );
+
+/// A single level of the pyramid for a single plane, with rows
+/// stored bottom to top.
+struct Level
+{
+	Imath::V2i size;
+	std::vector<float> data;
+};
+
+typedef std::shared_ptr<const Level> ConstLevelPtr;
+
+/// Must be implemented to read rows `[ minY, maxY )` of the original
+/// plane, numbered bottom to top, into `dst`. Will be called concurrently
+/// for different rows.
+typedef std::function<void ( int minY, int maxY, float *dst )> RowReader;
+
+/// Returns a key for the file, including its modification time, so
+/// that levels are regenerated when the file changes.
+GAFFERASTRO_API std::string fileKey( const std::string &fileName );
+
+/// Returns `level` of the pyramid for the plane identified by `planeKey`,
+/// which should be built from `fileKey()`. The level and any levels below
+/// it are generated if necessary, reading the original plane of the
+/// specified size using `rowReader`. Level must be at least 1.
+GAFFERASTRO_API ConstLevelPtr level( const std::string &planeKey, const Imath::V2i &size, int level, const RowReader &rowReader );
+
+/// Returns the tile with the specified origin from `level`. Pixels
+/// outside the level are black.
+GAFFERASTRO_API IECore::ConstFloatVectorDataPtr tile( const Level &level, const Imath::V2i &tileOrigin );
+
+/// Removes all levels from the cache.
+GAFFERASTRO_API void clearCache();
+
+} // namespace MipPyramid
+
+} // namespace Private
+
+} // namespace GafferAstro
@@ -0,0 +1,79 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#pragma once
+
+#include "GafferAstro/Private/XISFHeader.h"
+
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace GafferAstro
+{
+
+namespace Private
+{
+
+/// Compression and decompression of XISF data blocks. Blocks are split
+/// into sub-blocks which are processed in parallel, rather than serially
+/// as in PCL.
+namespace XISFCompression
+{
+
+/// Returns true if `codec` is one of "zlib", "lz4", "lz4hc" or "zstd".
+GAFFERASTRO_API bool isSupported( const std::string &codec );
+
+/// Decompresses the data block of `image` from `src` into `dst`, which
+/// must hold `image.uncompressedSize` bytes. Throws if the block can't
+/// be decompressed.
+GAFFERASTRO_API void decompress( const XISFHeader::Image &image, const char *src, char *dst );
+
+/// Compresses `size` bytes of `data` with `codec`, byte shuffling items of
+/// `itemSize` bytes first if `itemSize` is greater than 1. The data is split
+/// into sub-blocks of at most `subblockSize` bytes, whose compressed and
+/// uncompressed sizes are returned in `subblocks`. Returns false, leaving
+/// `result` empty, if the data can't be compressed.
+GAFFERASTRO_API bool compress(
+	const std::string &codec, const char *data, size_t size, size_t itemSize, size_t subblockSize,
+	std::vector<char> &result, std::vector<std::pair<size_t, size_t>> &subblocks
+);
+
+} // namespace XISFCompression
+
+} // namespace Private
+
+} // namespace GafferAstro
@@ -0,0 +1,149 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+#pragma once
+
+#include "GafferAstro/Export.h"
+
+#include "IECore/CompoundData.h"
+#include "IECore/RefCounted.h"
+
+#include <iosfwd>
+#include <string>
+#include <utility>
+#include <vector>
+
+namespace GafferAstro
+{
+
+namespace Private
+{
+
+/// A lightweight parser for the XML header of monolithic XISF files. This
+/// provides the location and layout of each image's data block, allowing
+/// uncompressed data to be read without going through PCL, along with the
+/// properties and FITS keywords describing the images.
+class GAFFERASTRO_API XISFHeader : public IECore::RefCounted
+{
+
+	public :
+
+		IE_CORE_DECLAREMEMBERPTR( XISFHeader );
+
+		struct Image
+		{
+			/// The optional `id` attribute.
+			std::string id;
+
+			int width;
+			int height;
+			int numChannels;
+
+			/// Attribute values, as they appear in the file. Optional
+			/// attributes that are omitted are empty.
+			std::string sampleFormat;
+			std::string pixelStorage;
+			std::string byteOrder;
+			std::string compression;
+
+			/// The components of `compression`, which has the form
+			/// `codec[+sh]:uncompressedSize[:itemSize]`. The codec is
+			/// empty if the data block is not compressed.
+			std::string codec;
+			bool byteShuffled;
+			size_t uncompressedSize;
+			size_t itemSize;
+
+			/// The compressed and uncompressed sizes of each sub-block of
+			/// a compressed data block, which may be decompressed
+			/// independently. A block that is compressed as a whole has a
+			/// single sub-block.
+			std::vector<std::pair<size_t, size_t>> subblocks;
+
+			/// True if the data block is an attachment, in which
+			/// case `dataOffset` and `dataSize` give its location
+			/// within the file.
+			bool attached;
+			size_t dataOffset;
+			size_t dataSize;
+
+			/// The size of a single sample in bytes, or 0 if
+			/// `sampleFormat` is not recognised.
+			size_t sampleSize() const;
+
+			/// Returns true if the image is stored as a single uncompressed,
+			/// planar, little endian attachment, which may be read directly
+			/// from the file.
+			bool isRawAttachment() const;
+
+			/// Returns true if the image is stored as a single compressed,
+			/// planar, little endian attachment, whose sub-blocks account for
+			/// the whole of the data block and decompress to the whole image.
+			bool isCompressedAttachment() const;
+
+			/// The image's FITS keywords, converted as for FITSHeader, followed
+			/// by its XISF properties, keyed by property id. Properties take
+			/// precedence over keywords of the same name. Any ICC profile is
+			/// included as UCharVectorData named "XISF:ICCProfile".
+			IECore::ConstCompoundDataPtr metadata;
+		};
+
+		/// Parses a header from `stream`, which must be positioned at the start
+		/// of the file. Throws if the file is not a valid monolithic XISF file.
+		XISFHeader( std::istream &stream );
+		~XISFHeader() override;
+
+		const std::vector<Image> &images() const;
+
+		/// The XISF properties in the file's Metadata element, which describe
+		/// the file as a whole (creation time, creator application etc).
+		const IECore::CompoundData *metadata() const;
+
+		/// The size of the header in the file, including the signature.
+		size_t size() const;
+
+	private :
+
+		std::vector<Image> m_images;
+		IECore::CompoundDataPtr m_metadata;
+		size_t m_size;
+
+};
+
+IE_CORE_DECLAREPTR( XISFHeader );
+
+} // namespace Private
+
+} // namespace GafferAstro
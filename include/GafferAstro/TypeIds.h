@@ -47,6 +47,8 @@ enum TypeId
 	XISFReaderTypeId = 400103,
 	CollectChannelsTypeId = 400104,
 	HueSaturationTypeId = 400105,
+	FITSWriterTypeId = 400106,
+	XISFWriterTypeId = 400107,
 
 	LastTypeId = 400199
 };
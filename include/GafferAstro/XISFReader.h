@@ -46,6 +46,8 @@
 #include "Gaffer/StringPlug.h"
 #include "Gaffer/NumericPlug.h"
 
+#include "IECore/CompoundData.h"
+
 namespace GafferAstro
 {
 
@@ -76,13 +78,42 @@ class GAFFERASTRO_API XISFReader : public GafferImage::FlatImageSource
 		Gaffer::IntPlug *missingFrameModePlug();
 		const Gaffer::IntPlug *missingFrameModePlug() const;
 
+		/// When greater than 0, a reduced resolution preview is output,
+		/// halving the size of the image for each level. Previews are
+		/// generated once per file, and cached in memory.
+		Gaffer::IntPlug *mipLevelPlug();
+		const Gaffer::IntPlug *mipLevelPlug() const;
+
 		Gaffer::IntVectorDataPlug *availableFramesPlug();
 		const Gaffer::IntVectorDataPlug *availableFramesPlug() const;
 
 		void affects( const Gaffer::Plug *input, AffectedPlugsContainer &outputs ) const override;
 
+		/// Open files are cached, subject to limits on their number and on the
+		/// approximate memory held by PCL and any prefetched data. Changing
+		/// either limit closes all cached files.
 		static void setOpenFilesLimit( size_t maxOpenFiles );
 		static size_t getOpenFilesLimit();
+		static void setMemoryLimit( size_t bytes );
+		static size_t getMemoryLimit();
+
+		/// Returns the number of files currently open, the approximate memory
+		/// they hold ("memoryUsage"), and the number of lookups that found an
+		/// already open file ("hits") or had to open one ("misses").
+		static IECore::CompoundDataPtr fileCacheStatistics();
+
+		/// When non-zero, each tile batch that is read schedules background
+		/// reads of the next `numBatches` batches of the same channel, hiding
+		/// disk latency when images are processed sequentially. Off by default.
+		/// Changing the depth closes all cached files.
+		static void setPrefetchDepth( size_t numBatches );
+		static size_t getPrefetchDepth();
+
+		/// Returns counts of the tile batches that have been scheduled for
+		/// prefetching, that were served by a prefetch ("hits"), and that had
+		/// to be read on demand ("misses").
+		static IECore::CompoundDataPtr prefetchStatistics();
+		static void resetPrefetchStatistics();
 
 	protected :
 
@@ -84,9 +84,24 @@ class MultiMonoImageReader( GafferImage.ImageNode ) :
 		scale = GafferAstro.Scale()
 		self["__Scale"] = scale
 		scale["in"].setInput( readerSwitch["out"] )
-		scale["factor"].setInput( self["resize"] )
 		scale["filter"].setValue( "sharp-gaussian" )
 
+		# Reductions are made by reading the nearest preview level from the
+		# FITS and XISF readers, leaving only the remainder for the Scale.
+		resizeExpression = Gaffer.Expression()
+		self["__ResizeExpression"] = resizeExpression
+		resizeExpression.setExpression(
+			inspect.cleandoc( """
+				import math
+				resize = parent["resize"]
+				level = int( math.floor( math.log( 1.0 / resize, 2 ) + 1e-6 ) ) if resize < 1.0 else 0
+				parent["__FITSReader"]["mipLevel"] = level
+				parent["__XISFReader"]["mipLevel"] = level
+				parent["__Scale"]["factor"] = resize * 2 ** level if context.get( "extension" ) in ( "fits", "xisf" ) else resize
+			""" ),
+			"python"
+		)
+
 		variables = Gaffer.ContextVariables()
 		variables.setup( scale["out"] )
 		self["__Variables"] = variables
@@ -105,21 +105,29 @@ class PixInsight( GafferDispatch.TaskNode ) :
 
 		self["slot"] = Gaffer.IntPlug( defaultValue = 2, minValue = 1, maxValue = 256 )
 
-		imageWriter = GafferImage.ImageWriter()
-		self["__ImageWriter"] = imageWriter
+		imageWriter = GafferAstro.XISFWriter()
+		self["__XISFWriter"] = imageWriter
 		imageWriter["channels"].setInput( self["channels"] )
-		imageWriter["tiff"]["dataType"].setInput( self["dataType"] )
 		imageWriter["in"].setInput( self["in"] )
 
+		# The input used to be written as a TIFF, so scripts may have saved
+		# TIFF data types that XISF doesn't support. Those are written as
+		# float, which holds them with no more than a loss of precision.
 		imageWriterExpr = Gaffer.Expression()
-		self["__ImageWriterExpression"] = imageWriterExpr
+		self["__XISFWriterExpression"] = imageWriterExpr
 		imageWriterExpr.setExpression(
 			inspect.cleandoc( """
 				fileName = parent["fileName"]
 				if fileName and not fileName.endswith( ".xisf" ) :
 						raise ValueError( "fileName must be an .xisf file" )
-				tmpName = fileName.replace( ".xisf", "-input.tif" )
-				parent["__ImageWriter"]["fileName"] = tmpName
+				tmpName = fileName.replace( ".xisf", "-input.xisf" )
+				parent["__XISFWriter"]["fileName"] = tmpName
+
+				dataType = parent["dataType"]
+				dataType = { "uint32" : "float", "half" : "float", "double" : "float" }.get( dataType, dataType )
+				if dataType not in ( "uint8", "uint16", "float" ) :
+					raise ValueError( "Unsupported data type \"%s\"" % dataType )
+				parent["__XISFWriter"]["dataType"] = dataType
 			""" ),
 			"python"
 		)
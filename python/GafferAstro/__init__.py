@@ -35,6 +35,7 @@
 ##########################################################################
 
 import GafferImage
+import GafferDispatch
 
 from ._GafferAstro import *
 
@@ -52,6 +53,10 @@ from .Trim import Trim
 
 from . import FileAlgo
 
+## Returns statistics for all the caches used by the readers.
+# See `CacheAlgo.statistics()`.
+CacheStats = CacheAlgo.statistics
+
 NarrowbandChannels = ( "Sii", "Ha", "Oiii" )
 
 __import__( "IECore" ).loadConfig( "GAFFER_STARTUP_PATHS", subdirectory = "GafferAstro" )
@@ -0,0 +1,112 @@
+##########################################################################
+#
+#  Copyright (c) 2021, Tom Cowland. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#      * Redistributions of source code must retain the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer.
+#
+#      * Redistributions in binary form must reproduce the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer in the documentation and/or other materials provided with
+#        the distribution.
+#
+#      * Neither the name of Tom Cowland nor the names of
+#        any other contributors to this software may be used to endorse or
+#        promote products derived from this software without specific prior
+#        written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+#  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+#  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+#  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+#  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+#  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+##########################################################################
+import os
+import unittest
+
+import GafferTest
+import GafferAstro
+
+from .XISFReaderTest import writeXISF
+
+class CacheAlgoTest( GafferTest.TestCase ) :
+
+	def testStatistics( self ) :
+
+		fileName = os.path.join( self.temporaryDirectory(), "cache.xisf" )
+		writeXISF( fileName, 10, 10, [ [ 0.5 ] * 100 ] )
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+
+		GafferAstro.CacheAlgo.resetStatistics()
+		reader["out"]["dataWindow"].getValue()
+		reader["out"]["channelNames"].getValue()
+
+		statistics = GafferAstro.CacheStats()
+		self.assertIn( "XISFReader", statistics )
+		xisf = statistics["XISFReader"]
+		self.assertEqual( xisf["misses"].value, 1 )
+		self.assertGreaterEqual( xisf["hits"].value, 1 )
+		self.assertGreaterEqual( xisf["entries"].value, 1 )
+		self.assertGreater( xisf["currentCost"].value, 0 )
+		self.assertLessEqual( xisf["currentCost"].value, xisf["maxCost"].value )
+		self.assertEqual( xisf["evictionPolicy"].value, "LRU" )
+
+		GafferAstro.CacheAlgo.resetStatistics()
+		self.assertEqual( GafferAstro.CacheStats()["XISFReader"]["hits"].value, 0 )
+
+	def testEvictions( self ) :
+
+		limit = GafferAstro.XISFReader.getOpenFilesLimit()
+		self.addCleanup( GafferAstro.XISFReader.setOpenFilesLimit, limit )
+		GafferAstro.XISFReader.setOpenFilesLimit( 2 )
+		GafferAstro.CacheAlgo.resetStatistics()
+
+		for i in range( 4 ) :
+			fileName = os.path.join( self.temporaryDirectory(), "evict%d.xisf" % i )
+			writeXISF( fileName, 10, 10, [ [ 0.5 ] * 100 ] )
+			reader = GafferAstro.XISFReader()
+			reader["fileName"].setValue( fileName )
+			reader["out"]["dataWindow"].getValue()
+
+		statistics = GafferAstro.CacheStats()["XISFReader"]
+		self.assertEqual( statistics["misses"].value, 4 )
+		self.assertEqual( statistics["evictions"].value, 2 )
+		self.assertEqual( statistics["entries"].value, 2 )
+
+	def testEvictionPolicy( self ) :
+
+		self.assertEqual( GafferAstro.CacheAlgo.getEvictionPolicy( "XISFReader" ), GafferAstro.CacheAlgo.EvictionPolicy.LRU )
+		self.addCleanup( GafferAstro.CacheAlgo.setEvictionPolicy, "XISFReader", GafferAstro.CacheAlgo.EvictionPolicy.LRU )
+
+		GafferAstro.CacheAlgo.setEvictionPolicy( "XISFReader", GafferAstro.CacheAlgo.EvictionPolicy.CostWeighted )
+		self.assertEqual( GafferAstro.CacheAlgo.getEvictionPolicy( "XISFReader" ), GafferAstro.CacheAlgo.EvictionPolicy.CostWeighted )
+
+		fileName = os.path.join( self.temporaryDirectory(), "policy.xisf" )
+		writeXISF( fileName, 10, 10, [ [ 0.5 ] * 100 ] )
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+		reader["out"]["dataWindow"].getValue()
+
+		self.assertEqual( GafferAstro.CacheStats()["XISFReader"]["evictionPolicy"].value, "CostWeighted" )
+
+		# Policies may be set for caches that don't exist yet.
+		GafferAstro.CacheAlgo.setEvictionPolicy( "NotACache", GafferAstro.CacheAlgo.EvictionPolicy.CostWeighted )
+		self.assertEqual( GafferAstro.CacheAlgo.getEvictionPolicy( "NotACache" ), GafferAstro.CacheAlgo.EvictionPolicy.CostWeighted )
+		self.assertNotIn( "NotACache", GafferAstro.CacheStats() )
+
+if __name__ == "__main__":
+	unittest.main()
@@ -133,5 +133,89 @@ class CollectChannelsTest( GafferImageTest.ImageTestCase ) :
 		collect["channels"].setValue( IECore.StringVectorData( [ 'B', 'G', 'R', 'A' ] ) )
 		self.assertEqual( collect["out"]["metadata"].getValue(), IECore.CompoundData( { "test" : "B" } ) )
 
+	def testDirtyPropagation( self ) :
+
+		constant = GafferImage.Constant()
+		shuffle = GafferImage.Shuffle()
+		shuffle["in"].setInput( constant["out"] )
+
+		collect = GafferAstro.CollectChannels()
+		collect["in"].setInput( shuffle["out"] )
+		collect["channels"].setValue( IECore.StringVectorData( [ "X", "Y" ] ) )
+		collect["sourceChannel"].setValue( "R" )
+
+		for plug, value in (
+			( collect["sourceChannel"], "G" ),
+			( collect["channelVariable"], "test:channelName" ),
+			( collect["channels"], IECore.StringVectorData( [ "X", "Y", "Z" ] ) ),
+		) :
+			cs = GafferTest.CapturingSlot( collect.plugDirtiedSignal() )
+			plug.setValue( value )
+			dirtied = { x[0] for x in cs }
+			self.assertIn( collect["out"]["channelNames"], dirtied )
+			self.assertIn( collect["out"]["channelData"], dirtied )
+
+		collect["channels"].setValue( IECore.StringVectorData( [ "X", "Y" ] ) )
+		collect["sourceChannel"].setValue( "Z" )
+		with six.assertRaisesRegex( self, Gaffer.ProcessException, "No channel 'Z' in input for output channel 'X'" ) :
+			collect["out"]["channelNames"].getValue()
+
+		cs = GafferTest.CapturingSlot( collect.plugDirtiedSignal() )
+		shuffle["channels"].addChild( shuffle.ChannelPlug( "Z", "R" ) )
+		dirtied = { x[0] for x in cs }
+		self.assertIn( collect["out"]["channelNames"], dirtied )
+		self.assertIn( collect["out"]["channelData"], dirtied )
+
+		self.assertEqual( collect["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "X", "Y" ] ) )
+		self.assertEqual(
+			collect["out"].channelData( "Y", imath.V2i( 0 ) ),
+			constant["out"].channelData( "R", imath.V2i( 0 ) )
+		)
+
+	def testManyChannels( self ) :
+
+		constant = GafferImage.Constant()
+		constant["format"].setValue( GafferImage.Format( 1000, 1000, 1.000 ) )
+
+		crop = GafferImage.Crop()
+		crop["in"].setInput( constant["out"] )
+		crop["affectDisplayWindow"].setValue( False )
+
+		e = Gaffer.Expression()
+		crop.addChild( e )
+		e.setExpression(
+			inspect.cleandoc(
+				"""
+				i = int( context["collect:channelName"][1:] )
+				parent["area"]["min"]["x"] = i * 10
+				parent["area"]["max"]["x"] = i * 10 + 100
+				parent["area"]["max"]["y"] = i * 20 + 1
+				"""
+			),
+			"python"
+		)
+
+		collect = GafferAstro.CollectChannels()
+		collect["in"].setInput( crop["out"] )
+		collect["sourceChannel"].setValue( "R" )
+
+		channels = [ "c%d" % i for i in range( 32 ) ]
+		collect["channels"].setValue( IECore.StringVectorData( channels ) )
+
+		self.assertEqual( collect["out"]["channelNames"].getValue(), IECore.StringVectorData( channels ) )
+		self.assertEqual( collect["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 410, 621 ) ) )
+		self.assertFalse( collect["out"]["deep"].getValue() )
+
+		# Hashes must be independent of the order in which channels are evaluated.
+		hashes = [ collect["out"][p].hash() for p in ( "channelNames", "dataWindow", "deep" ) ]
+		for i in range( 10 ) :
+			Gaffer.ValuePlug.clearHashCache()
+			self.assertEqual( [ collect["out"][p].hash() for p in ( "channelNames", "dataWindow", "deep" ) ], hashes )
+
+		# Errors are reported for the first bad channel.
+		collect["sourceChannel"].setValue( "Z" )
+		with six.assertRaisesRegex( self, Gaffer.ProcessException, "No channel 'Z' in input for output channel 'c0'" ) :
+			collect["out"]["channelNames"].getValue()
+
 if __name__ == "__main__":
 	unittest.main()
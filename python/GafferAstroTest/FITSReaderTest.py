@@ -0,0 +1,531 @@
+##########################################################################
+#
+#  Copyright (c) 2021, Tom Cowland. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#      * Redistributions of source code must retain the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer.
+#
+#      * Redistributions in binary form must reproduce the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer in the documentation and/or other materials provided with
+#        the distribution.
+#
+#      * Neither the name of Tom Cowland nor the names of
+#        any other contributors to this software may be used to endorse or
+#        promote products derived from this software without specific prior
+#        written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+#  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+#  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+#  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+#  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+#  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+##########################################################################
+
+import array
+import os
+import shutil
+import subprocess
+import sys
+import unittest
+
+import imath
+
+import IECore
+
+import Gaffer
+import GafferTest
+import GafferImage
+import GafferImageTest
+import GafferAstro
+
+def __card( key, value ) :
+
+	if key in ( "COMMENT", "HISTORY" ) :
+		return ( key.ljust( 8 ) + value ).ljust( 80 )
+
+	if isinstance( value, bool ) :
+		value = ( "T" if value else "F" ).rjust( 20 )
+	elif isinstance( value, ( int, float ) ) :
+		value = repr( value ).rjust( 20 )
+	else :
+		value = ( "'%s'" % value.replace( "'", "''" ).ljust( 8 ) )
+
+	return ( key.ljust( 8 ) + "= " + value ).ljust( 80 )
+
+def __hdu( firstCard, shape, pixels, bitpix, cards ) :
+
+	header = [ firstCard, __card( "BITPIX", bitpix ), __card( "NAXIS", len( shape ) ) ]
+	header += [ __card( "NAXIS%d" % ( i + 1 ), s ) for i, s in enumerate( shape ) ]
+	header += [ __card( k, v ) for k, v in cards ]
+	header.append( "END".ljust( 80 ) )
+
+	headerBytes = "".join( header ).encode( "ascii" )
+	headerBytes += b" " * ( -len( headerBytes ) % 2880 )
+
+	data = array.array( { -64 : "d", -32 : "f", 8 : "B", 16 : "h", 32 : "i" }[ bitpix ], pixels )
+	if sys.byteorder == "little" :
+		data.byteswap()
+
+	dataBytes = data.tobytes()
+	dataBytes += b"\0" * ( -len( dataBytes ) % 2880 )
+
+	return headerBytes + dataBytes
+
+## Writes a minimal FITS file. `shape` is ( NAXIS1, NAXIS2, ... ),
+# and `pixels` are the raw (unscaled) values in FITS order. Image
+# extensions may be specified as a list of `( shape, pixels, bitpix, cards )`
+# tuples.
+def writeFITS( fileName, shape, pixels, bitpix = -32, cards = (), extensions = () ) :
+
+	if extensions :
+		cards = [ ( "EXTEND", True ) ] + list( cards )
+
+	with open( fileName, "wb" ) as f :
+		f.write( __hdu( __card( "SIMPLE", True ), shape, pixels, bitpix, cards ) )
+		for extension in extensions :
+			f.write( __hdu( __card( "XTENSION", "IMAGE" ), *extension[:2], bitpix = extension[2], cards = [ ( "PCOUNT", 0 ), ( "GCOUNT", 1 ) ] + list( extension[3] ) ) )
+
+## Returns the next level of a preview pyramid, as
+# `( width, height, pixels )`, where pixels are stored bottom to top.
+def downsample( width, height, pixels ) :
+
+	newWidth, newHeight = ( width + 1 ) // 2, ( height + 1 ) // 2
+	result = []
+	for y in range( newHeight ) :
+		y0, y1 = 2 * y, min( 2 * y + 1, height - 1 )
+		for x in range( newWidth ) :
+			x0, x1 = 2 * x, min( 2 * x + 1, width - 1 )
+			result.append( 0.25 * ( pixels[x0 + y0 * width] + pixels[x1 + y0 * width] + pixels[x0 + y1 * width] + pixels[x1 + y1 * width] ) )
+
+	return newWidth, newHeight, result
+
+class FITSReaderTest( GafferImageTest.ImageTestCase ) :
+
+	def testRead( self ) :
+
+		width, height = 256, 192
+		fileName = os.path.join( self.temporaryDirectory(), "gradient.fits" )
+		writeFITS( fileName, ( width, height ), [ float( i ) for i in range( width * height ) ] )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( width, height ) ) )
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "Y" ] ) )
+
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		for x, y in ( ( 0, 0 ), ( 1, 0 ), ( 0, 1 ), ( 100, 70 ), ( width - 1, height - 1 ) ) :
+			self.assertEqual( sampler.sample( x, y ), x + y * width )
+
+	def testPartialTiles( self ) :
+
+		width, height = 150, 100
+		fileName = os.path.join( self.temporaryDirectory(), "partial.fits" )
+		writeFITS( fileName, ( width, height ), [ float( i ) for i in range( width * height ) ] )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		for y in range( 0, height, 7 ) :
+			for x in range( 0, width, 7 ) :
+				self.assertEqual( sampler.sample( x, y ), x + y * width )
+
+		tile = reader["out"].channelData( "Y", imath.V2i( 128, 64 ) )
+		self.assertEqual( tile[0], 128 + 64 * width )
+		self.assertEqual( tile[ width - 128 ], 0 )
+
+	def testIntegerData( self ) :
+
+		width, height = 64, 32
+		fileName = os.path.join( self.temporaryDirectory(), "uint16.fits" )
+		# Unsigned 16 bit data, stored as signed with BZERO offset.
+		writeFITS(
+			fileName, ( width, height ), [ ( i * 16 ) - 32768 for i in range( width * height ) ],
+			bitpix = 16, cards = [ ( "BZERO", 32768 ), ( "BSCALE", 1 ) ]
+		)
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+		self.assertFalse( reader["normalize"].getValue() )
+
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		for x, y in ( ( 0, 0 ), ( 1, 0 ), ( 10, 20 ), ( width - 1, height - 1 ) ) :
+			self.assertEqual( sampler.sample( x, y ), ( x + y * width ) * 16 )
+
+		reader["normalize"].setValue( True )
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		for x, y in ( ( 0, 0 ), ( 1, 0 ), ( 10, 20 ), ( width - 1, height - 1 ) ) :
+			self.assertAlmostEqual( sampler.sample( x, y ), ( x + y * width ) * 16 / 65535.0, places = 5 )
+
+	def testDataTypes( self ) :
+
+		width, height = 70, 66
+		for bitpix in ( 8, 16, 32, -32, -64 ) :
+
+			fileName = os.path.join( self.temporaryDirectory(), "bitpix%d.fits" % bitpix )
+			pixels = [ ( x + y ) % 100 for y in range( height ) for x in range( width ) ]
+			if bitpix < 0 :
+				pixels = [ float( p ) for p in pixels ]
+			writeFITS( fileName, ( width, height ), pixels, bitpix = bitpix )
+
+			reader = GafferAstro.FITSReader()
+			reader["fileName"].setValue( fileName )
+
+			sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+			for x, y in ( ( 0, 0 ), ( 3, 1 ), ( 65, 0 ), ( 20, 65 ), ( width - 1, height - 1 ) ) :
+				self.assertEqual( sampler.sample( x, y ), ( x + y ) % 100, "BITPIX %d" % bitpix )
+
+	def testMetadata( self ) :
+
+		fileName = os.path.join( self.temporaryDirectory(), "metadata.fits" )
+		writeFITS(
+			fileName, ( 10, 10 ), [ 0.0 ] * 100,
+			cards = [
+				( "EXPTIME", 300.5 ),
+				( "GAIN", 120 ),
+				( "FILTER", "Ha" ),
+				( "OBJECT", "It's M42" ),
+				( "DATE-OBS", "2021-01-02T03:04:05" ),
+				( "COOLER", True ),
+				( "COMMENT", "First comment" ),
+				( "COMMENT", "Second comment" ),
+			]
+		)
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+
+		metadata = reader["out"]["metadata"].getValue()
+		self.assertEqual( metadata["EXPTIME"], IECore.DoubleData( 300.5 ) )
+		self.assertEqual( metadata["GAIN"], IECore.IntData( 120 ) )
+		self.assertEqual( metadata["FILTER"], IECore.StringData( "Ha" ) )
+		self.assertEqual( metadata["OBJECT"], IECore.StringData( "It's M42" ) )
+		self.assertEqual( metadata["DATE-OBS"], IECore.StringData( "2021-01-02T03:04:05" ) )
+		self.assertEqual( metadata["COOLER"], IECore.BoolData( True ) )
+		self.assertEqual( metadata["COMMENT"], IECore.StringData( "First comment\nSecond comment" ) )
+
+		# Structural keywords are reflected in the image itself
+		for keyword in ( "SIMPLE", "BITPIX", "NAXIS", "NAXIS1", "NAXIS2" ) :
+			self.assertNotIn( keyword, metadata )
+
+	def testCube( self ) :
+
+		width, height = 100, 70
+		fileName = os.path.join( self.temporaryDirectory(), "rgb.fits" )
+		writeFITS(
+			fileName, ( width, height, 3 ),
+			[ float( p * 1000 + x + y ) for p in range( 3 ) for y in range( height ) for x in range( width ) ]
+		)
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "R", "G", "B" ] ) )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( width, height ) ) )
+
+		for p, channel in enumerate( "RGB" ) :
+			sampler = GafferImage.Sampler( reader["out"], channel, reader["out"]["dataWindow"].getValue() )
+			for x, y in ( ( 0, 0 ), ( 65, 3 ), ( width - 1, height - 1 ) ) :
+				self.assertEqual( sampler.sample( x, y ), p * 1000 + x + y )
+
+		fileName = os.path.join( self.temporaryDirectory(), "planes.fits" )
+		writeFITS( fileName, ( 10, 10, 2 ), [ 1.0 ] * 100 + [ 2.0 ] * 100 )
+		reader["fileName"].setValue( fileName )
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "plane1", "plane2" ] ) )
+		self.assertEqual( reader["out"].channelData( "plane2", imath.V2i( 0 ) )[0], 2.0 )
+
+	def testExtensions( self ) :
+
+		fileName = os.path.join( self.temporaryDirectory(), "extensions.fits" )
+		writeFITS(
+			fileName, (), [], cards = [ ( "TELESCOP", "Primary" ), ( "OBSERVER", "Primary" ) ],
+			extensions = [
+				( ( 10, 20 ), [ 1.0 ] * 200, -32, [ ( "INHERIT", True ), ( "OBSERVER", "Extension1" ) ] ),
+				( ( 30, 40 ), [ 2 ] * 1200, 16, [] ),
+			]
+		)
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+
+		# The primary HDU has no image, so the first extension should be loaded
+
+		self.assertEqual( reader["hdu"].getValue(), -1 )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 10, 20 ) ) )
+		self.assertEqual( reader["out"].channelData( "Y", imath.V2i( 0 ) )[0], 1.0 )
+
+		metadata = reader["out"]["metadata"].getValue()
+		self.assertEqual( metadata["TELESCOP"], IECore.StringData( "Primary" ) )
+		self.assertEqual( metadata["OBSERVER"], IECore.StringData( "Extension1" ) )
+
+		reader["hdu"].setValue( 2 )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 30, 40 ) ) )
+		self.assertEqual( reader["out"].channelData( "Y", imath.V2i( 0 ) )[0], 2.0 )
+		self.assertNotIn( "TELESCOP", reader["out"]["metadata"].getValue() )
+
+		reader["hdu"].setValue( 0 )
+		with self.assertRaisesRegex( Gaffer.ProcessException, "Invalid number of image axes" ) :
+			reader["out"]["dataWindow"].getValue()
+
+		reader["hdu"].setValue( 3 )
+		with self.assertRaisesRegex( Gaffer.ProcessException, "HDU 3 does not exist" ) :
+			reader["out"]["dataWindow"].getValue()
+
+	@unittest.skipIf( shutil.which( "fpack" ) is None, "fpack not available" )
+	def testCompressed( self ) :
+
+		width, height = 300, 250
+		pixels = [ ( x * 7 + y * 13 ) % 4000 for y in range( height ) for x in range( width ) ]
+
+		uncompressedFileName = os.path.join( self.temporaryDirectory(), "uncompressed.fits" )
+		writeFITS( uncompressedFileName, ( width, height ), pixels, bitpix = 16, cards = [ ( "FILTER", "Ha" ) ] )
+
+		uncompressed = GafferAstro.FITSReader()
+		uncompressed["fileName"].setValue( uncompressedFileName )
+
+		for tiling in ( [], [ "-t", "100,100" ], [ "-t", "%d,70" % width ] ) :
+
+			compressedFileName = os.path.join( self.temporaryDirectory(), "compressed.fits.fz" )
+			if os.path.exists( compressedFileName ) :
+				os.remove( compressedFileName )
+			subprocess.check_call( [ "fpack", "-r" ] + tiling + [ "-O", compressedFileName, uncompressedFileName ] )
+
+			compressed = GafferAstro.FITSReader()
+			compressed["fileName"].setValue( compressedFileName )
+
+			self.assertEqual( compressed["out"]["dataWindow"].getValue(), uncompressed["out"]["dataWindow"].getValue() )
+			self.assertEqual( compressed["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "Y" ] ) )
+			self.assertEqual( compressed["out"]["metadata"].getValue()["FILTER"], IECore.StringData( "Ha" ) )
+			self.assertNotIn( "ZIMAGE", compressed["out"]["metadata"].getValue() )
+			self.assertImagesEqual( compressed["out"], uncompressed["out"] )
+
+	def testMissingFile( self ) :
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( os.path.join( self.temporaryDirectory(), "missing.fits" ) )
+
+		with self.assertRaises( Gaffer.ProcessException ) :
+			reader["out"]["dataWindow"].getValue()
+
+	def testInvalidFile( self ) :
+
+		fileName = os.path.join( self.temporaryDirectory(), "invalid.fits" )
+		with open( fileName, "w" ) as f :
+			f.write( "Not a FITS file" * 1000 )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+
+		with self.assertRaisesRegex( Gaffer.ProcessException, "Not a FITS file" ) :
+			reader["out"]["dataWindow"].getValue()
+
+	def testRefreshCount( self ) :
+
+		fileName = os.path.join( self.temporaryDirectory(), "refresh.fits" )
+		writeFITS( fileName, ( 10, 20 ), [ 0.0 ] * 200 )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 10, 20 ) ) )
+
+		writeFITS( fileName, ( 30, 40 ), [ 0.0 ] * 1200 )
+		reader["refreshCount"].setValue( reader["refreshCount"].getValue() + 1 )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 30, 40 ) ) )
+
+	def testRewrittenFile( self ) :
+
+		# Without a refresh, Gaffer's own cache may still hold results from
+		# the original file, but anything computed afresh must be read from
+		# the new one, with the tiles matching the globals.
+
+		fileName = os.path.join( self.temporaryDirectory(), "rewritten.fits" )
+		writeFITS( fileName, ( 10, 20 ), [ 1.0 ] * 200 )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+		self.assertEqual( GafferImage.ImageAlgo.image( reader["out"] )["Y"][0], 1.0 )
+
+		writeFITS( fileName, ( 300, 400 ), [ 2.0 ] * 120000 )
+		Gaffer.ValuePlug.clearCache()
+		Gaffer.ValuePlug.clearHashCache()
+
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 300, 400 ) ) )
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		self.assertEqual( sampler.sample( 299, 399 ), 2.0 )
+
+	def testMipLevel( self ) :
+
+		# Odd sizes, so the last row and column are repeated at each level.
+		width, height = 301, 203
+		fileName = os.path.join( self.temporaryDirectory(), "mip.fits" )
+		pixels = [ float( i ) for i in range( width * height ) ]
+		writeFITS( fileName, ( width, height ), pixels )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+		fullHash = reader["out"].channelDataHash( "Y", imath.V2i( 0 ) )
+
+		level = ( width, height, pixels )
+		for mipLevel in ( 1, 2, 3 ) :
+
+			level = downsample( *level )
+			reader["mipLevel"].setValue( mipLevel )
+
+			window = imath.Box2i( imath.V2i( 0 ), imath.V2i( level[0], level[1] ) )
+			self.assertEqual( reader["out"]["dataWindow"].getValue(), window )
+			self.assertEqual( reader["out"]["format"].getValue().getDisplayWindow(), window )
+			self.assertNotEqual( reader["out"].channelDataHash( "Y", imath.V2i( 0 ) ), fullHash )
+
+			sampler = GafferImage.Sampler( reader["out"], "Y", window )
+			for x, y in ( ( 0, 0 ), ( 1, 0 ), ( 0, 1 ), ( level[0] // 2, level[1] // 3 ), ( level[0] - 1, level[1] - 1 ) ) :
+				self.assertAlmostEqual( sampler.sample( x, y ), level[2][ x + y * level[0] ], delta = 1e-3 )
+
+		# Changes to the file are picked up once refreshed.
+
+		writeFITS( fileName, ( width, height ), [ 1.0 ] * ( width * height ) )
+		reader["refreshCount"].setValue( reader["refreshCount"].getValue() + 1 )
+		self.assertEqual( reader["out"].channelData( "Y", imath.V2i( 0 ) )[0], 1.0 )
+
+	def testMipLevelCube( self ) :
+
+		width, height = 130, 70
+		fileName = os.path.join( self.temporaryDirectory(), "mipCube.fits" )
+		pixels = [ i % 1000 for i in range( width * height * 3 ) ]
+		writeFITS( fileName, ( width, height, 3 ), pixels, bitpix = 16 )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+		reader["normalize"].setValue( True )
+		reader["mipLevel"].setValue( 1 )
+
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "R", "G", "B" ] ) )
+
+		for plane, channel in enumerate( "RGB" ) :
+			planePixels = [ p / 32767.0 for p in pixels[ plane * width * height : ( plane + 1 ) * width * height ] ]
+			mipWidth, mipHeight, mipPixels = downsample( width, height, planePixels )
+			sampler = GafferImage.Sampler( reader["out"], channel, reader["out"]["dataWindow"].getValue() )
+			for x, y in ( ( 0, 0 ), ( 40, 20 ), ( mipWidth - 1, mipHeight - 1 ) ) :
+				self.assertAlmostEqual( sampler.sample( x, y ), mipPixels[ x + y * mipWidth ], places = 5 )
+
+	def testOpenFilesLimit( self ) :
+
+		limit = GafferAstro.FITSReader.getOpenFilesLimit()
+		self.addCleanup( GafferAstro.FITSReader.setOpenFilesLimit, limit )
+
+		GafferAstro.FITSReader.setOpenFilesLimit( 1 )
+		self.assertEqual( GafferAstro.FITSReader.getOpenFilesLimit(), 1 )
+
+		reader = GafferAstro.FITSReader()
+		for i in range( 3 ) :
+			fileName = os.path.join( self.temporaryDirectory(), "file%d.fits" % i )
+			writeFITS( fileName, ( 10 + i, 10 ), [ 0.0 ] * ( ( 10 + i ) * 10 ) )
+			reader["fileName"].setValue( fileName )
+			self.assertEqual( reader["out"]["dataWindow"].getValue().max(), imath.V2i( 10 + i, 10 ) )
+
+	def __narrowbandSession( self, width, height ) :
+
+		loadSHO = GafferAstro.LoadSHO()
+
+		pixels = array.array( "f", [ 0.25 ] ) * ( width * height )
+		for channel in GafferAstro.NarrowbandChannels :
+			channelName = loadSHO["channelName%s" % channel].getValue()
+			writeFITS( os.path.join( self.temporaryDirectory(), channelName + ".fits" ), ( width, height ), pixels )
+
+		loadSHO["fileName"].setValue( os.path.join( self.temporaryDirectory(), "{channel}.fits" ) )
+
+		return loadSHO
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testFullFramePerformance( self ) :
+
+		width, height = 6000, 4000
+		fileName = os.path.join( self.temporaryDirectory(), "fullFrame.fits" )
+		writeFITS( fileName, ( width, height ), array.array( "f", [ 0.5 ] ) * ( width * height ) )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+		reader["out"]["dataWindow"].getValue()
+
+		with GafferTest.TestRunner.PerformanceScope() :
+			GafferImageTest.processTiles( reader["out"] )
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testFullFrameUInt16Performance( self ) :
+
+		# Compare with `testFullFramePerformance()`, integer data
+		# should decode at least as quickly as float data.
+
+		width, height = 6000, 4000
+		fileName = os.path.join( self.temporaryDirectory(), "fullFrameUInt16.fits" )
+		writeFITS(
+			fileName, ( width, height ), array.array( "h", [ 0 ] ) * ( width * height ),
+			bitpix = 16, cards = [ ( "BZERO", 32768 ), ( "BSCALE", 1 ) ]
+		)
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( fileName )
+		reader["normalize"].setValue( True )
+		reader["out"]["dataWindow"].getValue()
+
+		with GafferTest.TestRunner.PerformanceScope() :
+			GafferImageTest.processTiles( reader["out"] )
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testGlobalsPerformance( self ) :
+
+		# Queries made when browsing a directory of frames
+		# should only need to read the headers.
+
+		for i in range( 200 ) :
+			writeFITS( os.path.join( self.temporaryDirectory(), "frame.%d.fits" % i ), ( 1024, 1024 ), array.array( "f", [ 0 ] ) * ( 1024 * 1024 ) )
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( os.path.join( self.temporaryDirectory(), "frame.${frame}.fits" ) )
+
+		context = Gaffer.Context()
+		with GafferTest.TestRunner.PerformanceScope() :
+			for i in range( 200 ) :
+				context.setFrame( i )
+				with context :
+					reader["out"]["format"].getValue()
+					reader["out"]["dataWindow"].getValue()
+					reader["out"]["channelNames"].getValue()
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testLoadSHOPerformance( self ) :
+
+		loadSHO = self.__narrowbandSession( 4096, 4096 )
+		loadSHO["out"]["dataWindow"].getValue()
+
+		with GafferTest.TestRunner.PerformanceScope() :
+			GafferImageTest.processTiles( loadSHO["out"] )
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testLoadSHOSingleThreadedPerformance( self ) :
+
+		# Baseline for `testLoadSHOPerformance()`, tile throughput
+		# should scale with the number of threads.
+
+		loadSHO = self.__narrowbandSession( 4096, 4096 )
+		loadSHO["out"]["dataWindow"].getValue()
+
+		with IECore.tbb_global_control( IECore.tbb_global_control.parameter.max_allowed_parallelism, 1 ) :
+			with GafferTest.TestRunner.PerformanceScope() :
+				GafferImageTest.processTiles( loadSHO["out"] )
+
+if __name__ == "__main__":
+	unittest.main()
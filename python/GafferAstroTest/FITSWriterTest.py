@@ -0,0 +1,214 @@
+##########################################################################
+#
+#  Copyright (c) 2021, Tom Cowland. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#      * Redistributions of source code must retain the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer.
+#
+#      * Redistributions in binary form must reproduce the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer in the documentation and/or other materials provided with
+#        the distribution.
+#
+#      * Neither the name of Tom Cowland nor the names of
+#        any other contributors to this software may be used to endorse or
+#        promote products derived from this software without specific prior
+#        written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+#  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+#  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+#  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+#  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+#  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+##########################################################################
+
+import os
+import unittest
+
+import imath
+
+import IECore
+
+import Gaffer
+import GafferTest
+import GafferImage
+import GafferImageTest
+import GafferAstro
+
+class FITSWriterTest( GafferImageTest.ImageTestCase ) :
+
+	def __checkerboard( self, width = 300, height = 200 ) :
+
+		checkerboard = GafferImage.Checkerboard()
+		checkerboard["format"].setValue( GafferImage.Format( width, height ) )
+		checkerboard["size"].setValue( imath.V2f( 7 ) )
+		checkerboard["colorA"].setValue( imath.Color4f( 0.1, 0.2, 0.3, 1 ) )
+		checkerboard["colorB"].setValue( imath.Color4f( 0.9, 0.5, 0.25, 1 ) )
+		return checkerboard
+
+	def testWrite( self ) :
+
+		checkerboard = self.__checkerboard()
+
+		deleteChannels = GafferImage.DeleteChannels()
+		deleteChannels["in"].setInput( checkerboard["out"] )
+		deleteChannels["channels"].setValue( "A" )
+
+		writer = GafferAstro.FITSWriter()
+		writer["in"].setInput( deleteChannels["out"] )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "rgb.fits" ) )
+		writer["task"].execute()
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "R", "G", "B" ] ) )
+		self.assertImagesEqual( reader["out"], deleteChannels["out"], ignoreMetadata = True )
+
+	def testSingleChannel( self ) :
+
+		checkerboard = self.__checkerboard( 1000, 65 )
+
+		writer = GafferAstro.FITSWriter()
+		writer["in"].setInput( checkerboard["out"] )
+		writer["channels"].setValue( "G" )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "mono.fits" ) )
+		writer["task"].execute()
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "Y" ] ) )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), checkerboard["out"]["dataWindow"].getValue() )
+
+		dataWindow = reader["out"]["dataWindow"].getValue()
+		readSampler = GafferImage.Sampler( reader["out"], "Y", dataWindow )
+		sourceSampler = GafferImage.Sampler( checkerboard["out"], "G", dataWindow )
+		for x, y in ( ( 0, 0 ), ( 6, 7 ), ( 500, 30 ), ( 999, 64 ) ) :
+			self.assertEqual( readSampler.sample( x, y ), sourceSampler.sample( x, y ) )
+
+	def testUInt16( self ) :
+
+		checkerboard = self.__checkerboard()
+
+		writer = GafferAstro.FITSWriter()
+		writer["in"].setInput( checkerboard["out"] )
+		writer["channels"].setValue( "R" )
+		writer["dataType"].setValue( "uint16" )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "uint16.fits" ) )
+		writer["task"].execute()
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+		reader["normalize"].setValue( True )
+
+		dataWindow = reader["out"]["dataWindow"].getValue()
+		readSampler = GafferImage.Sampler( reader["out"], "Y", dataWindow )
+		sourceSampler = GafferImage.Sampler( checkerboard["out"], "R", dataWindow )
+		for x, y in ( ( 0, 0 ), ( 6, 7 ), ( 150, 100 ), ( 299, 199 ) ) :
+			self.assertAlmostEqual( readSampler.sample( x, y ), sourceSampler.sample( x, y ), delta = 1 / 65535.0 )
+
+	def testMetadata( self ) :
+
+		checkerboard = self.__checkerboard( 10, 10 )
+
+		metadata = GafferImage.ImageMetadata()
+		metadata["in"].setInput( checkerboard["out"] )
+		for name, value in (
+			( "EXPTIME", IECore.DoubleData( 300.5 ) ),
+			( "GAIN", IECore.IntData( 120 ) ),
+			( "FILTER", IECore.StringData( "Ha" ) ),
+			( "COOLER", IECore.BoolData( True ) ),
+			( "COMMENT", IECore.StringData( "First comment\nSecond comment" ) ),
+			# Structural keywords are determined by the image itself
+			( "BITPIX", IECore.IntData( 8 ) ),
+			( "NAXIS1", IECore.IntData( 20 ) ),
+		) :
+			metadata["metadata"].addChild( Gaffer.NameValuePlug( name, value ) )
+
+		writer = GafferAstro.FITSWriter()
+		writer["in"].setInput( metadata["out"] )
+		writer["channels"].setValue( "R" )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "metadata.fits" ) )
+		writer["task"].execute()
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+
+		readMetadata = reader["out"]["metadata"].getValue()
+		self.assertEqual( readMetadata["EXPTIME"], IECore.DoubleData( 300.5 ) )
+		self.assertEqual( readMetadata["GAIN"], IECore.IntData( 120 ) )
+		self.assertEqual( readMetadata["FILTER"], IECore.StringData( "Ha" ) )
+		self.assertEqual( readMetadata["COOLER"], IECore.BoolData( True ) )
+		self.assertEqual( readMetadata["COMMENT"], IECore.StringData( "First comment\nSecond comment" ) )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 10 ) ) )
+
+	def testOverwrite( self ) :
+
+		checkerboard = self.__checkerboard( 10, 10 )
+
+		writer = GafferAstro.FITSWriter()
+		writer["in"].setInput( checkerboard["out"] )
+		writer["channels"].setValue( "R" )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "subdirectory", "overwrite.fits" ) )
+		writer["task"].execute()
+
+		checkerboard["format"].setValue( GafferImage.Format( 20, 30 ) )
+		writer["task"].execute()
+
+		reader = GafferAstro.FITSReader()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( 20, 30 ) ) )
+
+	def testHash( self ) :
+
+		checkerboard = self.__checkerboard( 10, 10 )
+
+		writer = GafferAstro.FITSWriter()
+		self.assertEqual( writer["task"].hash(), IECore.MurmurHash() )
+
+		writer["in"].setInput( checkerboard["out"] )
+		self.assertEqual( writer["task"].hash(), IECore.MurmurHash() )
+
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "hash.fits" ) )
+		h = writer["task"].hash()
+		self.assertNotEqual( h, IECore.MurmurHash() )
+
+		writer["dataType"].setValue( "uint16" )
+		self.assertNotEqual( writer["task"].hash(), h )
+		h = writer["task"].hash()
+
+		checkerboard["colorA"].setValue( imath.Color4f( 1 ) )
+		self.assertNotEqual( writer["task"].hash(), h )
+
+	def testErrors( self ) :
+
+		writer = GafferAstro.FITSWriter()
+		self.assertRaisesRegex( RuntimeError, "No input image", writer["task"].execute )
+
+		checkerboard = self.__checkerboard( 10, 10 )
+		writer["in"].setInput( checkerboard["out"] )
+		self.assertRaisesRegex( RuntimeError, "No file name", writer["task"].execute )
+
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "errors.fits" ) )
+		writer["channels"].setValue( "Z" )
+		self.assertRaisesRegex( RuntimeError, "No channels", writer["task"].execute )
+
+		writer["channels"].setValue( "*" )
+		writer["dataType"].setValue( "uint8" )
+		self.assertRaisesRegex( RuntimeError, "Unsupported data type", writer["task"].execute )
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,97 @@
+##########################################################################
+#
+#  Copyright (c) 2021, Tom Cowland. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#      * Redistributions of source code must retain the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer.
+#
+#      * Redistributions in binary form must reproduce the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer in the documentation and/or other materials provided with
+#        the distribution.
+#
+#      * Neither the name of Tom Cowland nor the names of
+#        any other contributors to this software may be used to endorse or
+#        promote products derived from this software without specific prior
+#        written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+#  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+#  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+#  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+#  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+#  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import unittest
+
+import imath
+
+import Gaffer
+import GafferTest
+import GafferImage
+import GafferImageTest
+import GafferAstro
+
+class PixInsightTest( GafferImageTest.ImageTestCase ) :
+
+	def testDataType( self ) :
+
+		script = Gaffer.ScriptNode()
+		script["pixInsight"] = GafferAstro.PixInsight()
+		writer = script["pixInsight"]["__XISFWriter"]
+
+		for dataType, expected in (
+			( "uint8", "uint8" ),
+			( "uint16", "uint16" ),
+			( "float", "float" ),
+			# Values saved when the input was written as a TIFF.
+			( "uint32", "float" ),
+			( "half", "float" ),
+			( "double", "float" ),
+		) :
+			script["pixInsight"]["dataType"].setValue( dataType )
+			self.assertEqual( writer["dataType"].getValue(), expected )
+
+		script["pixInsight"]["dataType"].setValue( "int128" )
+		with self.assertRaisesRegex( Gaffer.ProcessException, "Unsupported data type" ) :
+			writer["dataType"].getValue()
+
+	def testWriteInputWithTIFFDataType( self ) :
+
+		script = Gaffer.ScriptNode()
+
+		script["constant"] = GafferImage.Constant()
+		script["constant"]["format"].setValue( GafferImage.Format( 64, 32 ) )
+		script["constant"]["color"].setValue( imath.Color4f( 0.25 ) )
+
+		script["pixInsight"] = GafferAstro.PixInsight()
+		script["pixInsight"]["in"].setInput( script["constant"]["out"] )
+		script["pixInsight"]["fileName"].setValue( os.path.join( self.temporaryDirectory(), "output.xisf" ) )
+		script["pixInsight"]["channels"].setValue( "R" )
+		script["pixInsight"]["dataType"].setValue( "uint32" )
+
+		# Only write the input, as PixInsight itself won't be available.
+		script["pixInsight"]["__XISFWriter"]["task"].execute()
+
+		inputFileName = os.path.join( self.temporaryDirectory(), "output-input.xisf" )
+		self.assertTrue( os.path.exists( inputFileName ) )
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( inputFileName )
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		self.assertEqual( sampler.sample( 10, 10 ), 0.25 )
+
+if __name__ == "__main__":
+	unittest.main()
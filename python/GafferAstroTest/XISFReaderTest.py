@@ -0,0 +1,578 @@
+##########################################################################
+#
+#  Copyright (c) 2021, Tom Cowland. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#      * Redistributions of source code must retain the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer.
+#
+#      * Redistributions in binary form must reproduce the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer in the documentation and/or other materials provided with
+#        the distribution.
+#
+#      * Neither the name of Tom Cowland nor the names of
+#        any other contributors to this software may be used to endorse or
+#        promote products derived from this software without specific prior
+#        written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+#  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+#  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+#  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+#  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+#  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+##########################################################################
+
+import array
+import base64
+import os
+import struct
+import sys
+import unittest
+import zlib
+
+import imath
+
+import IECore
+
+import Gaffer
+import GafferTest
+import GafferImage
+import GafferImageTest
+import GafferAstro
+
+from .FITSReaderTest import downsample
+
+## Writes a minimal monolithic XISF file containing a single image.
+# `channels` is a list of per-channel pixel values, stored top to bottom
+# as per the XISF spec, and `sampleFormat` is "Float32" or "UInt16".
+# `imageContent` is XML to be written inside the Image element.
+def writeXISF( fileName, width, height, channels, sampleFormat = "Float32", imageContent = "" ) :
+
+	writeMultiImageXISF(
+		fileName,
+		[ dict( width = width, height = height, channels = channels, sampleFormat = sampleFormat, content = imageContent ) ]
+	)
+
+## As for `writeXISF()`, but writing a list of images, each specified
+# by a dictionary with the same keys as the arguments to `writeXISF()`,
+# with an optional "id". Images may also specify a "compression" of
+# "zlib" or "zlib+sh", optionally split into sub-blocks of "subblockSize"
+# uncompressed bytes.
+def writeMultiImageXISF( fileName, images ) :
+
+	blocks = []
+	compressionAttributes = []
+	for image in images :
+		sampleFormat = image.get( "sampleFormat", "Float32" )
+		data = array.array( { "Float32" : "f", "UInt16" : "H" }[ sampleFormat ] )
+		for channel in image["channels"] :
+			data.extend( channel )
+		if sys.byteorder != "little" :
+			data.byteswap()
+		block = data.tobytes()
+
+		compression = image.get( "compression" )
+		if not compression :
+			blocks.append( block )
+			compressionAttributes.append( "" )
+			continue
+
+		attribute = ' compression="%s:%d' % ( compression, len( block ) )
+		if compression.endswith( "+sh" ) :
+			# Store the first byte of every sample, then the
+			# second byte of every sample and so on.
+			block = b"".join( block[i::data.itemsize] for i in range( data.itemsize ) )
+			attribute += ":%d" % data.itemsize
+		attribute += '"'
+
+		subblockSize = image.get( "subblockSize", len( block ) )
+		subblocks = [ block[i:i+subblockSize] for i in range( 0, len( block ), subblockSize ) ]
+		compressed = [ zlib.compress( b ) for b in subblocks ]
+		if len( subblocks ) > 1 :
+			attribute += ' subblocks="%s"' % ":".join( "%d,%d" % ( len( c ), len( b ) ) for c, b in zip( compressed, subblocks ) )
+
+		blocks.append( b"".join( compressed ) )
+		compressionAttributes.append( attribute )
+
+	def header( dataOffset ) :
+
+		imageElements = ""
+		offset = dataOffset
+		for image, block, compression in zip( images, blocks, compressionAttributes ) :
+			sampleFormat = image.get( "sampleFormat", "Float32" )
+			imageElements += (
+				'<Image{id} geometry="{width}:{height}:{numChannels}" sampleFormat="{sampleFormat}"{bounds} '
+				'colorSpace="{colorSpace}" location="attachment:{offset}:{size}"{compression}>{content}</Image>'
+			).format(
+				id = ' id="%s"' % image["id"] if image.get( "id" ) else "",
+				width = image["width"], height = image["height"], numChannels = len( image["channels"] ),
+				sampleFormat = sampleFormat, bounds = ' bounds="0:1"' if sampleFormat == "Float32" else "",
+				colorSpace = "Gray" if len( image["channels"] ) == 1 else "RGB",
+				offset = offset, size = len( block ), compression = compression, content = image.get( "content", "" )
+			)
+			offset += len( block )
+
+		return (
+			'<?xml version="1.0" encoding="UTF-8"?>'
+			'<xisf version="1.0" xmlns="http://www.pixinsight.com/xisf" '
+			'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+			'xsi:schemaLocation="http://www.pixinsight.com/xisf http://pixinsight.com/xisf/xisf-1.0.xsd">'
+			'{images}'
+			'<Metadata>'
+			'<Property id="XISF:CreationTime" type="String">2021-01-01T00:00:00Z</Property>'
+			'<Property id="XISF:CreatorApplication" type="String">GafferAstroTest</Property>'
+			'</Metadata>'
+			'</xisf>'
+		).format( images = imageElements ).encode( "utf-8" )
+
+	# The header length depends on the data offset, so find an offset
+	# that leaves enough room for it.
+	dataOffset = 4096
+	while 16 + len( header( dataOffset ) ) > dataOffset :
+		dataOffset += 4096
+
+	xml = header( dataOffset )
+	with open( fileName, "wb" ) as f :
+		f.write( b"XISF0100" )
+		f.write( struct.pack( "<II", len( xml ), 0 ) )
+		f.write( xml )
+		f.write( b"\0" * ( dataOffset - 16 - len( xml ) ) )
+		for block in blocks :
+			f.write( block )
+
+class XISFReaderTest( GafferImageTest.ImageTestCase ) :
+
+	def testRead( self ) :
+
+		width, height = 150, 100
+		fileName = os.path.join( self.temporaryDirectory(), "rgb.xisf" )
+		writeXISF(
+			fileName, width, height,
+			[ [ c + ( x + y * width ) / float( width * height ) for y in range( height ) for x in range( width ) ] for c in range( 3 ) ]
+		)
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( width, height ) ) )
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "R", "G", "B" ] ) )
+
+		for c, channel in enumerate( "RGB" ) :
+			sampler = GafferImage.Sampler( reader["out"], channel, reader["out"]["dataWindow"].getValue() )
+			for x, y in ( ( 0, 0 ), ( 1, 0 ), ( 70, 65 ), ( width - 1, height - 1 ) ) :
+				# XISF stores rows top to bottom
+				row = height - 1 - y
+				self.assertAlmostEqual( sampler.sample( x, y ), c + ( x + row * width ) / float( width * height ), places = 5 )
+
+	def testUInt16( self ) :
+
+		width, height = 100, 80
+		fileName = os.path.join( self.temporaryDirectory(), "uint16.xisf" )
+		writeXISF(
+			fileName, width, height,
+			[ [ ( x * 655 + y ) % 65536 for y in range( height ) for x in range( width ) ] ],
+			sampleFormat = "UInt16"
+		)
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		for x, y in ( ( 0, 0 ), ( 99, 0 ), ( 50, 40 ), ( 99, 79 ) ) :
+			row = height - 1 - y
+			self.assertAlmostEqual( sampler.sample( x, y ), ( ( x * 655 + row ) % 65536 ) / 65535.0, places = 6 )
+
+	def testCompressed( self ) :
+
+		width, height = 300, 200
+		channels = [ [ c + ( x + y * width ) / float( width * height ) for y in range( height ) for x in range( width ) ] for c in range( 3 ) ]
+
+		uncompressedFileName = os.path.join( self.temporaryDirectory(), "uncompressed.xisf" )
+		writeXISF( uncompressedFileName, width, height, channels )
+
+		uncompressed = GafferAstro.XISFReader()
+		uncompressed["fileName"].setValue( uncompressedFileName )
+
+		for compression, subblockSize in (
+			( "zlib", None ),
+			( "zlib+sh", None ),
+			# Sub-blocks that don't divide the planes or the samples evenly
+			( "zlib", 100001 ),
+			( "zlib+sh", 100001 ),
+		) :
+
+			fileName = os.path.join( self.temporaryDirectory(), "%s-%s.xisf" % ( compression, subblockSize ) )
+			image = dict( width = width, height = height, channels = channels, compression = compression )
+			if subblockSize :
+				image["subblockSize"] = subblockSize
+			writeMultiImageXISF( fileName, [ image ] )
+
+			reader = GafferAstro.XISFReader()
+			reader["fileName"].setValue( fileName )
+
+			self.assertImagesEqual( reader["out"], uncompressed["out"], ignoreMetadata = True )
+
+		fileName = os.path.join( self.temporaryDirectory(), "compressedUInt16.xisf" )
+		writeMultiImageXISF( fileName, [
+			dict(
+				width = width, height = height, sampleFormat = "UInt16", compression = "zlib+sh", subblockSize = 40000,
+				channels = [ [ ( x * 655 + y ) % 65536 for y in range( height ) for x in range( width ) ] ]
+			)
+		] )
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+
+		sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+		for x, y in ( ( 0, 0 ), ( 299, 0 ), ( 150, 100 ), ( 299, 199 ) ) :
+			row = height - 1 - y
+			self.assertAlmostEqual( sampler.sample( x, y ), ( ( x * 655 + row ) % 65536 ) / 65535.0, places = 6 )
+
+	def testMipLevel( self ) :
+
+		width, height = 301, 203
+		# Stored top to bottom
+		channels = [ [ c + ( x + y * width ) / float( width * height ) for y in range( height ) for x in range( width ) ] for c in range( 3 ) ]
+
+		uncompressedFileName = os.path.join( self.temporaryDirectory(), "uncompressed.xisf" )
+		writeXISF( uncompressedFileName, width, height, channels )
+
+		compressedFileName = os.path.join( self.temporaryDirectory(), "compressed.xisf" )
+		writeMultiImageXISF( compressedFileName, [ dict( width = width, height = height, channels = channels, compression = "zlib+sh" ) ] )
+
+		uncompressed = GafferAstro.XISFReader()
+		uncompressed["fileName"].setValue( uncompressedFileName )
+
+		compressed = GafferAstro.XISFReader()
+		compressed["fileName"].setValue( compressedFileName )
+
+		levels = [ ( width, height, [ c[ x + ( height - 1 - y ) * width ] for y in range( height ) for x in range( width ) ] ) for c in channels ]
+		for mipLevel in ( 1, 2 ) :
+
+			levels = [ downsample( *level ) for level in levels ]
+			uncompressed["mipLevel"].setValue( mipLevel )
+			compressed["mipLevel"].setValue( mipLevel )
+
+			mipWidth, mipHeight = levels[0][:2]
+			window = imath.Box2i( imath.V2i( 0 ), imath.V2i( mipWidth, mipHeight ) )
+			self.assertEqual( uncompressed["out"]["dataWindow"].getValue(), window )
+			self.assertEqual( uncompressed["out"]["format"].getValue().getDisplayWindow(), window )
+
+			for c, channel in enumerate( "RGB" ) :
+				sampler = GafferImage.Sampler( uncompressed["out"], channel, window )
+				for x, y in ( ( 0, 0 ), ( 1, 0 ), ( mipWidth // 2, mipHeight // 3 ), ( mipWidth - 1, mipHeight - 1 ) ) :
+					self.assertAlmostEqual( sampler.sample( x, y ), levels[c][2][ x + y * mipWidth ], places = 5 )
+
+			self.assertImagesEqual( compressed["out"], uncompressed["out"], ignoreMetadata = True )
+
+	def testBatchSizes( self ) :
+
+		# Small images are read in a single batch, so exercise
+		# the tile lookup for a variety of image heights.
+
+		for width, height in ( ( 10, 10 ), ( 64, 64 ), ( 65, 300 ), ( 4000, 700 ) ) :
+
+			fileName = os.path.join( self.temporaryDirectory(), "%dx%d.xisf" % ( width, height ) )
+			writeXISF( fileName, width, height, [ [ float( y ) / height for y in range( height ) for x in range( width ) ] ] )
+
+			reader = GafferAstro.XISFReader()
+			reader["fileName"].setValue( fileName )
+
+			sampler = GafferImage.Sampler( reader["out"], "Y", reader["out"]["dataWindow"].getValue() )
+			for y in range( 0, height, 13 ) :
+				for x in ( 0, width // 2, width - 1 ) :
+					self.assertAlmostEqual( sampler.sample( x, y ), float( height - 1 - y ) / height, places = 5 )
+
+	def testCropReadsLocalBatches( self ) :
+
+		# Uncompressed planes are read straight from the mapping, so a
+		# crop shouldn't need to decode the full width of the image.
+
+		width, height = 4000, 1024
+		fileName = os.path.join( self.temporaryDirectory(), "wide.xisf" )
+		data = array.array( "H" )
+		for row in range( height ) :
+			data.extend( array.array( "H", [ row ] ) * width )
+		writeXISF( fileName, width, height, [ data ], sampleFormat = "UInt16" )
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+		reader["out"]["dataWindow"].getValue()
+
+		Gaffer.ValuePlug.clearCache()
+		memoryUsage = Gaffer.ValuePlug.cacheMemoryUsage()
+
+		tileSize = GafferImage.ImagePlug.tileSize()
+		crop = imath.Box2i( imath.V2i( 1024, 256 ), imath.V2i( 1536, 768 ) )
+		for y in range( crop.min().y, crop.max().y, tileSize ) :
+			for x in range( crop.min().x, crop.max().x, tileSize ) :
+				tile = reader["out"].channelData( "Y", imath.V2i( x, y ) )
+				self.assertAlmostEqual( tile[0], ( height - 1 - y ) / 65535.0, places = 6 )
+
+		# Reading full width batches one tile high would decode this much.
+		numTileColumns = ( width + tileSize - 1 ) // tileSize
+		numCropTileRows = crop.size().y // tileSize
+		fullWidthSize = numCropTileRows * numTileColumns * tileSize * tileSize * 4
+		self.assertLess( Gaffer.ValuePlug.cacheMemoryUsage() - memoryUsage, fullWidthSize / 2 )
+
+	def testMetadata( self ) :
+
+		fileName = os.path.join( self.temporaryDirectory(), "metadata.xisf" )
+		writeXISF(
+			fileName, 10, 10, [ [ 0.0 ] * 100 ],
+			imageContent = (
+				'<FITSKeyword name="EXPTIME" value="300." comment="Exposure time"/>'
+				'<FITSKeyword name="GAIN" value="100" comment=""/>'
+				'<FITSKeyword name="FILTER" value="\'Ha      \'" comment=""/>'
+				'<FITSKeyword name="HISTORY" value="" comment="Calibrated"/>'
+				'<FITSKeyword name="HISTORY" value="" comment="Registered"/>'
+				'<Property id="Instrument:Filter:Name" type="String">H&amp;alpha;</Property>'
+				'<Property id="Instrument:ExposureTime" type="Float32" value="300"/>'
+				'<Property id="Observation:Object:Name" type="String" value="M42"/>'
+				'<Property id="PCL:Signature" type="Boolean" value="1"/>'
+				'<Property id="Integration:NumberOfImages" type="UInt16" value="42"/>'
+				'<Property id="PCL:Vector" type="F64Vector" length="2" location="inline:base64">AAAAAAAAAAAAAAAAAAAAAA==</Property>'
+				'<ICCProfile location="inline:base64">%s</ICCProfile>' % base64.b64encode( b"Not really a profile" ).decode( "ascii" )
+			)
+		)
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+
+		metadata = reader["out"]["metadata"].getValue()
+		self.assertEqual( metadata["EXPTIME"], IECore.DoubleData( 300 ) )
+		self.assertEqual( metadata["GAIN"], IECore.IntData( 100 ) )
+		self.assertEqual( metadata["FILTER"], IECore.StringData( "Ha" ) )
+		self.assertEqual( metadata["HISTORY"], IECore.StringData( "Calibrated\nRegistered" ) )
+		self.assertEqual( metadata["Instrument:Filter:Name"], IECore.StringData( "H&alpha;" ) )
+		self.assertEqual( metadata["Instrument:ExposureTime"], IECore.FloatData( 300 ) )
+		self.assertEqual( metadata["Observation:Object:Name"], IECore.StringData( "M42" ) )
+		self.assertEqual( metadata["PCL:Signature"], IECore.BoolData( True ) )
+		self.assertEqual( metadata["Integration:NumberOfImages"], IECore.IntData( 42 ) )
+		self.assertEqual( metadata["XISF:CreatorApplication"], IECore.StringData( "GafferAstroTest" ) )
+		self.assertNotIn( "PCL:Vector", metadata )
+		self.assertEqual( metadata["XISF:ICCProfile"], IECore.UCharVectorData( list( b"Not really a profile" ) ) )
+
+	def testMultipleImages( self ) :
+
+		width, height = 80, 60
+		fileName = os.path.join( self.temporaryDirectory(), "multi.xisf" )
+		writeMultiImageXISF(
+			fileName,
+			[
+				dict( width = width, height = height, channels = [ [ 0.25 ] * ( width * height ) ] * 3 ),
+				dict( width = width, height = height, channels = [ [ 0.5 ] * ( width * height ) ], id = "rejection_low" ),
+				dict( width = width, height = height, channels = [ [ 1000 ] * ( width * height ) ], sampleFormat = "UInt16" ),
+				# Smaller than the data window, so will be padded with black
+				dict( width = 40, height = 30, channels = [ [ 0.75 ] * ( 40 * 30 ) ], id = "thumbnail" ),
+			]
+		)
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+
+		self.assertEqual( reader["out"]["dataWindow"].getValue(), imath.Box2i( imath.V2i( 0 ), imath.V2i( width, height ) ) )
+		self.assertEqual(
+			reader["out"]["channelNames"].getValue(),
+			IECore.StringVectorData( [ "R", "G", "B", "rejection_low.Y", "image2.Y", "thumbnail.Y" ] )
+		)
+
+		dataWindow = reader["out"]["dataWindow"].getValue()
+		for channel, value in (
+			( "R", 0.25 ), ( "B", 0.25 ), ( "rejection_low.Y", 0.5 ), ( "image2.Y", 1000 / 65535.0 )
+		) :
+			sampler = GafferImage.Sampler( reader["out"], channel, dataWindow )
+			self.assertAlmostEqual( sampler.sample( 10, 50 ), value, places = 6 )
+
+		sampler = GafferImage.Sampler( reader["out"], "thumbnail.Y", dataWindow )
+		self.assertAlmostEqual( sampler.sample( 10, 10 ), 0.75, places = 6 )
+		self.assertEqual( sampler.sample( 50, 50 ), 0 )
+
+	def testPrefetch( self ) :
+
+		# Tall enough to need several tile batches.
+		width, height = 1000, 8192
+		fileName = os.path.join( self.temporaryDirectory(), "tall.xisf" )
+		data = array.array( "H" )
+		for row in range( height ) :
+			data.extend( array.array( "H", [ row ] ) * width )
+		writeXISF( fileName, width, height, [ data ], sampleFormat = "UInt16" )
+
+		depth = GafferAstro.XISFReader.getPrefetchDepth()
+		self.addCleanup( GafferAstro.XISFReader.setPrefetchDepth, depth )
+		GafferAstro.XISFReader.setPrefetchDepth( 2 )
+		self.assertEqual( GafferAstro.XISFReader.getPrefetchDepth(), 2 )
+		GafferAstro.XISFReader.resetPrefetchStatistics()
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+
+		# Walk the image top to bottom, as the file is stored.
+		dataWindow = reader["out"]["dataWindow"].getValue()
+		for y in reversed( range( 0, height, GafferImage.ImagePlug.tileSize() ) ) :
+			for x in range( 0, width, GafferImage.ImagePlug.tileSize() ) :
+				tile = reader["out"].channelData( "Y", imath.V2i( x, y ) )
+				self.assertAlmostEqual( tile[0], ( height - 1 - y ) / 65535.0, places = 6 )
+
+		statistics = GafferAstro.XISFReader.prefetchStatistics()
+		self.assertGreater( statistics["scheduled"].value, 0 )
+		self.assertGreater( statistics["hits"].value + statistics["misses"].value, 1 )
+		# Prefetches may be claimed before they start, in which case they
+		# count as misses, so only bound the counts.
+		self.assertGreaterEqual( statistics["misses"].value, 1 )
+		self.assertLessEqual( statistics["hits"].value, statistics["scheduled"].value )
+
+	def testPrefetchDepthMemoryUsage( self ) :
+
+		# Files are costed by the batches they may prefetch,
+		# so must be reopened when the depth changes.
+
+		fileName = os.path.join( self.temporaryDirectory(), "depth.xisf" )
+		writeXISF( fileName, 1000, 1000, [ [ 0.5 ] * 1000000 ] )
+
+		depth = GafferAstro.XISFReader.getPrefetchDepth()
+		self.addCleanup( GafferAstro.XISFReader.setPrefetchDepth, depth )
+		GafferAstro.XISFReader.setPrefetchDepth( 0 )
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+		reader["out"]["dataWindow"].getValue()
+		memoryUsage = GafferAstro.XISFReader.fileCacheStatistics()["memoryUsage"].value
+
+		GafferAstro.XISFReader.setPrefetchDepth( 4 )
+		self.assertLess( GafferAstro.XISFReader.fileCacheStatistics()["memoryUsage"].value, memoryUsage )
+
+		Gaffer.ValuePlug.clearCache()
+		reader["out"]["dataWindow"].getValue()
+		self.assertGreater( GafferAstro.XISFReader.fileCacheStatistics()["memoryUsage"].value, memoryUsage )
+
+	def testFileCacheLimits( self ) :
+
+		openFilesLimit = GafferAstro.XISFReader.getOpenFilesLimit()
+		self.addCleanup( GafferAstro.XISFReader.setOpenFilesLimit, openFilesLimit )
+		memoryLimit = GafferAstro.XISFReader.getMemoryLimit()
+		self.addCleanup( GafferAstro.XISFReader.setMemoryLimit, memoryLimit )
+
+		GafferAstro.XISFReader.setOpenFilesLimit( 2 )
+		self.assertEqual( GafferAstro.XISFReader.getOpenFilesLimit(), 2 )
+		GafferAstro.XISFReader.setMemoryLimit( 100 * 1024 * 1024 )
+		self.assertEqual( GafferAstro.XISFReader.getMemoryLimit(), 100 * 1024 * 1024 )
+
+		readers = []
+		for i in range( 4 ) :
+			fileName = os.path.join( self.temporaryDirectory(), "limit%d.xisf" % i )
+			writeXISF( fileName, 10, 10, [ [ float( i ) ] * 100 ] )
+			reader = GafferAstro.XISFReader()
+			reader["fileName"].setValue( fileName )
+			readers.append( reader )
+
+		statistics = GafferAstro.XISFReader.fileCacheStatistics()
+		for i, reader in enumerate( readers ) :
+			self.assertEqual( GafferImage.ImageAlgo.image( reader["out"] )["Y"][0], i )
+
+		# Only two files should remain open.
+		self.assertLessEqual( GafferAstro.XISFReader.fileCacheStatistics()["openFiles"].value, statistics["openFiles"].value + 2 )
+
+	def testFileCacheStatistics( self ) :
+
+		fileName = os.path.join( self.temporaryDirectory(), "statistics.xisf" )
+		writeXISF( fileName, 10, 10, [ [ 0.5 ] * 100 ] )
+
+		before = GafferAstro.XISFReader.fileCacheStatistics()
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+		reader["out"]["dataWindow"].getValue()
+
+		after = GafferAstro.XISFReader.fileCacheStatistics()
+		self.assertEqual( after["misses"].value, before["misses"].value + 1 )
+		self.assertGreater( after["memoryUsage"].value, 0 )
+		self.assertGreater( after["openFiles"].value, 0 )
+
+		reader["out"]["channelNames"].getValue()
+		self.assertGreater( GafferAstro.XISFReader.fileCacheStatistics()["hits"].value, after["hits"].value )
+
+	def testMissingFile( self ) :
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( os.path.join( self.temporaryDirectory(), "missing.xisf" ) )
+
+		with self.assertRaises( Gaffer.ProcessException ) :
+			reader["out"]["dataWindow"].getValue()
+
+	def __master( self, width = 9576, height = 6388 ) :
+
+		# A 60MP RGB master, the size of a full frame from
+		# an IMX455 sensor.
+		fileName = os.path.join( self.temporaryDirectory(), "master.xisf" )
+		writeXISF( fileName, width, height, [ array.array( "H", [ 1000 * c ] ) * ( width * height ) for c in range( 3 ) ], sampleFormat = "UInt16" )
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( fileName )
+		reader["out"]["dataWindow"].getValue()
+
+		return reader
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testFullFramePerformance( self ) :
+
+		reader = self.__master()
+
+		with GafferTest.TestRunner.PerformanceScope() :
+			GafferImageTest.processTiles( reader["out"] )
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testCropPerformance( self ) :
+
+		# Emulates a viewer zoomed in on a 512 pixel region.
+
+		reader = self.__master()
+
+		crop = GafferImage.Crop()
+		crop["in"].setInput( reader["out"] )
+		crop["area"].setValue( imath.Box2i( imath.V2i( 4000, 3000 ), imath.V2i( 4512, 3512 ) ) )
+		crop["out"]["dataWindow"].getValue()
+
+		with GafferTest.TestRunner.PerformanceScope() :
+			GafferImageTest.processTiles( crop["out"] )
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testSingleChannelPerformance( self ) :
+
+		# Only the G channel should be read from the file.
+
+		reader = self.__master()
+
+		deleteChannels = GafferImage.DeleteChannels()
+		deleteChannels["in"].setInput( reader["out"] )
+		deleteChannels["mode"].setValue( GafferImage.DeleteChannels.Mode.Keep )
+		deleteChannels["channels"].setValue( "G" )
+		deleteChannels["out"]["channelNames"].getValue()
+
+		with GafferTest.TestRunner.PerformanceScope() :
+			GafferImageTest.processTiles( deleteChannels["out"] )
+
+	@GafferTest.TestRunner.PerformanceTestMethod()
+	def testNarrowImagePerformance( self ) :
+
+		# Narrow images benefit from taller tile batches.
+
+		reader = self.__master( 1024, 16384 )
+
+		with GafferTest.TestRunner.PerformanceScope() :
+			GafferImageTest.processTiles( reader["out"] )
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,232 @@
+##########################################################################
+#
+#  Copyright (c) 2021, Tom Cowland. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#      * Redistributions of source code must retain the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer.
+#
+#      * Redistributions in binary form must reproduce the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer in the documentation and/or other materials provided with
+#        the distribution.
+#
+#      * Neither the name of Tom Cowland nor the names of
+#        any other contributors to this software may be used to endorse or
+#        promote products derived from this software without specific prior
+#        written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+#  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+#  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+#  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+#  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+#  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+##########################################################################
+
+import os
+import unittest
+
+import imath
+
+import IECore
+
+import Gaffer
+import GafferTest
+import GafferImage
+import GafferImageTest
+import GafferAstro
+
+class XISFWriterTest( GafferImageTest.ImageTestCase ) :
+
+	# Returns a ScriptNode containing an RGB image as "image".
+	def __rgb( self, width = 300, height = 200 ) :
+
+		script = Gaffer.ScriptNode()
+
+		script["checkerboard"] = GafferImage.Checkerboard()
+		script["checkerboard"]["format"].setValue( GafferImage.Format( width, height ) )
+		script["checkerboard"]["size"].setValue( imath.V2f( 7 ) )
+		script["checkerboard"]["colorA"].setValue( imath.Color4f( 0.1, 0.2, 0.3, 1 ) )
+		script["checkerboard"]["colorB"].setValue( imath.Color4f( 0.9, 0.5, 0.25, 1 ) )
+
+		script["image"] = GafferImage.DeleteChannels()
+		script["image"]["in"].setInput( script["checkerboard"]["out"] )
+		script["image"]["channels"].setValue( "A" )
+
+		return script
+
+	def testWrite( self ) :
+
+		script = self.__rgb()
+		image = script["image"]
+
+		writer = GafferAstro.XISFWriter()
+		writer["in"].setInput( image["out"] )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "rgb.xisf" ) )
+		writer["task"].execute()
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "R", "G", "B" ] ) )
+		self.assertImagesEqual( reader["out"], image["out"], ignoreMetadata = True )
+
+		writer["channels"].setValue( "G" )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "mono.xisf" ) )
+		writer["task"].execute()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+
+		self.assertEqual( reader["out"]["channelNames"].getValue(), IECore.StringVectorData( [ "Y" ] ) )
+		self.assertEqual( reader["out"].channelData( "Y", imath.V2i( 0 ) ), image["out"].channelData( "G", imath.V2i( 0 ) ) )
+
+	def testCompression( self ) :
+
+		script = self.__rgb( 1000, 700 )
+		image = script["image"]
+
+		writer = GafferAstro.XISFWriter()
+		writer["in"].setInput( image["out"] )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "uncompressed.xisf" ) )
+		writer["task"].execute()
+		uncompressedSize = os.path.getsize( writer["fileName"].getValue() )
+
+		for compression in ( "zlib", "lz4", "lz4hc", "zstd" ) :
+			for byteShuffling in ( True, False ) :
+
+				fileName = os.path.join( self.temporaryDirectory(), "%s%d.xisf" % ( compression, byteShuffling ) )
+				writer["fileName"].setValue( fileName )
+				writer["compression"].setValue( compression )
+				writer["byteShuffling"].setValue( byteShuffling )
+				writer["task"].execute()
+
+				self.assertLess( os.path.getsize( fileName ), uncompressedSize )
+
+				reader = GafferAstro.XISFReader()
+				reader["fileName"].setValue( fileName )
+				self.assertImagesEqual( reader["out"], image["out"], ignoreMetadata = True )
+
+	def testIntegerData( self ) :
+
+		script = self.__rgb()
+		image = script["image"]
+
+		for dataType, maxValue in ( ( "uint8", 255.0 ), ( "uint16", 65535.0 ) ) :
+
+			writer = GafferAstro.XISFWriter()
+			writer["in"].setInput( image["out"] )
+			writer["dataType"].setValue( dataType )
+			writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), dataType + ".xisf" ) )
+			writer["task"].execute()
+
+			reader = GafferAstro.XISFReader()
+			reader["fileName"].setValue( writer["fileName"].getValue() )
+
+			dataWindow = reader["out"]["dataWindow"].getValue()
+			for channel in "RGB" :
+				readSampler = GafferImage.Sampler( reader["out"], channel, dataWindow )
+				sourceSampler = GafferImage.Sampler( image["out"], channel, dataWindow )
+				for x, y in ( ( 0, 0 ), ( 6, 7 ), ( 150, 100 ), ( 299, 199 ) ) :
+					self.assertAlmostEqual( readSampler.sample( x, y ), sourceSampler.sample( x, y ), delta = 1 / maxValue )
+
+	def testMetadata( self ) :
+
+		script = self.__rgb( 10, 10 )
+		image = script["image"]
+
+		metadata = GafferImage.ImageMetadata()
+		metadata["in"].setInput( image["out"] )
+		for name, value in (
+			( "EXPTIME", IECore.DoubleData( 300.5 ) ),
+			( "GAIN", IECore.IntData( 120 ) ),
+			( "OBJECT", IECore.StringData( "It's M42 <& friends>" ) ),
+			( "DATE-OBS", IECore.StringData( "2021-01-02T03:04:05" ) ),
+			( "COOLER", IECore.BoolData( True ) ),
+			( "COMMENT", IECore.StringData( "First comment\nSecond comment" ) ),
+			( "Instrument:Camera:Name", IECore.StringData( "ZWO ASI1600MM" ) ),
+			( "Instrument:Sensor:Temperature", IECore.FloatData( -10.5 ) ),
+			( "Observation:Time:Exposures", IECore.IntData( 12 ) ),
+			# Structural keywords are determined by the image itself
+			( "NAXIS", IECore.IntData( 1 ) ),
+		) :
+			metadata["metadata"].addChild( Gaffer.NameValuePlug( name, value ) )
+
+		writer = GafferAstro.XISFWriter()
+		writer["in"].setInput( metadata["out"] )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "metadata.xisf" ) )
+		writer["task"].execute()
+
+		reader = GafferAstro.XISFReader()
+		reader["fileName"].setValue( writer["fileName"].getValue() )
+
+		readMetadata = reader["out"]["metadata"].getValue()
+		self.assertEqual( readMetadata["EXPTIME"], IECore.DoubleData( 300.5 ) )
+		self.assertEqual( readMetadata["GAIN"], IECore.IntData( 120 ) )
+		self.assertEqual( readMetadata["OBJECT"], IECore.StringData( "It's M42 <& friends>" ) )
+		self.assertEqual( readMetadata["DATE-OBS"], IECore.StringData( "2021-01-02T03:04:05" ) )
+		self.assertEqual( readMetadata["COOLER"], IECore.BoolData( True ) )
+		self.assertEqual( readMetadata["COMMENT"], IECore.StringData( "First comment\nSecond comment" ) )
+		self.assertEqual( readMetadata["Instrument:Camera:Name"], IECore.StringData( "ZWO ASI1600MM" ) )
+		self.assertEqual( readMetadata["Instrument:Sensor:Temperature"], IECore.FloatData( -10.5 ) )
+		self.assertEqual( readMetadata["Observation:Time:Exposures"], IECore.IntData( 12 ) )
+		self.assertEqual( readMetadata["XISF:CreatorApplication"], IECore.StringData( "GafferAstro" ) )
+		self.assertNotIn( "NAXIS", readMetadata )
+
+	def testHash( self ) :
+
+		script = self.__rgb( 10, 10 )
+		image = script["image"]
+
+		writer = GafferAstro.XISFWriter()
+		self.assertEqual( writer["task"].hash(), IECore.MurmurHash() )
+
+		writer["in"].setInput( image["out"] )
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "hash.xisf" ) )
+
+		hashes = set()
+		for plug, value in (
+			( None, None ),
+			( writer["dataType"], "uint16" ),
+			( writer["compression"], "lz4" ),
+			( writer["byteShuffling"], False ),
+			( writer["channels"], "R" ),
+		) :
+			if plug is not None :
+				plug.setValue( value )
+			hashes.add( writer["task"].hash() )
+
+		self.assertEqual( len( hashes ), 5 )
+
+	def testErrors( self ) :
+
+		script = self.__rgb( 10, 10 )
+		image = script["image"]
+
+		writer = GafferAstro.XISFWriter()
+		self.assertRaisesRegex( RuntimeError, "No input image", writer["task"].execute )
+
+		writer["in"].setInput( image["out"] )
+		self.assertRaisesRegex( RuntimeError, "No file name", writer["task"].execute )
+
+		writer["fileName"].setValue( os.path.join( self.temporaryDirectory(), "errors.xisf" ) )
+		writer["channels"].setValue( "R G" )
+		self.assertRaisesRegex( RuntimeError, "Expected 1 or 3 channels", writer["task"].execute )
+
+		writer["channels"].setValue( "*" )
+		writer["compression"].setValue( "rle" )
+		self.assertRaisesRegex( RuntimeError, "Unsupported compression", writer["task"].execute )
+
+		self.assertFalse( os.path.exists( writer["fileName"].getValue() ) )
+
+if __name__ == "__main__":
+	unittest.main()
@@ -34,9 +34,15 @@
 #
 ##########################################################################
 
+from .CacheAlgoTest import CacheAlgoTest
 from .CollectChannelsTest import CollectChannelsTest
 from .ColorAlgoTest import ColorAlgoTest
 from .FileAlgoTest import FileAlgoTest
+from .FITSReaderTest import FITSReaderTest
+from .FITSWriterTest import FITSWriterTest
+from .PixInsightTest import PixInsightTest
+from .XISFReaderTest import XISFReaderTest
+from .XISFWriterTest import XISFWriterTest
 
 if __name__ == "__main__":
 	import unittest
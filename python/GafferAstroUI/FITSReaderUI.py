@@ -81,6 +81,42 @@ Gaffer.Metadata.registerNode(
 
 		],
 
+		"normalize" : [
+
+			"description",
+			"""
+			When on, integer images are scaled so that the largest value
+			representable by the file's BITPIX maps to 1. Floating point
+			images are unaffected.
+			""",
+
+		],
+
+		"hdu" : [
+
+			"description",
+			"""
+			The index of the HDU (Header Data Unit) to read, where 0 is
+			the primary HDU. The default of -1 reads the first HDU that
+			contains an image. Single plane images are loaded as Y, three
+			plane cubes as RGB, and other cubes as plane1, plane2 etc.
+			""",
+
+		],
+
+		"mipLevel" : [
+
+			"description",
+			"""
+			Outputs a reduced resolution preview of the image, halving
+			its size for each level. Previews are generated from the file
+			once, and held in memory, so that large images can be viewed
+			or resized without reading them in full each time. A value of
+			0 reads the image at full resolution.
+			""",
+
+		],
+
 	}
 
 )
@@ -0,0 +1,115 @@
+##########################################################################
+#
+#  Copyright (c) 2021, Tom Cowland. All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are
+#  met:
+#
+#      * Redistributions of source code must retain the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer.
+#
+#      * Redistributions in binary form must reproduce the above
+#        copyright notice, this list of conditions and the following
+#        disclaimer in the documentation and/or other materials provided with
+#        the distribution.
+#
+#      * Neither the name of Tom Cowland nor the names of
+#        any other contributors to this software may be used to endorse or
+#        promote products derived from this software without specific prior
+#        written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+#  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+#  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+#  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+#  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+#  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+#  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+#  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+#  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+#  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+#  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+##########################################################################
+
+import Gaffer
+import GafferAstro
+
+Gaffer.Metadata.registerNode(
+
+	GafferAstro.FITSWriter,
+
+	"description",
+	"""
+	Writes images to FITS files. Single channel images are written
+	as two dimensional images, and multiple channels as a cube with
+	one plane per channel, in the same order as they are loaded by
+	the FITSReader. Metadata is written as header cards.
+	""",
+
+	plugs = {
+
+		"in" : [
+
+			"description",
+			"""
+			The image to be written to disk.
+			""",
+
+		],
+
+		"fileName" : [
+
+			"description",
+			"""
+			The name of the file to be written. Any existing file is
+			overwritten, and missing directories are created.
+			""",
+
+			"plugValueWidget:type", "GafferUI.FileSystemPathPlugValueWidget",
+			"path:leaf", True,
+			"path:bookmarks", "fits",
+			"fileSystemPath:extensions", "fits fit fts",
+			"fileSystemPath:extensionsLabel", "Show only FITS files",
+
+		],
+
+		"channels" : [
+
+			"description",
+			"""
+			The names of the channels to be written. Names should be
+			separated by spaces and can use Gaffer's standard wildcards.
+			""",
+
+		],
+
+		"dataType" : [
+
+			"description",
+			"""
+			The type of the data stored in the file. 16 bit data is
+			unsigned, with 0-1 mapped to the full range of values.
+			""",
+
+			"preset:Float", "float",
+			"preset:UInt16", "uint16",
+
+			"plugValueWidget:type", "GafferUI.PresetsPlugValueWidget",
+
+		],
+
+		"out" : [
+
+			"description",
+			"""
+			A pass-through of the input image.
+			""",
+
+		],
+
+	}
+
+)
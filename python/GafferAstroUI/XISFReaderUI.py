@@ -47,6 +47,11 @@ Gaffer.Metadata.registerNode(
 	"description",
 	"""
 	Utility node which reads image files from disk using the PixInsight XISF library.
+
+	The first image in the file provides the main channels and the data
+	window. The channels of any further images, such as the rejection maps
+	written by ImageIntegration, are output as additional layers named
+	after the image's id, or `image<N>` if it doesn't have one.
 	""",
 
 	plugs = {
@@ -105,6 +110,19 @@ Gaffer.Metadata.registerNode(
 
 		],
 
+		"mipLevel" : [
+
+			"description",
+			"""
+			Outputs a reduced resolution preview of the image, halving
+			its size for each level. Previews are generated from the file
+			once, and held in memory, so that large images can be viewed
+			or resized without reading them in full each time. A value of
+			0 reads the image at full resolution.
+			""",
+
+		],
+
 		"availableFrames" : [
 
 			"description",
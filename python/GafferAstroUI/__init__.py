@@ -40,8 +40,10 @@ from . import MultiMonoImageReaderUI
 from . import ColoriseUI
 from . import ColoriseSHOUI
 from . import FITSReaderUI
+from . import FITSWriterUI
 from . import HueSaturationUI
 from . import XISFReaderUI
+from . import XISFWriterUI
 from . import LoadSHOUI
 from . import PixInsightUI
 from . import MultiPixInsightUI
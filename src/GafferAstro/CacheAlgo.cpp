@@ -0,0 +1,229 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+#include "GafferAstro/CacheAlgo.h"
+
+#include "GafferAstro/Private/Cache.h"
+
+#include "IECore/Exception.h"
+#include "IECore/SimpleTypedData.h"
+
+#include <algorithm>
+#include <vector>
+
+using namespace IECore;
+using namespace GafferAstro;
+using namespace GafferAstro::Private;
+
+//////////////////////////////////////////////////////////////////////////
+// Internal utilities
+//////////////////////////////////////////////////////////////////////////
+
+namespace
+{
+
+struct Registry
+{
+	std::mutex mutex;
+	std::vector<CacheBase *> caches;
+	// Policies requested by name, including those for
+	// caches which have not been created yet.
+	std::map<std::string, CacheAlgo::EvictionPolicy> evictionPolicies;
+};
+
+Registry &registry()
+{
+	static Registry *r = new Registry;
+	return *r;
+}
+
+} // namespace
+
+//////////////////////////////////////////////////////////////////////////
+// CacheBase
+//////////////////////////////////////////////////////////////////////////
+
+CacheBase::CacheBase( const std::string &name, Cost maxCost )
+	:	m_hits( 0 ), m_misses( 0 ), m_evictions( 0 ), m_name( name ), m_maxCost( maxCost ), m_evictionPolicy( CacheAlgo::LRU )
+{
+	Registry &r = registry();
+	std::lock_guard<std::mutex> lock( r.mutex );
+	auto it = r.evictionPolicies.find( name );
+	if( it != r.evictionPolicies.end() )
+	{
+		m_evictionPolicy = it->second;
+	}
+	r.caches.push_back( this );
+}
+
+CacheBase::~CacheBase()
+{
+	Registry &r = registry();
+	std::lock_guard<std::mutex> lock( r.mutex );
+	r.caches.erase( std::remove( r.caches.begin(), r.caches.end(), this ), r.caches.end() );
+}
+
+const std::string &CacheBase::name() const
+{
+	return m_name;
+}
+
+void CacheBase::setMaxCost( Cost maxCost )
+{
+	m_maxCost = maxCost;
+	limitCost();
+}
+
+CacheBase::Cost CacheBase::getMaxCost() const
+{
+	return m_maxCost;
+}
+
+void CacheBase::setEvictionPolicy( CacheAlgo::EvictionPolicy policy )
+{
+	if( policy == m_evictionPolicy )
+	{
+		return;
+	}
+
+	// Priorities aren't comparable between policies,
+	// so we must start again.
+	m_evictionPolicy = policy;
+	clear();
+}
+
+CacheAlgo::EvictionPolicy CacheBase::getEvictionPolicy() const
+{
+	return m_evictionPolicy;
+}
+
+CacheBase::Statistics CacheBase::statistics() const
+{
+	Statistics result;
+	result.hits = m_hits;
+	result.misses = m_misses;
+	result.evictions = m_evictions;
+	result.maxCost = m_maxCost;
+	usage( result.entries, result.currentCost );
+	return result;
+}
+
+void CacheBase::resetStatistics()
+{
+	m_hits = 0;
+	m_misses = 0;
+	m_evictions = 0;
+}
+
+void CacheBase::forEach( const std::function<void ( CacheBase *cache )> &f )
+{
+	Registry &r = registry();
+	std::lock_guard<std::mutex> lock( r.mutex );
+	for( auto cache : r.caches )
+	{
+		f( cache );
+	}
+}
+
+CacheBase *CacheBase::find( const std::string &name )
+{
+	Registry &r = registry();
+	std::lock_guard<std::mutex> lock( r.mutex );
+	for( auto cache : r.caches )
+	{
+		if( cache->name() == name )
+		{
+			return cache;
+		}
+	}
+	return nullptr;
+}
+
+//////////////////////////////////////////////////////////////////////////
+// CacheAlgo
+//////////////////////////////////////////////////////////////////////////
+
+IECore::CompoundDataPtr CacheAlgo::statistics()
+{
+	CompoundDataPtr result = new CompoundData;
+	CacheBase::forEach(
+		[&result] ( CacheBase *cache ) {
+			const CacheBase::Statistics s = cache->statistics();
+			CompoundDataPtr cacheStatistics = new CompoundData;
+			CompoundDataMap &m = cacheStatistics->writable();
+			m["hits"] = new UInt64Data( s.hits );
+			m["misses"] = new UInt64Data( s.misses );
+			m["evictions"] = new UInt64Data( s.evictions );
+			m["entries"] = new UInt64Data( s.entries );
+			m["currentCost"] = new UInt64Data( s.currentCost );
+			m["maxCost"] = new UInt64Data( s.maxCost );
+			m["evictionPolicy"] = new StringData( cache->getEvictionPolicy() == CostWeighted ? "CostWeighted" : "LRU" );
+			result->writable()[cache->name()] = cacheStatistics;
+		}
+	);
+	return result;
+}
+
+void CacheAlgo::resetStatistics()
+{
+	CacheBase::forEach( [] ( CacheBase *cache ) { cache->resetStatistics(); } );
+}
+
+void CacheAlgo::setEvictionPolicy( const std::string &cacheName, EvictionPolicy policy )
+{
+	{
+		Registry &r = registry();
+		std::lock_guard<std::mutex> lock( r.mutex );
+		r.evictionPolicies[cacheName] = policy;
+	}
+
+	if( CacheBase *cache = CacheBase::find( cacheName ) )
+	{
+		cache->setEvictionPolicy( policy );
+	}
+}
+
+CacheAlgo::EvictionPolicy CacheAlgo::getEvictionPolicy( const std::string &cacheName )
+{
+	if( const CacheBase *cache = CacheBase::find( cacheName ) )
+	{
+		return cache->getEvictionPolicy();
+	}
+
+	Registry &r = registry();
+	std::lock_guard<std::mutex> lock( r.mutex );
+	auto it = r.evictionPolicies.find( cacheName );
+	return it != r.evictionPolicies.end() ? it->second : LRU;
+}
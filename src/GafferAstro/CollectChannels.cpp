@@ -43,6 +43,14 @@
 
 #include "Gaffer/ArrayPlug.h"
 #include "Gaffer/Context.h"
+#include "Gaffer/ThreadState.h"
+
+#include "IECore/CompoundData.h"
+
+#include "tbb/blocked_range.h"
+#include "tbb/parallel_for.h"
+
+#include <memory>
 
 using namespace std;
 using namespace Imath;
@@ -91,6 +99,30 @@ string sourceChannel( const string &requestedChannel, const vector<string> &chan
 	return "";
 }
 
+// Calls `f( i )` for each of `channels`, with `channelVariable` set to
+// `channels[i]`. Calls are made in parallel, since each channel typically
+// comes from a different file, and evaluating its globals may need to open
+// it. Exceptions from `f` are propagated to the caller.
+template<typename F>
+void parallelForEachChannel( const string &channelVariable, const vector<string> &channels, F &&f )
+{
+	const InternedString variable( channelVariable );
+	const ThreadState &threadState = ThreadState::current();
+	tbb::task_group_context taskGroupContext( tbb::task_group_context::isolated );
+	tbb::parallel_for(
+		tbb::blocked_range<size_t>( 0, channels.size() ),
+		[&] ( const tbb::blocked_range<size_t> &range ) {
+			Context::EditableScope scope( threadState );
+			for( size_t i = range.begin(); i != range.end(); ++i )
+			{
+				scope.set( variable, &channels[i] );
+				f( i );
+			}
+		},
+		taskGroupContext
+	);
+}
+
 } // namespace
 
 //////////////////////////////////////////////////////////////////////////
@@ -109,6 +141,7 @@ CollectChannels::CollectChannels( const std::string &name )
 	addChild( new StringVectorDataPlug( "channels", Plug::In, new StringVectorData ) );
 	addChild( new StringPlug( "channelVariable", Plug::In, "collect:channelName" ) );
 	addChild( new StringPlug( "sourceChannel", Plug::In, "" ) );
+	addChild( new ObjectPlug( "__channelMap", Plug::Out, new CompoundObject ) );
 }
 
 CollectChannels::~CollectChannels()
@@ -145,6 +178,16 @@ const Gaffer::StringPlug *CollectChannels::sourceChannelPlug() const
 	return getChild<Gaffer::StringPlug>( g_firstPlugIndex + 2 );
 }
 
+Gaffer::ObjectPlug *CollectChannels::channelMapPlug()
+{
+	return getChild<Gaffer::ObjectPlug>( g_firstPlugIndex + 3 );
+}
+
+const Gaffer::ObjectPlug *CollectChannels::channelMapPlug() const
+{
+	return getChild<Gaffer::ObjectPlug>( g_firstPlugIndex + 3 );
+}
+
 
 void CollectChannels::affects( const Gaffer::Plug *input, AffectedPlugsContainer &outputs ) const
 {
@@ -160,7 +203,7 @@ void CollectChannels::affects( const Gaffer::Plug *input, AffectedPlugsContainer
 
 		if( input == imagePlug->channelNamesPlug() )
 		{
-			outputs.push_back( outPlug()->channelNamesPlug() );
+			outputs.push_back( channelMapPlug() );
 		}
 
 		if( input == imagePlug->channelDataPlug() )
@@ -192,7 +235,7 @@ void CollectChannels::affects( const Gaffer::Plug *input, AffectedPlugsContainer
 	}
 	else if( input == channelsPlug() || input == channelVariablePlug() || input == sourceChannelPlug() )
 	{
-		outputs.push_back( outPlug()->channelNamesPlug() );
+		outputs.push_back( channelMapPlug() );
 		outputs.push_back( outPlug()->channelDataPlug() );
 		outputs.push_back( outPlug()->dataWindowPlug() );
 		outputs.push_back( outPlug()->formatPlug() );
@@ -200,9 +243,55 @@ void CollectChannels::affects( const Gaffer::Plug *input, AffectedPlugsContainer
 		outputs.push_back( outPlug()->sampleOffsetsPlug() );
 		outputs.push_back( outPlug()->deepPlug() );
 	}
+	else if( input == channelMapPlug() )
+	{
+		outputs.push_back( outPlug()->channelNamesPlug() );
+		outputs.push_back( outPlug()->channelDataPlug() );
+	}
 
 }
 
+void CollectChannels::hash( const Gaffer::ValuePlug *output, const Gaffer::Context *context, IECore::MurmurHash &h ) const
+{
+	ImageProcessor::hash( output, context, h );
+
+	if( output == channelMapPlug() )
+	{
+		hashChannelMap( context, h );
+	}
+}
+
+void CollectChannels::compute( Gaffer::ValuePlug *output, const Gaffer::Context *context ) const
+{
+	if( output == channelMapPlug() )
+	{
+		static_cast<ObjectPlug *>( output )->setValue( computeChannelMap( context ) );
+		return;
+	}
+
+	ImageProcessor::compute( output, context );
+}
+
+Gaffer::ValuePlug::CachePolicy CollectChannels::hashCachePolicy( const Gaffer::ValuePlug *output ) const
+{
+	if( output == channelMapPlug() || output == outPlug()->dataWindowPlug() || output == outPlug()->deepPlug() )
+	{
+		// These are hashed in parallel across channels.
+		return ValuePlug::CachePolicy::TaskCollaboration;
+	}
+	return ImageProcessor::hashCachePolicy( output );
+}
+
+Gaffer::ValuePlug::CachePolicy CollectChannels::computeCachePolicy( const Gaffer::ValuePlug *output ) const
+{
+	if( output == channelMapPlug() || output == outPlug()->dataWindowPlug() || output == outPlug()->deepPlug() )
+	{
+		// These are computed in parallel across channels.
+		return ValuePlug::CachePolicy::TaskCollaboration;
+	}
+	return ImageProcessor::computeCachePolicy( output );
+}
+
 void CollectChannels::hashFormat( const GafferImage::ImagePlug *parent, const Gaffer::Context *context, IECore::MurmurHash &h ) const
 {
 	ConstStringVectorDataPtr channelsData = channelsPlug()->getValue();
@@ -242,42 +331,48 @@ void CollectChannels::hashDeep( const GafferImage::ImagePlug *parent, const Gaff
 	const std::string channelVariable = channelVariablePlug()->getValue();
 
 	ConstStringVectorDataPtr channelsData = channelsPlug()->getValue();
+	const vector<string> &channels = channelsData->readable();
 
-	Context::EditableScope editScope( context );
-	for( const auto &i : channelsData->readable() )
+	vector<MurmurHash> hashes( channels.size() );
+	parallelForEachChannel(
+		channelVariable, channels,
+		[this, &hashes] ( size_t i ) {
+			sourceChannelPlug()->hash( hashes[i] );
+			inPlug()->deepPlug()->hash( hashes[i] );
+		}
+	);
+
+	for( const auto &channelHash : hashes )
 	{
-		editScope.set( channelVariable, &i );
-		sourceChannelPlug()->hash( h );
-		inPlug()->deepPlug()->hash( h );
+		h.append( channelHash );
 	}
 }
 
 bool CollectChannels::computeDeep( const Gaffer::Context *context, const ImagePlug *parent ) const
 {
-	int outDeep = -1;
 	const std::string channelVariable = channelVariablePlug()->getValue();
 
 	ConstStringVectorDataPtr channelsData = channelsPlug()->getValue();
+	const vector<string> &channels = channelsData->readable();
 
-	Context::EditableScope editScope( context );
-	for( const auto &i : channelsData->readable() )
-	{
-		editScope.set( channelVariable, &i );
-		bool curDeep = inPlug()->deepPlug()->getValue();
-		if( outDeep == -1 )
-		{
-			outDeep = curDeep;
+	// Not a vector<bool>, as its elements can't be written concurrently.
+	std::unique_ptr<bool[]> deep( new bool[channels.size()] );
+	parallelForEachChannel(
+		channelVariable, channels,
+		[this, &deep] ( size_t i ) {
+			deep[i] = inPlug()->deepPlug()->getValue();
 		}
-		else
+	);
+
+	for( size_t i = 1; i < channels.size(); ++i )
+	{
+		if( deep[i] != deep[0] )
 		{
-			if( outDeep != curDeep )
-			{
-				throw IECore::Exception( "Input to CollectChannels must be consistent, but it is sometimes deep." );
-			}
+			throw IECore::Exception( "Input to CollectChannels must be consistent, but it is sometimes deep." );
 		}
 	}
 
-	return outDeep == 1;
+	return channels.size() && deep[0];
 }
 
 void CollectChannels::hashSampleOffsets( const GafferImage::ImagePlug *parent, const Gaffer::Context *context, IECore::MurmurHash &h ) const
@@ -378,14 +473,24 @@ void CollectChannels::hashDataWindow( const GafferImage::ImagePlug *output, cons
 		return;
 	}
 
-	Context::EditableScope editScope( context );
-	editScope.set( channelVariable, &channels[0] );
-	inPlug()->deepPlug()->hash( h );
-	for( unsigned int i = 0; i < channels.size(); i++ )
 	{
-		editScope.set( channelVariable, &channels[i] );
-		sourceChannelPlug()->hash( h );
-		inPlug()->dataWindowPlug()->hash( h );
+		Context::EditableScope editScope( context );
+		editScope.set( channelVariable, &channels[0] );
+		inPlug()->deepPlug()->hash( h );
+	}
+
+	vector<MurmurHash> hashes( channels.size() );
+	parallelForEachChannel(
+		channelVariable, channels,
+		[this, &hashes] ( size_t i ) {
+			sourceChannelPlug()->hash( hashes[i] );
+			inPlug()->dataWindowPlug()->hash( hashes[i] );
+		}
+	);
+
+	for( const auto &channelHash : hashes )
+	{
+		h.append( channelHash );
 	}
 }
 
@@ -403,13 +508,24 @@ Imath::Box2i CollectChannels::computeDataWindow( const Gaffer::Context *context,
 		return dataWindow;
 	}
 
-	Context::EditableScope editScope( context );
-	editScope.set( channelVariable, &channels[0] );
-	bool deep = inPlug()->deepPlug()->getValue();
+	bool deep;
+	{
+		Context::EditableScope editScope( context );
+		editScope.set( channelVariable, &channels[0] );
+		deep = inPlug()->deepPlug()->getValue();
+	}
+
+	vector<Box2i> dataWindows( channels.size() );
+	parallelForEachChannel(
+		channelVariable, channels,
+		[this, &dataWindows] ( size_t i ) {
+			dataWindows[i] = inPlug()->dataWindowPlug()->getValue();
+		}
+	);
+
 	for( unsigned int i = 0; i < channels.size(); i++ )
 	{
-		editScope.set( channelVariable, &channels[i] );
-		Box2i curDataWindow = inPlug()->dataWindowPlug()->getValue();
+		const Box2i &curDataWindow = dataWindows[i];
 		if( i == 0 || !deep )
 		{
 			dataWindow.extendBy( curDataWindow );
@@ -434,78 +550,35 @@ Imath::Box2i CollectChannels::computeDataWindow( const Gaffer::Context *context,
 void CollectChannels::hashChannelNames( const GafferImage::ImagePlug *output, const Gaffer::Context *context, IECore::MurmurHash &h ) const
 {
 	ImageProcessor::hashChannelNames( output, context, h );
-
-	const std::string channelVariable = channelVariablePlug()->getValue();
-
-	ConstStringVectorDataPtr channelsData = channelsPlug()->getValue();
-	const vector<string> &channels = channelsData->readable();
-
-	h.append( &(channels[0]), channels.size() );
-
-	Context::EditableScope editScope( context );
-	for( unsigned int i = 0; i < channels.size(); i++ )
-	{
-		editScope.set( channelVariable, &channels[i] );
-		sourceChannelPlug()->hash( h );
-		inPlug()->channelNamesPlug()->hash( h );
-	}
+	channelMapPlug()->hash( h );
 }
 
 IECore::ConstStringVectorDataPtr CollectChannels::computeChannelNames( const Gaffer::Context *context, const ImagePlug *parent ) const
 {
-	StringVectorDataPtr channelNamesData = new StringVectorData();
-	std::vector<string> &outChannelNames = channelNamesData->writable();
-
-	const std::string channelVariable = channelVariablePlug()->getValue();
-
-	ConstStringVectorDataPtr channelsData = channelsPlug()->getValue();
-	const vector<string> &channels = channelsData->readable();
-
-	Context::EditableScope editScope( context );
-	for( unsigned int i = 0; i < channels.size(); i++ )
-	{
-		editScope.set( channelVariable, &channels[i] );
-
-		ConstStringVectorDataPtr srcChannelsData = inPlug()->channelNamesPlug()->getValue();
-		const std::vector<string> &srcChannels = srcChannelsData->readable();
-
-		if( srcChannels.size() == 0 )
-		{
-			throw IECore::Exception( boost::str(
-				boost::format( "No source channels for output channel '%s'.") % channels[i]
-			) );
-		}
-
-		const string srcChannel = sourceChannel( sourceChannelPlug()->getValue(), srcChannels );
-		if( srcChannel.empty() )
-		{
-			throw IECore::Exception( boost::str(
-				boost::format( "No channel '%s' in input for output channel '%s'.") % sourceChannelPlug()->getValue() % channels[i]
-			) );
-		}
-		outChannelNames.push_back( channels[i] );
-	}
-
-	return channelNamesData;
+	ConstCompoundObjectPtr channelMap = runTimeCast<const CompoundObject>( channelMapPlug()->getValue() );
+	return channelMap->member<StringVectorData>( "channelNames" );
 }
 
 void CollectChannels::hashChannelData( const GafferImage::ImagePlug *parent, const Gaffer::Context *context, IECore::MurmurHash &h ) const
 {
 	const std::string &channelName = context->get<string>( ImagePlug::channelNameContextName );
 
-	string channelVariable, srcChannel;
+	ConstCompoundObjectPtr channelMap;
 	{
 		ImagePlug::GlobalScope c( context );
+		channelMap = runTimeCast<const CompoundObject>( channelMapPlug()->getValue() );
+	}
 
-		channelVariable = channelVariablePlug()->getValue();
-		c.set( channelVariable, &channelName );
-
-		ConstStringVectorDataPtr srcChannelsData = inPlug()->channelNamesPlug()->getValue();
-
-		sourceChannelPlug()->hash( h );
-		srcChannel = sourceChannel( sourceChannelPlug()->getValue(), srcChannelsData->readable() );
+	const StringData *srcChannelData = channelMap->member<CompoundData>( "sourceChannels" )->member<StringData>( channelName );
+	if( !srcChannelData )
+	{
+		h = ImagePlug::blackTile()->Object::hash();
+		return;
 	}
 
+	const string &channelVariable = channelMap->member<StringData>( "channelVariable" )->readable();
+	const string &srcChannel = srcChannelData->readable();
+
 	Context::EditableScope editScope( context );
 	editScope.set( channelVariable, &channelName );
 	editScope.set( ImagePlug::channelNameContextName, &srcChannel );
@@ -541,19 +614,21 @@ void CollectChannels::hashChannelData( const GafferImage::ImagePlug *parent, con
 
 IECore::ConstFloatVectorDataPtr CollectChannels::computeChannelData( const std::string &channelName, const Imath::V2i &tileOrigin, const Gaffer::Context *context, const ImagePlug *parent ) const
 {
-	ConstStringVectorDataPtr channelsData;
-	string channelVariable, srcChannel;
+	ConstCompoundObjectPtr channelMap;
 	{
 		ImagePlug::GlobalScope c( context );
+		channelMap = runTimeCast<const CompoundObject>( channelMapPlug()->getValue() );
+	}
 
-		channelVariable = channelVariablePlug()->getValue();
-		c.set( channelVariable, &channelName );
-
-		ConstStringVectorDataPtr srcChannelsData = inPlug()->channelNamesPlug()->getValue();
-
-		srcChannel = sourceChannel( sourceChannelPlug()->getValue(), srcChannelsData->readable() );
+	const StringData *srcChannelData = channelMap->member<CompoundData>( "sourceChannels" )->member<StringData>( channelName );
+	if( !srcChannelData )
+	{
+		return ImagePlug::blackTile();
 	}
 
+	const string &channelVariable = channelMap->member<StringData>( "channelVariable" )->readable();
+	const string &srcChannel = srcChannelData->readable();
+
 	Context::EditableScope editScope( context );
 	editScope.set( channelVariable, &channelName );
 
@@ -602,3 +677,77 @@ IECore::ConstFloatVectorDataPtr CollectChannels::computeChannelData( const std::
 	}
 }
 
+void CollectChannels::hashChannelMap( const Gaffer::Context *context, IECore::MurmurHash &h ) const
+{
+	const std::string channelVariable = channelVariablePlug()->getValue();
+	h.append( channelVariable );
+
+	ConstStringVectorDataPtr channelsData = channelsPlug()->getValue();
+	const vector<string> &channels = channelsData->readable();
+	h.append( channels.data(), channels.size() );
+
+	vector<MurmurHash> hashes( channels.size() );
+	parallelForEachChannel(
+		channelVariable, channels,
+		[this, &hashes] ( size_t i ) {
+			sourceChannelPlug()->hash( hashes[i] );
+			inPlug()->channelNamesPlug()->hash( hashes[i] );
+		}
+	);
+
+	for( const auto &channelHash : hashes )
+	{
+		h.append( channelHash );
+	}
+}
+
+IECore::ConstCompoundObjectPtr CollectChannels::computeChannelMap( const Gaffer::Context *context ) const
+{
+	CompoundObjectPtr result = new CompoundObject;
+
+	const std::string channelVariable = channelVariablePlug()->getValue();
+	result->members()["channelVariable"] = new StringData( channelVariable );
+
+	ConstStringVectorDataPtr channelsData = channelsPlug()->getValue();
+	const vector<string> &channels = channelsData->readable();
+	result->members()["channelNames"] = channelsData->copy();
+
+	// Gather the inputs for each channel in parallel, and then validate
+	// them in order, so errors are reported consistently.
+	vector<ConstStringVectorDataPtr> srcChannelsData( channels.size() );
+	vector<string> requestedChannels( channels.size() );
+	parallelForEachChannel(
+		channelVariable, channels,
+		[this, &srcChannelsData, &requestedChannels] ( size_t i ) {
+			srcChannelsData[i] = inPlug()->channelNamesPlug()->getValue();
+			requestedChannels[i] = sourceChannelPlug()->getValue();
+		}
+	);
+
+	CompoundDataPtr sourceChannelsData = new CompoundData;
+	auto &sourceChannels = sourceChannelsData->writable();
+	result->members()["sourceChannels"] = sourceChannelsData;
+
+	for( size_t i = 0; i < channels.size(); ++i )
+	{
+		const std::vector<string> &srcChannels = srcChannelsData[i]->readable();
+		if( srcChannels.size() == 0 )
+		{
+			throw IECore::Exception( boost::str(
+				boost::format( "No source channels for output channel '%s'.") % channels[i]
+			) );
+		}
+
+		const string srcChannel = sourceChannel( requestedChannels[i], srcChannels );
+		if( srcChannel.empty() )
+		{
+			throw IECore::Exception( boost::str(
+				boost::format( "No channel '%s' in input for output channel '%s'.") % requestedChannels[i] % channels[i]
+			) );
+		}
+
+		sourceChannels[channels[i]] = new StringData( srcChannel );
+	}
+
+	return result;
+}
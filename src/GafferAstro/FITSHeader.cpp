@@ -0,0 +1,651 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#include "GafferAstro/Private/FITSHeader.h"
+
+#include "GafferAstro/Private/Cache.h"
+
+#include "IECore/Exception.h"
+#include "IECore/SimpleTypedData.h"
+
+#include "boost/algorithm/string/predicate.hpp"
+#include "boost/algorithm/string/trim.hpp"
+#include "boost/filesystem/operations.hpp"
+#include "boost/format.hpp"
+#include "boost/noncopyable.hpp"
+
+#include <algorithm>
+#include <cctype>
+#include <cstdlib>
+#include <fstream>
+#include <memory>
+#include <limits>
+#include <mutex>
+
+using namespace IECore;
+using namespace GafferAstro::Private;
+
+//////////////////////////////////////////////////////////////////////////
+// Internal utilities
+//////////////////////////////////////////////////////////////////////////
+
+namespace
+{
+
+const size_t g_blockSize = 2880;
+const size_t g_cardSize = 80;
+
+bool isInteger( const std::string &value )
+{
+	size_t i = ( !value.empty() && ( value[0] == '+' || value[0] == '-' ) ) ? 1 : 0;
+	return i < value.size() && std::all_of( value.begin() + i, value.end(), ::isdigit );
+}
+
+bool parseFloat( std::string value, double &result )
+{
+	// FITS allows a `D` exponent for double precision values.
+	std::replace( value.begin(), value.end(), 'D', 'E' );
+	char *end = nullptr;
+	result = std::strtod( value.c_str(), &end );
+	return !value.empty() && *end == '\0';
+}
+
+// Parses the value starting at `i` in `card` into `result`, returning the
+// position following the value, or `npos` if the value extends to the end.
+size_t parseValue( const std::string &card, size_t i, FITSHeader::Card &result )
+{
+	if( card[i] == '\'' )
+	{
+		// String value. Quotes are escaped by doubling them up.
+		for( ++i; i < card.size(); ++i )
+		{
+			if( card[i] == '\'' )
+			{
+				if( i + 1 < card.size() && card[i+1] == '\'' )
+				{
+					++i;
+				}
+				else
+				{
+					++i;
+					break;
+				}
+			}
+			result.value.push_back( card[i] );
+		}
+		boost::algorithm::trim_right( result.value );
+		result.type = FITSHeader::Card::String;
+	}
+	else
+	{
+		const size_t end = card.find( '/', i );
+		result.value = boost::algorithm::trim_copy( card.substr( i, end == std::string::npos ? std::string::npos : end - i ) );
+		i = end;
+
+		double d;
+		if( result.value == "T" || result.value == "F" )
+		{
+			result.type = FITSHeader::Card::Logical;
+		}
+		else if( isInteger( result.value ) )
+		{
+			result.type = FITSHeader::Card::Integer;
+		}
+		else if( parseFloat( result.value, d ) )
+		{
+			result.type = FITSHeader::Card::Float;
+		}
+		else
+		{
+			// Complex values and anything else we don't
+			// understand are passed through as strings.
+			result.type = FITSHeader::Card::String;
+		}
+	}
+
+	return i;
+}
+
+FITSHeader::Card parseCard( const char *data )
+{
+	FITSHeader::Card result;
+	result.type = FITSHeader::Card::None;
+
+	const std::string card( data, g_cardSize );
+	result.keyword = boost::algorithm::trim_right_copy( card.substr( 0, 8 ) );
+
+	if( card.compare( 8, 2, "= " ) != 0 )
+	{
+		// Commentary card (COMMENT, HISTORY, blank etc).
+		result.comment = boost::algorithm::trim_right_copy( card.substr( 8 ) );
+		return result;
+	}
+
+	size_t i = card.find_first_not_of( ' ', 10 );
+	if( i == std::string::npos )
+	{
+		// Undefined value
+		return result;
+	}
+
+	i = parseValue( card, i, result );
+
+	const size_t commentStart = card.find( '/', i == std::string::npos ? card.size() : i );
+	if( commentStart != std::string::npos )
+	{
+		result.comment = boost::algorithm::trim_copy( card.substr( commentStart + 1 ) );
+	}
+
+	return result;
+}
+
+// Metadata
+// ========
+
+// Keywords describing the layout of the data, rather than its content.
+// These are omitted from the metadata as they are reflected in the
+// image itself, and would be invalid if written out unchanged. This
+// includes the keywords used to describe tile compressed images, which
+// are stored in binary tables.
+bool isStructural( const std::string &keyword )
+{
+	static const std::vector<std::string> g_structuralKeywords = {
+		"SIMPLE", "XTENSION", "BITPIX", "NAXIS", "EXTEND", "PCOUNT", "GCOUNT", "BSCALE", "BZERO", "BLANK", "INHERIT",
+		"ZIMAGE", "ZSIMPLE", "ZTENSION", "ZBITPIX", "ZNAXIS", "ZEXTEND", "ZPCOUNT", "ZGCOUNT", "ZCMPTYPE",
+		"ZQUANTIZ", "ZDITHER0", "ZBLOCKED", "ZHECKSUM", "ZDATASUM", "TFIELDS", "THEAP"
+	};
+
+	static const std::vector<std::string> g_indexedStructuralKeywords = {
+		"NAXIS", "ZNAXIS", "ZTILE", "ZNAME", "ZVAL", "TTYPE", "TFORM", "TUNIT"
+	};
+
+	if( std::find( g_structuralKeywords.begin(), g_structuralKeywords.end(), keyword ) != g_structuralKeywords.end() )
+	{
+		return true;
+	}
+
+	for( const auto &prefix : g_indexedStructuralKeywords )
+	{
+		if( boost::starts_with( keyword, prefix ) && isInteger( keyword.substr( prefix.size() ) ) )
+		{
+			return true;
+		}
+	}
+
+	return false;
+}
+
+DataPtr cardData( const FITSHeader::Card &card )
+{
+	switch( card.type )
+	{
+		case FITSHeader::Card::String :
+			return new StringData( card.value );
+		case FITSHeader::Card::Logical :
+			return new BoolData( card.value == "T" );
+		case FITSHeader::Card::Integer :
+		{
+			const long long value = std::strtoll( card.value.c_str(), nullptr, 10 );
+			if( value >= std::numeric_limits<int>::min() && value <= std::numeric_limits<int>::max() )
+			{
+				return new IntData( value );
+			}
+			return new Int64Data( value );
+		}
+		case FITSHeader::Card::Float :
+		{
+			double value = 0.0;
+			parseFloat( card.value, value );
+			return new DoubleData( value );
+		}
+		default :
+			return nullptr;
+	}
+}
+
+CompoundDataPtr metadata( const std::vector<FITSHeader::Card> &cards )
+{
+	CompoundDataPtr result = new CompoundData;
+	CompoundDataMap &members = result->writable();
+
+	for( const auto &card : cards )
+	{
+		if( card.keyword == "COMMENT" || card.keyword == "HISTORY" )
+		{
+			auto it = members.find( card.keyword );
+			if( it == members.end() )
+			{
+				members[card.keyword] = new StringData( card.comment );
+			}
+			else
+			{
+				static_cast<StringData *>( it->second.get() )->writable() += "\n" + card.comment;
+			}
+			continue;
+		}
+
+		if( card.keyword.empty() || isStructural( card.keyword ) || members.count( card.keyword ) )
+		{
+			continue;
+		}
+
+		if( DataPtr data = cardData( card ) )
+		{
+			members[card.keyword] = data;
+		}
+	}
+
+	return result;
+}
+
+// Cache
+// =====
+
+// The cache is keyed on file name and modification time, so edits to a file
+// are picked up without needing to clear the cache. The GetterKey carries the
+// file name separately, so the getter doesn't need to parse the key.
+struct HeaderCacheGetterKey
+{
+
+	HeaderCacheGetterKey( const std::string &fileName )
+		:	fileName( fileName ), key( FITSHeader::fileKey( fileName ) )
+	{
+	}
+
+	operator const std::string &() const
+	{
+		return key;
+	}
+
+	std::string fileName;
+	std::string key;
+
+};
+
+// The headers of a file, parsed on demand. Most files are only ever asked
+// for their first image, so rather than walking the whole file up front, we
+// stop reading as soon as we reach the requested HDU, and continue from there
+// if a later one is requested.
+class HeaderList : boost::noncopyable
+{
+
+	public :
+
+		HeaderList( const std::string &fileName )
+			:	m_fileName( fileName ), m_complete( false )
+		{
+			std::ifstream stream;
+			readNext( stream );
+		}
+
+		// Returns the header for `hdu`, or null if the file has fewer HDUs.
+		ConstFITSHeaderPtr header( int hdu )
+		{
+			std::lock_guard<std::mutex> lock( m_mutex );
+			std::ifstream stream;
+			while( hdu >= (int)m_headers.size() )
+			{
+				if( !readNext( stream ) )
+				{
+					return nullptr;
+				}
+			}
+			return m_headers[hdu];
+		}
+
+		// Returns the header of the first HDU containing an image, or null
+		// if there isn't one.
+		ConstFITSHeaderPtr firstImage()
+		{
+			std::lock_guard<std::mutex> lock( m_mutex );
+			std::ifstream stream;
+			for( size_t i = 0; i < m_headers.size() || readNext( stream ); ++i )
+			{
+				if( m_headers[i]->isImage() )
+				{
+					return m_headers[i];
+				}
+			}
+			return nullptr;
+		}
+
+		// The number of HDUs read so far. This is the total number in the
+		// file once `header()` or `firstImage()` has returned null.
+		size_t size() const
+		{
+			std::lock_guard<std::mutex> lock( m_mutex );
+			return m_headers.size();
+		}
+
+	private :
+
+		// Reads the header following the last one read, skipping over its
+		// data unit. Returns false if there are no more headers. The stream
+		// is opened if necessary, so that consecutive reads can share it.
+		bool readNext( std::ifstream &stream )
+		{
+			if( m_complete )
+			{
+				return false;
+			}
+
+			if( !stream.is_open() )
+			{
+				stream.open( m_fileName, std::ios::binary );
+				if( !stream.is_open() )
+				{
+					throw IECore::IOException( "Unable to open \"" + m_fileName + "\"" );
+				}
+			}
+
+			if( m_headers.empty() )
+			{
+				m_headers.push_back( new FITSHeader( stream, 0 ) );
+				return true;
+			}
+
+			const FITSHeader *previous = m_headers.back().get();
+			stream.clear();
+			stream.seekg( previous->dataOffset() + previous->dataSize() );
+			if( stream.peek() == std::char_traits<char>::eof() )
+			{
+				m_complete = true;
+				return false;
+			}
+
+			try
+			{
+				m_headers.push_back( new FITSHeader( stream, m_headers.size() ) );
+			}
+			catch( const std::exception & )
+			{
+				// Tolerate trailing junk after the last extension,
+				// which is not uncommon in the wild.
+				m_complete = true;
+				return false;
+			}
+
+			return true;
+		}
+
+		const std::string m_fileName;
+		mutable std::mutex m_mutex;
+		std::vector<ConstFITSHeaderPtr> m_headers;
+		bool m_complete;
+
+};
+
+typedef std::shared_ptr<HeaderList> HeaderListPtr;
+
+// Reads just the primary header, leaving the rest of the file until
+// it is needed. Files are costed individually, as we don't know how
+// many headers they have.
+HeaderListPtr headerCacheGetter( const HeaderCacheGetterKey &key, size_t &cost )
+{
+	cost = 1;
+	return std::make_shared<HeaderList>( key.fileName );
+}
+
+typedef Cache<std::string, HeaderListPtr, HeaderCacheGetterKey> HeaderCache;
+
+HeaderCache *headerCache()
+{
+	static HeaderCache *c = new HeaderCache( "FITSHeader", headerCacheGetter, 1000 );
+	return c;
+}
+
+} // namespace
+
+//////////////////////////////////////////////////////////////////////////
+// FITSHeader
+//////////////////////////////////////////////////////////////////////////
+
+FITSHeader::FITSHeader( std::istream &stream, int hdu )
+	:	m_hdu( hdu ), m_offset( stream.tellg() ), m_size( 0 )
+{
+	char block[g_blockSize];
+	while( true )
+	{
+		stream.read( block, g_blockSize );
+		if( stream.gcount() != (std::streamsize)g_blockSize )
+		{
+			throw IECore::Exception( "Unexpected end of file while reading FITS header" );
+		}
+		m_size += g_blockSize;
+
+		for( size_t offset = 0; offset < g_blockSize; offset += g_cardSize )
+		{
+			Card card = parseCard( block + offset );
+			if( m_cards.empty() && card.keyword != ( hdu ? "XTENSION" : "SIMPLE" ) )
+			{
+				throw IECore::Exception( "Not a FITS file" );
+			}
+
+			if( card.keyword == "END" )
+			{
+				m_metadata = ::metadata( m_cards );
+				return;
+			}
+			m_cards.push_back( card );
+		}
+	}
+}
+
+FITSHeader::~FITSHeader()
+{
+}
+
+const std::vector<FITSHeader::Card> &FITSHeader::cards() const
+{
+	return m_cards;
+}
+
+const FITSHeader::Card *FITSHeader::card( const std::string &keyword ) const
+{
+	for( const auto &c : m_cards )
+	{
+		if( c.keyword == keyword )
+		{
+			return &c;
+		}
+	}
+	return nullptr;
+}
+
+long long FITSHeader::intValue( const std::string &keyword, long long defaultValue ) const
+{
+	const Card *c = card( keyword );
+	if( !c || c->type != Card::Integer )
+	{
+		return defaultValue;
+	}
+	return std::strtoll( c->value.c_str(), nullptr, 10 );
+}
+
+double FITSHeader::floatValue( const std::string &keyword, double defaultValue ) const
+{
+	const Card *c = card( keyword );
+	double result;
+	if( !c || ( c->type != Card::Integer && c->type != Card::Float ) || !parseFloat( c->value, result ) )
+	{
+		return defaultValue;
+	}
+	return result;
+}
+
+const IECore::CompoundData *FITSHeader::metadata() const
+{
+	return m_metadata.get();
+}
+
+FITSHeader::Card FITSHeader::makeCard( const std::string &keyword, const std::string &value, const std::string &comment )
+{
+	Card result;
+	result.keyword = boost::algorithm::trim_copy( keyword );
+	result.comment = comment;
+	result.type = Card::None;
+
+	const std::string trimmedValue = boost::algorithm::trim_copy( value );
+	if( !trimmedValue.empty() )
+	{
+		parseValue( trimmedValue, 0, result );
+	}
+
+	return result;
+}
+
+IECore::CompoundDataPtr FITSHeader::cardsMetadata( const std::vector<Card> &cards )
+{
+	return ::metadata( cards );
+}
+
+bool FITSHeader::isStructuralKeyword( const std::string &keyword )
+{
+	return isStructural( keyword );
+}
+
+int FITSHeader::hdu() const
+{
+	return m_hdu;
+}
+
+bool FITSHeader::isImage() const
+{
+	if( isCompressed() )
+	{
+		return intValue( "ZNAXIS" ) >= 2;
+	}
+
+	if( m_hdu )
+	{
+		const Card *extension = card( "XTENSION" );
+		if( !extension || extension->value != "IMAGE" )
+		{
+			return false;
+		}
+	}
+
+	return intValue( "NAXIS" ) >= 2;
+}
+
+bool FITSHeader::isCompressed() const
+{
+	const Card *c = card( "ZIMAGE" );
+	return m_hdu && c && c->type == Card::Logical && c->value == "T";
+}
+
+long long FITSHeader::imageIntValue( const std::string &keyword, long long defaultValue ) const
+{
+	return intValue( isCompressed() ? "Z" + keyword : keyword, defaultValue );
+}
+
+size_t FITSHeader::offset() const
+{
+	return m_offset;
+}
+
+size_t FITSHeader::size() const
+{
+	return m_size;
+}
+
+size_t FITSHeader::dataOffset() const
+{
+	return m_offset + m_size;
+}
+
+size_t FITSHeader::dataSize() const
+{
+	const long long numAxes = intValue( "NAXIS" );
+	if( numAxes <= 0 )
+	{
+		return 0;
+	}
+
+	size_t numSamples = 1;
+	for( long long i = 1; i <= numAxes; ++i )
+	{
+		numSamples *= intValue( "NAXIS" + std::to_string( i ) );
+	}
+
+	numSamples = ( numSamples + intValue( "PCOUNT", 0 ) ) * intValue( "GCOUNT", 1 );
+	const size_t size = numSamples * std::abs( intValue( "BITPIX" ) ) / 8;
+
+	return ( ( size + g_blockSize - 1 ) / g_blockSize ) * g_blockSize;
+}
+
+ConstFITSHeaderPtr FITSHeader::read( const std::string &fileName, int hdu )
+{
+	if( !boost::filesystem::exists( fileName ) )
+	{
+		throw IECore::IOException( "File \"" + fileName + "\" does not exist" );
+	}
+
+	HeaderListPtr headers = headerCache()->get( HeaderCacheGetterKey( fileName ) );
+
+	if( hdu < 0 )
+	{
+		if( ConstFITSHeaderPtr header = headers->firstImage() )
+		{
+			return header;
+		}
+		throw IECore::Exception( "No image HDUs found" );
+	}
+
+	if( ConstFITSHeaderPtr header = headers->header( hdu ) )
+	{
+		return header;
+	}
+
+	throw IECore::Exception( boost::str( boost::format( "HDU %d does not exist (file has %d HDUs)" ) % hdu % headers->size() ) );
+}
+
+void FITSHeader::clearCache()
+{
+	headerCache()->clear();
+}
+
+std::string FITSHeader::fileKey( const std::string &fileName )
+{
+	// Errors are left for whoever opens the file to report.
+	const boost::filesystem::path path( fileName );
+	boost::system::error_code error;
+	const std::time_t modificationTime = boost::filesystem::last_write_time( path, error );
+	const boost::uintmax_t size = error ? 0 : boost::filesystem::file_size( path, error );
+	return boost::str(
+		boost::format( "%s:%d:%d" ) % fileName % ( error ? 0 : modificationTime ) % ( error ? 0 : size )
+	);
+}
@@ -36,21 +36,42 @@
 
 #include "GafferAstro/FITSReader.h"
 
+#include "GafferAstro/Private/Cache.h"
+#include "GafferAstro/Private/FITSHeader.h"
+#include "GafferAstro/Private/MipPyramid.h"
+
+#include "GafferImage/BufferAlgo.h"
 #include "GafferImage/FormatPlug.h"
 
+#include "Gaffer/Context.h"
+
 #include "IECore/CompoundData.h"
 
 #include "OpenEXR/ImathBox.h"
 
-#include <CCfits/CCfits>
+#include "boost/bind.hpp"
+#include "boost/format.hpp"
+#include "boost/iostreams/device/mapped_file.hpp"
+#include "boost/noncopyable.hpp"
+
+#include "tbb/enumerable_thread_specific.h"
 
-#include <tbb/mutex.h>
+#include <fitsio.h>
 
-using namespace CCfits;
+#include <algorithm>
+#include <cmath>
+#include <condition_variable>
+#include <cstdint>
+#include <cstring>
+#include <mutex>
+#include <numeric>
+
+using namespace Imath;
 using namespace IECore;
 using namespace Gaffer;
 using namespace GafferImage;
 using namespace GafferAstro;
+using namespace GafferAstro::Private;
 
 //////////////////////////////////////////////////////////////////////////
 // File implementation
@@ -58,128 +79,717 @@ using namespace GafferAstro;
 
 namespace {
 
-static tbb::mutex g_readMutex;
+const IECore::InternedString g_tileBatchIndexContextName( "__tileBatchIndex" );
+
+// cfitsio handles may not be used concurrently from multiple threads, but
+// separate handles to the same file may (provided cfitsio is built with
+// --enable-reentrant). We keep a small pool of handles per file so that
+// tiles can be read in parallel, without opening an unbounded number of
+// descriptors when many threads hit the same file.
+const size_t g_maxHandlesPerFile = 4;
+
+// The maximum height of a tile batch (in tiles) used when aligning
+// batches with the tiles of compressed images.
+const int g_maxCompressedBatchHeight = 16;
+
+tbb::enumerable_thread_specific<std::vector<float>> g_scratchBuffers;
+tbb::enumerable_thread_specific<std::vector<char>> g_rawScratchBuffers;
+
+// The capacity each thread's scratch buffers may retain between batches.
+// Batches of wide images, cubes or tall compressed batches can need far
+// more, and buffers that grow beyond this are released after use, so
+// that they aren't held for the life of the process outside any cache.
+const size_t g_maxRetainedScratchSize = 16 * 1024 * 1024;
+
+// Provides the calling thread's scratch buffer for the lifetime of
+// the object, releasing its memory afterwards if it has grown too big.
+template<typename T>
+class ScratchBuffer : boost::noncopyable
+{
+
+	public :
+
+		ScratchBuffer( tbb::enumerable_thread_specific<std::vector<T>> &buffers )
+			: m_buffer( buffers.local() )
+		{
+		}
+
+		~ScratchBuffer()
+		{
+			if( m_buffer.capacity() * sizeof( T ) > g_maxRetainedScratchSize )
+			{
+				std::vector<T>().swap( m_buffer );
+			}
+		}
+
+		std::vector<T> &get()
+		{
+			return m_buffer;
+		}
+
+	private :
+
+		std::vector<T> &m_buffer;
+
+};
+
+void throwIfError( int status, const std::string &fileName )
+{
+	if( status )
+	{
+		char message[FLEN_STATUS];
+		fits_get_errstatus( status, message );
+		throw IECore::Exception( boost::str( boost::format( "FITSReader : Error reading \"%s\" : %s" ) % fileName % message ) );
+	}
+}
+
+// FITS data is always big endian. Swaps `numSamples` samples of `sampleSize`
+// bytes in place, if required to match the host.
+void bigEndianToNative( void *data, size_t numSamples, size_t sampleSize )
+{
+#if __BYTE_ORDER__ == __ORDER_LITTLE_ENDIAN__
+	switch( sampleSize )
+	{
+		case 2 :
+		{
+			uint16_t *d = static_cast<uint16_t *>( data );
+			for( size_t i = 0; i < numSamples; ++i )
+			{
+				d[i] = __builtin_bswap16( d[i] );
+			}
+			break;
+		}
+		case 4 :
+		{
+			uint32_t *d = static_cast<uint32_t *>( data );
+			for( size_t i = 0; i < numSamples; ++i )
+			{
+				d[i] = __builtin_bswap32( d[i] );
+			}
+			break;
+		}
+		case 8 :
+		{
+			uint64_t *d = static_cast<uint64_t *>( data );
+			for( size_t i = 0; i < numSamples; ++i )
+			{
+				d[i] = __builtin_bswap64( d[i] );
+			}
+			break;
+		}
+		default :
+			break;
+	}
+#endif
+}
+
+// A simple loop that compilers will vectorise, converting raw samples
+// to float and applying BSCALE/BZERO and normalisation in one pass.
+template<typename T>
+void convertSamples( const T *src, float *dst, size_t numSamples, float scale, float offset )
+{
+	for( size_t i = 0; i < numSamples; ++i )
+	{
+		dst[i] = static_cast<float>( src[i] ) * scale + offset;
+	}
+}
+
+// Returns the number of image planes described by the header, throwing if
+// the header isn't a 2D image or 3D cube.
+int numPlanes( const FITSHeader *header )
+{
+	const int numAxes = header->imageIntValue( "NAXIS" );
+	if( numAxes < 2 )
+	{
+		throw IECore::Exception( "Invalid number of image axes" );
+	}
+
+	// Degenerate higher dimensions are allowed, and ignored
+	for( int i = 4; i <= numAxes; ++i )
+	{
+		if( header->imageIntValue( "NAXIS" + std::to_string( i ) ) != 1 )
+		{
+			throw IECore::Exception( "Invalid number of image axes" );
+		}
+	}
+
+	return numAxes >= 3 ? header->imageIntValue( "NAXIS3" ) : 1;
+}
+
+Box2i dataWindow( const FITSHeader *header )
+{
+	numPlanes( header );
+	return Box2i( V2i( 0 ), V2i( header->imageIntValue( "NAXIS1" ), header->imageIntValue( "NAXIS2" ) ) );
+}
+
+Box2i mipDataWindow( const FITSHeader *header, int mipLevel )
+{
+	return Box2i( V2i( 0 ), MipPyramid::levelSize( dataWindow( header ).size(), mipLevel ) );
+}
+
+// Single plane images are loaded as luminance, and three plane cubes as RGB. Other
+// cubes have their planes named `plane1`, `plane2` etc, matching FITS's one-based
+// pixel indices.
+IECore::StringVectorDataPtr channelNames( const FITSHeader *header )
+{
+	const int planes = numPlanes( header );
+
+	IECore::StringVectorDataPtr result = new IECore::StringVectorData();
+	std::vector<std::string> &names = result->writable();
+	if( planes == 1 )
+	{
+		names.push_back( "Y" );
+	}
+	else if( planes == 3 )
+	{
+		names = { "R", "G", "B" };
+	}
+	else
+	{
+		for( int i = 1; i <= planes; ++i )
+		{
+			names.push_back( "plane" + std::to_string( i ) );
+		}
+	}
 
+	return result;
+}
 
 class File
 {
 	public :
 
-		File( const std::string &fileName )
-			: m_fileName( fileName )
+		File( const std::string &fileName, int hdu )
+			: m_fileName( fileName ), m_mappedData( nullptr ), m_numHandles( 0 )
 		{
-			try
+			m_header = FITSHeader::read( fileName, hdu );
+
+			m_dataWindow = ::dataWindow( m_header.get() );
+			m_channelNames = ::channelNames( m_header.get() );
+			m_numPlanes = m_channelNames->readable().size();
+
+			m_bitpix = m_header->imageIntValue( "BITPIX" );
+			m_scale = m_header->floatValue( "BSCALE", 1.0 );
+			m_zero = m_header->floatValue( "BZERO", 0.0 );
+
+			m_mipKey = MipPyramid::fileKey( fileName ) + ":" + std::to_string( m_header->hdu() );
+
+			// A tile batch is wide enough to hold a full scanline, and holds this band
+			// of tiles for every plane, so that cubes are read in a single pass.
+			m_tileBatchSize = V2i(
+				( m_dataWindow.max.x + ImagePlug::tileSize() - 1 ) / ImagePlug::tileSize(),
+				1
+			);
+
+			if( m_header->isCompressed() )
 			{
-				m_fits.reset( new FITS( fileName, CCfits::Read, false ) );
+				// cfitsio must decompress whole compression tiles, so if a batch
+				// ends part way through one, it will be decompressed again for the
+				// next batch. Where possible we make the batch height a multiple of
+				// the compression tile height to avoid this. With the default
+				// row-by-row compression used by fpack, batches remain one tile high.
+				const int compressionTileHeight = std::max<int>( 1, m_header->intValue( "ZTILE2", 1 ) );
+				const int alignedRows = std::lcm( ImagePlug::tileSize(), compressionTileHeight );
+				m_tileBatchSize.y = alignedRows / ImagePlug::tileSize();
+				if( m_tileBatchSize.y > g_maxCompressedBatchHeight )
+				{
+					// Alignment would make batches unreasonably large, and no height
+					// within the cap puts every batch boundary on a compression tile
+					// boundary. Settle for batches at least as tall as a compression
+					// tile, so that a compression tile straddling a batch boundary is
+					// decompressed twice rather than once per tile row. Compression
+					// tiles taller than the cap are decompressed once for each batch
+					// they overlap.
+					m_tileBatchSize.y = std::min(
+						( compressionTileHeight + ImagePlug::tileSize() - 1 ) / ImagePlug::tileSize(),
+						g_maxCompressedBatchHeight
+					);
+				}
 			}
-			catch( CCfits::FitsException &e )
+			else
 			{
-				throw IECore::Exception( e.message() );
-				m_fits = nullptr;
+				mapData();
 			}
 		}
 
-		CompoundDataPtr metadata()
+		const Imath::Box2i &dataWindow() const
 		{
-			CompoundDataPtr result = new CompoundData();
-			if( m_fits )
+			return m_dataWindow;
+		}
+
+		// Reads a chunk of data from the file, formatted as a tile batch to be stored
+		// on FITSReader::tileBatchPlug(). A tile batch is an ObjectVector of channelData
+		// tiles, covering a band of tile rows across the full width of the image for
+		// every plane, so reading a whole image issues just one read per tile row.
+		ConstObjectVectorPtr readTileBatch( const V3i &tileBatchIndex, bool normalize )
+		{
+			const V2i batchFirstTile( 0, tileBatchIndex.y * m_tileBatchSize.y );
+			const Box2i batchRegion(
+				batchFirstTile * ImagePlug::tileSize(),
+				( batchFirstTile + m_tileBatchSize ) * ImagePlug::tileSize()
+			);
+			const Box2i region = BufferAlgo::intersection( batchRegion, m_dataWindow );
+
+			// Decode into a per-thread scratch buffer that is reused from batch to batch,
+			// rather than allocating a fresh buffer for every read.
+			ScratchBuffer<float> scratch( g_scratchBuffers );
+			std::vector<float> &data = scratch.get();
+			readRegion( region, normalize, 0, m_numPlanes, data );
+
+			const int tilesPerPlane = m_tileBatchSize.x * m_tileBatchSize.y;
+			const size_t planeSize = region.size().x * region.size().y;
+
+			ObjectVectorPtr result = new ObjectVector();
+			result->members().resize( tilesPerPlane * m_numPlanes );
+
+			const int readWidth = region.size().x;
+			for( int plane = 0; plane < m_numPlanes; ++plane )
 			{
+				const float *planeData = data.data() + plane * planeSize;
+				for( int ty = 0; ty < m_tileBatchSize.y; ++ty )
+				{
+					for( int tx = 0; tx < m_tileBatchSize.x; ++tx )
+					{
+						const V2i tileOrigin = ( batchFirstTile + V2i( tx, ty ) ) * ImagePlug::tileSize();
+						const Box2i tileBound( tileOrigin, tileOrigin + V2i( ImagePlug::tileSize() ) );
+						const Box2i validBound = BufferAlgo::intersection( tileBound, region );
+						const int subIndex = plane * tilesPerPlane + ty * m_tileBatchSize.x + tx;
+
+						if( BufferAlgo::empty( validBound ) )
+						{
+							// Result will be treated as const as soon as we set it on the plug, so
+							// it's safe to store a const value in one of the elements.
+							result->members()[ subIndex ] = const_cast<FloatVectorData *>( ImagePlug::blackTile() );
+							continue;
+						}
+
+						FloatVectorDataPtr tileData = new FloatVectorData();
+						std::vector<float> &tile = tileData->writable();
+
+						// FITS stores scanlines bottom to top, matching Gaffer, so there's no need to flip.
+						const int width = validBound.size().x;
+						if( validBound == tileBound )
+						{
+							// Whole tile, append each scanline without zero-initialising first.
+							tile.reserve( ImagePlug::tilePixels() );
+							for( int y = validBound.min.y; y < validBound.max.y; ++y )
+							{
+								const float *src = &planeData[ ( y - region.min.y ) * readWidth + validBound.min.x - region.min.x ];
+								tile.insert( tile.end(), src, src + width );
+							}
+						}
+						else
+						{
+							// Partial tile at the edge of the image. Rows are shorter than
+							// the tile, so each one must be placed at the tile's stride.
+							tile.resize( ImagePlug::tilePixels(), 0.0f );
+							for( int y = validBound.min.y; y < validBound.max.y; ++y )
+							{
+								const float *src = &planeData[ ( y - region.min.y ) * readWidth + validBound.min.x - region.min.x ];
+								float *dst = &tile[ ( y - tileOrigin.y ) * ImagePlug::tileSize() + validBound.min.x - tileOrigin.x ];
+								std::copy( src, src + width, dst );
+							}
+						}
+
+						result->members()[ subIndex ] = tileData;
+					}
+				}
 			}
 
 			return result;
 		}
 
-		Imath::Box2i dataWindow()
+		// Given a channel and tile origin, returns the index of the tile batch containing
+		// the tile, and the index of the tile within that batch.
+		void findTile( const std::string &channelName, const V2i &tileOrigin, V3i &batchIndex, int &batchSubIndex ) const
+		{
+			const int plane = planeIndex( channelName );
+			const V2i tileIndex = ImagePlug::tileIndex( tileOrigin );
+			batchIndex = V3i( 0, tileIndex.y / m_tileBatchSize.y, m_header->hdu() );
+			batchSubIndex = plane * m_tileBatchSize.x * m_tileBatchSize.y + ( tileIndex.y % m_tileBatchSize.y ) * m_tileBatchSize.x + tileIndex.x;
+		}
+
+		// Returns the specified level of the preview pyramid for a channel,
+		// generating it if necessary.
+		MipPyramid::ConstLevelPtr mipLevel( const std::string &channelName, int level, bool normalize )
 		{
-			if( !m_fits )
+			const int plane = planeIndex( channelName );
+			const std::string planeKey = boost::str( boost::format( "%s:%d:%d" ) % m_mipKey % plane % normalize );
+			return MipPyramid::level(
+				planeKey, m_dataWindow.size(), level,
+				[this, plane, normalize] ( int minY, int maxY, float *dst ) {
+					std::vector<float> data;
+					readRegion( Box2i( V2i( 0, minY ), V2i( m_dataWindow.max.x, maxY ) ), normalize, plane, 1, data );
+					std::copy( data.begin(), data.end(), dst );
+				}
+			);
+		}
+
+	private :
+
+		int planeIndex( const std::string &channelName ) const
+		{
+			const std::vector<std::string> &names = m_channelNames->readable();
+			const int plane = std::find( names.begin(), names.end(), channelName ) - names.begin();
+			if( plane >= m_numPlanes )
 			{
-				return Imath::Box2i( Imath::V2i( 0 ), Imath::V2i( 0 ) );
+				throw IECore::Exception( "FITSReader : No channel named \"" + channelName + "\"" );
 			}
+			return plane;
+		}
 
-			tbb::mutex::scoped_lock l( g_readMutex );
+		// Reads the raw samples for `region` of `planeCount` planes starting at `firstPlane`,
+		// and converts them to float. Planes are stored consecutively in `result`. Scaling by BSCALE and BZERO is
+		// disabled in cfitsio and applied by `convertSamples()` instead, so integer data
+		// is read in bulk in its native type rather than passing every pixel through
+		// cfitsio's generic conversion.
+		void readRegion( const Box2i &region, bool normalize, int firstPlane, int planeCount, std::vector<float> &result )
+		{
+			const size_t numSamples = region.size().x * region.size().y * planeCount;
+			result.resize( numSamples );
 
-			CCfits::PHDU& image = m_fits->pHDU();
+			double scale = m_scale;
+			double offset = m_zero;
+			if( normalize && m_bitpix > 0 )
+			{
+				// Map the largest representable value to 1. BITPIX 8 is unsigned,
+				// the other integer types are signed.
+				const double rawMax = m_bitpix == BYTE_IMG ? 255.0 : std::pow( 2.0, m_bitpix - 1 ) - 1.0;
+				const double scaledMax = rawMax * m_scale + m_zero;
+				scale /= scaledMax;
+				offset /= scaledMax;
+			}
 
-			if( image.axes() != 2 )
+			switch( m_bitpix )
 			{
-				throw IECore::Exception( "Invalid number of image axes" );
+				case BYTE_IMG :
+					readSamples<unsigned char>( TBYTE, region, firstPlane, planeCount, result, scale, offset );
+					break;
+				case SHORT_IMG :
+					readSamples<short>( TSHORT, region, firstPlane, planeCount, result, scale, offset );
+					break;
+				case LONG_IMG :
+					readSamples<int>( TINT, region, firstPlane, planeCount, result, scale, offset );
+					break;
+				case LONGLONG_IMG :
+					readSamples<LONGLONG>( TLONGLONG, region, firstPlane, planeCount, result, scale, offset );
+					break;
+				case DOUBLE_IMG :
+					readSamples<double>( TDOUBLE, region, firstPlane, planeCount, result, scale, offset );
+					break;
+				case FLOAT_IMG :
+				default :
+				{
+					// No conversion needed, read directly into the result.
+					read( TFLOAT, sizeof( float ), region, firstPlane, planeCount, result.data() );
+					if( scale != 1.0 || offset != 0.0 )
+					{
+						convertSamples( result.data(), result.data(), numSamples, scale, offset );
+					}
+					break;
+				}
 			}
+		}
 
-			return Imath::Box2i(
-				Imath::V2i( 0 ),
-				Imath::V2i( image.axis( 0 ), image.axis( 1 ) )
-			);
+		template<typename T>
+		void readSamples( int dataType, const Box2i &region, int firstPlane, int planeCount, std::vector<float> &result, double scale, double offset )
+		{
+			ScratchBuffer<char> scratch( g_rawScratchBuffers );
+			std::vector<char> &raw = scratch.get();
+			raw.resize( result.size() * sizeof( T ) );
+			read( dataType, sizeof( T ), region, firstPlane, planeCount, raw.data() );
+			convertSamples( reinterpret_cast<const T *>( raw.data() ), result.data(), result.size(), scale, offset );
+		}
+
+		// Reads the raw (unscaled) samples for `region` of the specified planes into
+		// `buffer`, in native byte order.
+		void read( int dataType, size_t sampleSize, const Box2i &region, int firstPlane, int planeCount, void *buffer )
+		{
+			if( m_mappedData )
+			{
+				// Copy scanlines straight out of the mapped data unit, without going
+				// through cfitsio or taking a handle.
+				const size_t rowSize = region.size().x * sampleSize;
+				const size_t width = m_dataWindow.size().x;
+				const size_t height = m_dataWindow.size().y;
+				char *dst = static_cast<char *>( buffer );
+				for( int plane = firstPlane; plane < firstPlane + planeCount; ++plane )
+				{
+					for( int y = region.min.y; y < region.max.y; ++y )
+					{
+						const size_t offset = ( ( plane * height + y ) * width + region.min.x ) * sampleSize;
+						std::memcpy( dst, m_mappedData + offset, rowSize );
+						dst += rowSize;
+					}
+				}
+				bigEndianToNative( buffer, region.size().x * region.size().y * planeCount, sampleSize );
+				return;
+			}
+
+			HandleLock handle( *this );
+
+			// cfitsio expects coordinates for all axes, including
+			// any degenerate ones beyond the third.
+			const int numAxes = m_header->imageIntValue( "NAXIS" );
+			std::vector<long> fpixel( numAxes, 1 );
+			std::vector<long> lpixel( numAxes, 1 );
+			std::vector<long> inc( numAxes, 1 );
+			fpixel[0] = region.min.x + 1;
+			fpixel[1] = region.min.y + 1;
+			lpixel[0] = region.max.x;
+			lpixel[1] = region.max.y;
+			if( numAxes >= 3 )
+			{
+				fpixel[2] = firstPlane + 1;
+				lpixel[2] = firstPlane + planeCount;
+			}
+
+			int anyNull = 0;
+			int status = 0;
+			fits_read_subset( handle.get(), dataType, fpixel.data(), lpixel.data(), inc.data(), nullptr, buffer, &anyNull, &status );
+			throwIfError( status, m_fileName );
 		}
 
-		IECore::ConstStringVectorDataPtr channels()
+		// Uncompressed images store their pixels as a single contiguous big endian
+		// array, so we can map the data unit and read from it directly, letting the
+		// OS page cache do the buffering. Anything we fail to map is read via cfitsio
+		// instead.
+		void mapData()
 		{
-			IECore::StringVectorDataPtr dataPtr = new IECore::StringVectorData();
+			const size_t dataSize = (size_t)m_dataWindow.size().x * m_dataWindow.size().y * m_numPlanes * ( std::abs( m_bitpix ) / 8 );
+			try
+			{
+				m_mapping.open( m_fileName );
+			}
+			catch( const std::exception & )
+			{
+				return;
+			}
 
-			if( m_fits )
+			if( !m_mapping.is_open() || m_header->dataOffset() + dataSize > m_mapping.size() )
 			{
-				dataPtr->writable().push_back( "Y" );
+				m_mapping.close();
+				return;
 			}
 
-			return dataPtr;
+			m_mappedData = m_mapping.data() + m_header->dataOffset();
 		}
 
-		IECore::ConstFloatVectorDataPtr	tile( const Imath::Box2i &tile )
+		struct HandleDeleter
 		{
-			assert( m_fits );
+			void operator()( fitsfile *handle ) const
+			{
+				int status = 0;
+				fits_close_file( handle, &status );
+			}
+		};
+
+		typedef std::unique_ptr<fitsfile, HandleDeleter> HandlePtr;
+
+		// Provides exclusive use of one of the file's handles for the
+		// lifetime of the lock.
+		class HandleLock : boost::noncopyable
+		{
+			public :
+
+				HandleLock( File &file )
+					: m_file( file ), m_handle( file.acquireHandle() )
+				{
+				}
+
+				~HandleLock()
+				{
+					m_file.releaseHandle( std::move( m_handle ) );
+				}
+
+				fitsfile *get() const
+				{
+					return m_handle.get();
+				}
+
+			private :
 
-			IECore::FloatVectorDataPtr dataPtr = new IECore::FloatVectorData();
-			std::vector<float> &data = dataPtr->writable();
+				File &m_file;
+				HandlePtr m_handle;
+		};
 
-			data.resize( tile.size().x * tile.size().y );
+		HandlePtr acquireHandle()
+		{
+			std::unique_lock<std::mutex> lock( m_handlesMutex );
+			m_handleAvailable.wait( lock, [this] { return !m_handles.empty() || m_numHandles < g_maxHandlesPerFile; } );
 
-			std::valarray<float> imageData;
-			static const std::vector<long> stride = { 1, 1 };
+			if( !m_handles.empty() )
+			{
+				HandlePtr result = std::move( m_handles.back() );
+				m_handles.pop_back();
+				return result;
+			}
 
+			// Open a new handle outside the lock, so other threads
+			// can continue to use the existing ones in the meantime.
+			m_numHandles++;
+			lock.unlock();
+
+			try
 			{
-				tbb::mutex::scoped_lock l( g_readMutex );
-
-				CCfits::PHDU& image = m_fits->pHDU();
-				int maxX = image.axis( 0 );
-				int maxY = image.axis( 1 );
-				std::vector<long> bl = { tile.min.x + 1, tile.min.y + 1 };
-				std::vector<long> tr = { std::min( maxX, tile.max.x ), std::min( maxY, tile.max.y ) };
-				image.read( imageData, bl, tr, stride );
+				return openHandle();
 			}
+			catch( ... )
+			{
+				lock.lock();
+				m_numHandles--;
+				m_handleAvailable.notify_one();
+				throw;
+			}
+		}
 
-			std::copy( begin(imageData), end(imageData), data.begin() );
+		HandlePtr openHandle() const
+		{
+			// We use `fits_open_diskfile()` rather than `fits_open_file()` so the
+			// file name isn't interpreted using cfitsio's extended syntax.
+			fitsfile *fits = nullptr;
+			int status = 0;
+			fits_open_diskfile( &fits, m_fileName.c_str(), READONLY, &status );
+			throwIfError( status, m_fileName );
+			HandlePtr result( fits );
+
+			fits_movabs_hdu( fits, m_header->hdu() + 1, nullptr, &status );
+			// We apply BSCALE and BZERO ourselves in `readRegion()`.
+			fits_set_bscale( fits, 1.0, 0.0, &status );
+			throwIfError( status, m_fileName );
 
-			return dataPtr;
+			return result;
 		}
 
-	private :
+		void releaseHandle( HandlePtr handle )
+		{
+			{
+				std::lock_guard<std::mutex> lock( m_handlesMutex );
+				m_handles.push_back( std::move( handle ) );
+			}
+			m_handleAvailable.notify_one();
+		}
 
-		std::unique_ptr<FITS> m_fits;
 		std::string m_fileName;
+		std::string m_mipKey;
+		ConstFITSHeaderPtr m_header;
+		Imath::Box2i m_dataWindow;
+		IECore::ConstStringVectorDataPtr m_channelNames;
+		int m_numPlanes;
+		Imath::V2i m_tileBatchSize;
+		int m_bitpix;
+		double m_scale;
+		double m_zero;
+
+		boost::iostreams::mapped_file_source m_mapping;
+		const char *m_mappedData;
+
+		std::mutex m_handlesMutex;
+		std::condition_variable m_handleAvailable;
+		std::vector<HandlePtr> m_handles;
+		size_t m_numHandles;
 };
 
 typedef std::shared_ptr<File> FilePtr;
 
+// For success, file should be set, and error left null
+// For failure, file should be left null, and error should be set
+struct CacheEntry
+{
+	FilePtr file;
+	std::shared_ptr<std::string> error;
+};
 
-static tbb::mutex g_cacheMutex;
-static std::map<std::string, FilePtr> g_fileMap;
+// Files are cached per HDU, and keyed on the same modification time and
+// size as the header cache, so that a rewritten file can't be read through
+// handles and mappings of its previous contents. The GetterKey carries the
+// file name and HDU separately, so the getter doesn't need to parse the key.
+struct FileCacheGetterKey
+{
 
-FilePtr retrieveFile( const std::string &fileName, const Context *context )
+	FileCacheGetterKey( const std::string &fileName, int hdu )
+		:	fileName( fileName ), hdu( hdu ), key( boost::str( boost::format( "%s:%d" ) % FITSHeader::fileKey( fileName ) % hdu ) )
+	{
+	}
+
+	operator const std::string &() const
+	{
+		return key;
+	}
+
+	std::string fileName;
+	int hdu;
+	std::string key;
+
+};
+
+CacheEntry fileCacheGetter( const FileCacheGetterKey &key, size_t &cost )
+{
+	cost = 1;
+
+	CacheEntry result;
+
+	try
+	{
+		result.file.reset( new File( key.fileName, key.hdu ) );
+	}
+	catch( const std::exception &e )
+	{
+		result.error.reset( new std::string( "FITSReader : Could not open " + key.fileName + " : " + e.what() ) );
+	}
+
+	return result;
+}
+
+typedef Cache<std::string, CacheEntry, FileCacheGetterKey> FileHandleCache;
+
+FileHandleCache *fileCache()
+{
+	static FileHandleCache *c = new FileHandleCache( "FITSReader", fileCacheGetter, 200 );
+	return c;
+}
+
+// Returns the file handle container for the given filename in the current
+// context. Throws if the file is invalid, and returns null if
+// the filename is empty.
+FilePtr retrieveFile( const std::string &fileName, int hdu, const Context *context )
 {
 	if( fileName.empty() )
 	{
 		return nullptr;
 	}
 
-
 	const std::string resolvedFileName = context->substitute( fileName );
 
-	tbb::mutex::scoped_lock l( g_cacheMutex );
-	if( g_fileMap.find( resolvedFileName ) == g_fileMap.end() )
+	CacheEntry cacheEntry = fileCache()->get( FileCacheGetterKey( resolvedFileName, hdu ) );
+	if( !cacheEntry.file )
 	{
-		g_fileMap[ resolvedFileName ].reset( new File( resolvedFileName ) );
+		throw IECore::Exception( *(cacheEntry.error) );
 	}
 
-	return g_fileMap[ resolvedFileName ];
+	return cacheEntry.file;
+}
+
+// Returns the header for the given filename in the current context, without
+// opening the file via cfitsio. Throws if the file is invalid, and returns
+// null if the filename is empty.
+ConstFITSHeaderPtr retrieveHeader( const std::string &fileName, int hdu, const Context *context )
+{
+	if( fileName.empty() )
+	{
+		return nullptr;
+	}
+
+	const std::string resolvedFileName = context->substitute( fileName );
+
+	try
+	{
+		return FITSHeader::read( resolvedFileName, hdu );
+	}
+	catch( const std::exception &e )
+	{
+		throw IECore::Exception( "FITSReader : Could not open " + resolvedFileName + " : " + e.what() );
+	}
 }
 
 } // namespace
@@ -202,6 +812,12 @@ FITSReader::FITSReader( const std::string& name )
 		)
 	);
 	addChild( new IntPlug( "refreshCount" ) );
+	addChild( new BoolPlug( "normalize" ) );
+	addChild( new IntPlug( "hdu", Plug::In, -1, -1 ) );
+	addChild( new IntPlug( "mipLevel", Plug::In, 0, 0 ) );
+	addChild( new ObjectVectorPlug( "__tileBatch", Plug::Out, new ObjectVector ) );
+
+	plugSetSignal().connect( boost::bind( &FITSReader::plugSet, this, ::_1 ) );
 }
 
 FITSReader::~FITSReader()
@@ -231,26 +847,151 @@ const Gaffer::IntPlug *FITSReader::refreshCountPlug() const
 	return getChild<IntPlug>( g_firstPlugIndex + 1 );
 }
 
+Gaffer::BoolPlug *FITSReader::normalizePlug()
+{
+	return getChild<BoolPlug>( g_firstPlugIndex + 2 );
+}
+
+const Gaffer::BoolPlug *FITSReader::normalizePlug() const
+{
+	return getChild<BoolPlug>( g_firstPlugIndex + 2 );
+}
+
+Gaffer::IntPlug *FITSReader::hduPlug()
+{
+	return getChild<IntPlug>( g_firstPlugIndex + 3 );
+}
+
+const Gaffer::IntPlug *FITSReader::hduPlug() const
+{
+	return getChild<IntPlug>( g_firstPlugIndex + 3 );
+}
+
+Gaffer::IntPlug *FITSReader::mipLevelPlug()
+{
+	return getChild<IntPlug>( g_firstPlugIndex + 4 );
+}
+
+const Gaffer::IntPlug *FITSReader::mipLevelPlug() const
+{
+	return getChild<IntPlug>( g_firstPlugIndex + 4 );
+}
+
+Gaffer::ObjectVectorPlug *FITSReader::tileBatchPlug()
+{
+	return getChild<ObjectVectorPlug>( g_firstPlugIndex + 5 );
+}
+
+const Gaffer::ObjectVectorPlug *FITSReader::tileBatchPlug() const
+{
+	return getChild<ObjectVectorPlug>( g_firstPlugIndex + 5 );
+}
+
+void FITSReader::setOpenFilesLimit( size_t maxOpenFiles )
+{
+	fileCache()->setMaxCost( maxOpenFiles );
+}
+
+size_t FITSReader::getOpenFilesLimit()
+{
+	return fileCache()->getMaxCost();
+}
 
 void FITSReader::affects( const Gaffer::Plug *input, AffectedPlugsContainer &outputs ) const
 {
 	FlatImageSource::affects( input, outputs );
 
-	if( input == fileNamePlug() || input == refreshCountPlug() )
+	if( input == fileNamePlug() || input == refreshCountPlug() || input == hduPlug() )
 	{
+		outputs.push_back( tileBatchPlug() );
+
 		for( ValuePlug::Iterator it( outPlug() ); !it.done(); ++it )
 		{
 			outputs.push_back( it->get() );
 		}
 	}
+	else if( input == normalizePlug() )
+	{
+		outputs.push_back( tileBatchPlug() );
+		outputs.push_back( outPlug()->channelDataPlug() );
+	}
+	else if( input == mipLevelPlug() )
+	{
+		outputs.push_back( outPlug()->formatPlug() );
+		outputs.push_back( outPlug()->dataWindowPlug() );
+		outputs.push_back( outPlug()->channelDataPlug() );
+	}
 }
 
+void FITSReader::hash( const ValuePlug *output, const Context *context, IECore::MurmurHash &h ) const
+{
+	FlatImageSource::hash( output, context, h );
+
+	if( output == tileBatchPlug() )
+	{
+		h.append( context->get<V3i>( g_tileBatchIndexContextName ) );
+
+		Gaffer::Context::EditableScope c( context );
+		c.remove( g_tileBatchIndexContextName );
+
+		hashFileName( c.context(), h );
+		refreshCountPlug()->hash( h );
+		normalizePlug()->hash( h );
+		hduPlug()->hash( h );
+	}
+}
+
+void FITSReader::compute( ValuePlug *output, const Context *context ) const
+{
+	if( output == tileBatchPlug() )
+	{
+		V3i tileBatchIndex = context->get<V3i>( g_tileBatchIndexContextName );
+
+		Gaffer::Context::EditableScope c( context );
+		c.remove( g_tileBatchIndexContextName );
+
+		const std::string fileName = fileNamePlug()->getValue();
+		FilePtr file = retrieveFile( fileName, hduPlug()->getValue(), c.context() );
+
+		if( !file )
+		{
+			throw IECore::Exception( "FITSReader - trying to evaluate tileBatchPlug() with invalid file, this should never happen." );
+		}
+
+		static_cast<ObjectVectorPlug *>( output )->setValue(
+			file->readTileBatch( tileBatchIndex, normalizePlug()->getValue() )
+		);
+	}
+	else
+	{
+		FlatImageSource::compute( output, context );
+	}
+}
+
+Gaffer::ValuePlug::CachePolicy FITSReader::computeCachePolicy( const Gaffer::ValuePlug *output ) const
+{
+	if( output == tileBatchPlug() )
+	{
+		// Request blocking compute for tile batches, to avoid concurrent threads loading
+		// the same batch redundantly.
+		return ValuePlug::CachePolicy::Standard;
+	}
+	else if( output == outPlug()->channelDataPlug() )
+	{
+		// Disable caching on channelDataPlug, since it is just a redirect to the correct tile of
+		// the private tileBatchPlug, which is already being cached.
+		return ValuePlug::CachePolicy::Uncached;
+	}
+	return FlatImageSource::computeCachePolicy( output );
+}
 
 void FITSReader::hashFormat( const GafferImage::ImagePlug *parent, const Context *context, IECore::MurmurHash &h ) const
 {
 	FlatImageSource::hashFormat( parent, context, h );
 	hashFileName( context, h );
 	refreshCountPlug()->hash( h );
+	hduPlug()->hash( h );
+	mipLevelPlug()->hash( h );
 	GafferImage::Format format = FormatPlug::getDefaultFormat( context );
 	h.append( format.getDisplayWindow() );
 	h.append( format.getPixelAspect() );
@@ -259,13 +1000,13 @@ void FITSReader::hashFormat( const GafferImage::ImagePlug *parent, const Context
 GafferImage::Format FITSReader::computeFormat( const Context *context, const ImagePlug *parent ) const
 {
 	const std::string fileName = fileNamePlug()->getValue();
-	FilePtr file = retrieveFile( fileName, context );
-	if( !file )
+	ConstFITSHeaderPtr header = retrieveHeader( fileName, hduPlug()->getValue(), context );
+	if( !header )
 	{
 		return GafferImage::FormatPlug::getDefaultFormat( context );
 	}
 
-	return GafferImage::Format( file->dataWindow(), 1.0f );
+	return GafferImage::Format( mipDataWindow( header.get(), mipLevelPlug()->getValue() ), 1.0f );
 }
 
 
@@ -274,17 +1015,19 @@ void FITSReader::hashDataWindow( const GafferImage::ImagePlug *parent, const Con
 	FlatImageSource::hashDataWindow( parent, context, h );
 	hashFileName( context, h );
 	refreshCountPlug()->hash( h );
+	hduPlug()->hash( h );
+	mipLevelPlug()->hash( h );
 }
 
 Imath::Box2i FITSReader::computeDataWindow( const Context *context, const ImagePlug *parent ) const
 {
 	const std::string fileName = fileNamePlug()->getValue();
-	FilePtr file = retrieveFile( fileName, context );
-	if( !file )
+	ConstFITSHeaderPtr header = retrieveHeader( fileName, hduPlug()->getValue(), context );
+	if( !header )
 	{
 		return Imath::Box2i( Imath::V2i( 0 ), Imath::V2i( 0 ) );
 	}
-	return file->dataWindow();
+	return mipDataWindow( header.get(), mipLevelPlug()->getValue() );
 }
 
 void FITSReader::hashMetadata( const GafferImage::ImagePlug *parent, const Context *context, IECore::MurmurHash &h ) const
@@ -292,17 +1035,32 @@ void FITSReader::hashMetadata( const GafferImage::ImagePlug *parent, const Conte
 	FlatImageSource::hashMetadata( parent, context, h );
 	hashFileName( context, h );
 	refreshCountPlug()->hash( h );
+	hduPlug()->hash( h );
 }
 
 IECore::ConstCompoundDataPtr FITSReader::computeMetadata( const Context *context, const ImagePlug *parent ) const
 {
 	const std::string fileName = fileNamePlug()->getValue();
-	FilePtr file = retrieveFile( fileName, context );
-	if( !file )
+	ConstFITSHeaderPtr header = retrieveHeader( fileName, hduPlug()->getValue(), context );
+	if( !header )
 	{
 		return parent->metadataPlug()->defaultValue();
 	}
-	return file->metadata();
+
+	const FITSHeader::Card *inherit = header->card( "INHERIT" );
+	if( header->hdu() > 0 && inherit && inherit->value == "T" )
+	{
+		// Extensions may request that they inherit the keywords of the primary
+		// HDU, with their own keywords taking precedence.
+		CompoundDataPtr result = retrieveHeader( fileName, 0, context )->metadata()->copy();
+		for( const auto &m : header->metadata()->readable() )
+		{
+			result->writable()[m.first] = m.second;
+		}
+		return result;
+	}
+
+	return header->metadata();
 }
 
 
@@ -311,19 +1069,20 @@ void FITSReader::hashChannelNames( const GafferImage::ImagePlug *parent, const C
 	FlatImageSource::hashChannelNames( parent, context, h );
 	hashFileName( context, h );
 	refreshCountPlug()->hash( h );
+	hduPlug()->hash( h );
 }
 
 IECore::ConstStringVectorDataPtr FITSReader::computeChannelNames( const Context *context, const ImagePlug *parent ) const
 {
 	std::string fileName = fileNamePlug()->getValue();
-	FilePtr file = retrieveFile( fileName, context );
+	ConstFITSHeaderPtr header = retrieveHeader( fileName, hduPlug()->getValue(), context );
 
-	if( !file )
+	if( !header )
 	{
 		return new IECore::StringVectorData();
 	}
 
-	return file->channels();
+	return channelNames( header.get() );
 }
 
 
@@ -338,6 +1097,9 @@ void FITSReader::hashChannelData( const GafferImage::ImagePlug *parent, const Co
 		ImagePlug::GlobalScope c( context );
 		hashFileName( context, h );
 		refreshCountPlug()->hash( h );
+		normalizePlug()->hash( h );
+		hduPlug()->hash( h );
+		mipLevelPlug()->hash( h );
 	}
 }
 
@@ -345,7 +1107,7 @@ IECore::ConstFloatVectorDataPtr FITSReader::computeChannelData( const std::strin
 {
 	ImagePlug::GlobalScope c( context );
 	std::string fileName = fileNamePlug()->getValue();
-	FilePtr file = retrieveFile( fileName, context );
+	FilePtr file = retrieveFile( fileName, hduPlug()->getValue(), context );
 
 	if( !file )
 	{
@@ -364,7 +1126,23 @@ IECore::ConstFloatVectorDataPtr FITSReader::computeChannelData( const std::strin
 		) );
 	}
 
-	return file->tile( tileBound );
+	const int mipLevel = mipLevelPlug()->getValue();
+	if( mipLevel > 0 )
+	{
+		// Previews are served from the pyramid rather than the tile batches,
+		// so only the reduced resolution data is held in the cache.
+		return MipPyramid::tile( *file->mipLevel( channelName, mipLevel, normalizePlug()->getValue() ), tileOrigin );
+	}
+
+	V3i tileBatchIndex;
+	int subIndex;
+	file->findTile( channelName, tileOrigin, tileBatchIndex, subIndex );
+
+	c.set( g_tileBatchIndexContextName, &tileBatchIndex );
+
+	ConstObjectVectorPtr tileBatch = tileBatchPlug()->getValue();
+	ConstObjectPtr curTileChannel = tileBatch->members()[ subIndex ];
+	return IECore::runTimeCast< const FloatVectorData >( curTileChannel );
 }
 
 
@@ -378,3 +1156,14 @@ void FITSReader::hashFileName( const Gaffer::Context *context, IECore::MurmurHas
 	}
 }
 
+void FITSReader::plugSet( Gaffer::Plug *plug )
+{
+	// this clears the cache every time the refresh count is updated, so you don't get entries
+	// from old files hanging around.
+	if( plug == refreshCountPlug() )
+	{
+		fileCache()->clear();
+		FITSHeader::clearCache();
+		MipPyramid::clearCache();
+	}
+}
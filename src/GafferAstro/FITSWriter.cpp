@@ -0,0 +1,487 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#include "GafferAstro/FITSWriter.h"
+
+#include "GafferAstro/Private/FITSHeader.h"
+
+#include "GafferImage/BufferAlgo.h"
+#include "GafferImage/ImageAlgo.h"
+
+#include "Gaffer/Context.h"
+
+#include "IECore/MessageHandler.h"
+#include "IECore/SimpleTypedData.h"
+#include "IECore/StringAlgo.h"
+
+#include "boost/algorithm/string/classification.hpp"
+#include "boost/algorithm/string/split.hpp"
+#include "boost/filesystem/operations.hpp"
+#include "boost/filesystem/path.hpp"
+#include "boost/format.hpp"
+#include "boost/noncopyable.hpp"
+
+#include <fitsio.h>
+
+#include <algorithm>
+#include <cstdint>
+#include <cstring>
+
+using namespace Imath;
+using namespace IECore;
+using namespace Gaffer;
+using namespace GafferImage;
+using namespace GafferDispatch;
+using namespace GafferAstro;
+using namespace GafferAstro::Private;
+
+//////////////////////////////////////////////////////////////////////////
+// Internal utilities
+//////////////////////////////////////////////////////////////////////////
+
+namespace
+{
+
+std::string errorMessage( int status )
+{
+	char message[FLEN_STATUS];
+	fits_get_errstatus( status, message );
+	return message;
+}
+
+// Writes the primary HDU of a FITS file, one block of rows at a time.
+// If the file isn't closed successfully, it is removed on destruction
+// rather than being left incomplete.
+class Writer : boost::noncopyable
+{
+
+	public :
+
+		Writer( const std::string &fileName, const V2i &size, int numPlanes, bool uint16 )
+			:	m_fileName( fileName ), m_fits( nullptr ), m_size( size ), m_uint16( uint16 )
+		{
+			// We use `fits_create_diskfile()` so that the file name isn't
+			// parsed for cfitsio's extended syntax, which means we must
+			// remove any existing file ourselves.
+			boost::filesystem::remove( fileName );
+
+			int status = 0;
+			fits_create_diskfile( &m_fits, fileName.c_str(), &status );
+			throwIfError( status );
+
+			long axes[3] = { size.x, size.y, numPlanes };
+			fits_create_img( m_fits, uint16 ? USHORT_IMG : FLOAT_IMG, numPlanes > 1 ? 3 : 2, axes, &status );
+			if( status )
+			{
+				int deleteStatus = 0;
+				fits_delete_file( m_fits, &deleteStatus );
+				throwIfError( status );
+			}
+
+			// cfitsio adds comments referencing the FITS standard, which
+			// would be prepended to any comments in the metadata.
+			while( !status )
+			{
+				fits_delete_key( m_fits, "COMMENT", &status );
+			}
+			fits_clear_errmsg();
+		}
+
+		~Writer()
+		{
+			if( m_fits )
+			{
+				int status = 0;
+				fits_delete_file( m_fits, &status );
+			}
+		}
+
+		// Writes each metadata entry that can be represented as a header
+		// card. Structural keywords are reflected by the image itself, so
+		// are skipped.
+		void writeMetadata( const CompoundData *metadata )
+		{
+			for( const auto &m : metadata->readable() )
+			{
+				const std::string &keyword = m.first.string();
+				if( keyword.empty() || FITSHeader::isStructuralKeyword( keyword ) )
+				{
+					continue;
+				}
+
+				int status = 0;
+				if( keyword == "COMMENT" || keyword == "HISTORY" )
+				{
+					const StringData *stringData = runTimeCast<const StringData>( m.second.get() );
+					if( !stringData )
+					{
+						continue;
+					}
+
+					std::vector<std::string> lines;
+					boost::split( lines, stringData->readable(), boost::is_any_of( "\n" ) );
+					for( const auto &line : lines )
+					{
+						if( keyword == "COMMENT" )
+						{
+							fits_write_comment( m_fits, line.c_str(), &status );
+						}
+						else
+						{
+							fits_write_history( m_fits, line.c_str(), &status );
+						}
+					}
+				}
+				else
+				{
+					switch( m.second->typeId() )
+					{
+						case StringDataTypeId :
+						{
+							const std::string &value = static_cast<const StringData *>( m.second.get() )->readable();
+							fits_update_key( m_fits, TSTRING, keyword.c_str(), const_cast<char *>( value.c_str() ), nullptr, &status );
+							break;
+						}
+						case BoolDataTypeId :
+						{
+							int value = static_cast<const BoolData *>( m.second.get() )->readable();
+							fits_update_key( m_fits, TLOGICAL, keyword.c_str(), &value, nullptr, &status );
+							break;
+						}
+						case IntDataTypeId :
+						{
+							int value = static_cast<const IntData *>( m.second.get() )->readable();
+							fits_update_key( m_fits, TINT, keyword.c_str(), &value, nullptr, &status );
+							break;
+						}
+						case Int64DataTypeId :
+						{
+							LONGLONG value = static_cast<const Int64Data *>( m.second.get() )->readable();
+							fits_update_key( m_fits, TLONGLONG, keyword.c_str(), &value, nullptr, &status );
+							break;
+						}
+						case FloatDataTypeId :
+						{
+							double value = static_cast<const FloatData *>( m.second.get() )->readable();
+							fits_update_key( m_fits, TDOUBLE, keyword.c_str(), &value, nullptr, &status );
+							break;
+						}
+						case DoubleDataTypeId :
+						{
+							double value = static_cast<const DoubleData *>( m.second.get() )->readable();
+							fits_update_key( m_fits, TDOUBLE, keyword.c_str(), &value, nullptr, &status );
+							break;
+						}
+						default :
+							break;
+					}
+				}
+
+				if( status )
+				{
+					IECore::msg(
+						IECore::Msg::Warning, "FITSWriter",
+						boost::format( "Unable to write metadata \"%s\" : %s" ) % keyword % errorMessage( status )
+					);
+				}
+			}
+		}
+
+		// Writes `numRows` full width rows to `plane`, starting at `row`,
+		// where rows are numbered from the bottom of the image.
+		void writeRows( int plane, int row, int numRows, const float *data )
+		{
+			const size_t numSamples = (size_t)numRows * m_size.x;
+			long firstPixel[3] = { 1, row + 1, plane + 1 };
+
+			int status = 0;
+			if( m_uint16 )
+			{
+				m_uint16Buffer.resize( numSamples );
+				for( size_t i = 0; i < numSamples; ++i )
+				{
+					m_uint16Buffer[i] = (uint16_t)( std::min( std::max( data[i], 0.0f ), 1.0f ) * 65535.0f + 0.5f );
+				}
+				fits_write_pix( m_fits, TUSHORT, firstPixel, numSamples, m_uint16Buffer.data(), &status );
+			}
+			else
+			{
+				fits_write_pix( m_fits, TFLOAT, firstPixel, numSamples, const_cast<float *>( data ), &status );
+			}
+			throwIfError( status );
+		}
+
+		void close()
+		{
+			int status = 0;
+			fits_close_file( m_fits, &status );
+			m_fits = nullptr;
+			throwIfError( status );
+		}
+
+	private :
+
+		void throwIfError( int status ) const
+		{
+			if( status )
+			{
+				throw IECore::Exception( boost::str( boost::format( "FITSWriter : Error writing \"%s\" : %s" ) % m_fileName % errorMessage( status ) ) );
+			}
+		}
+
+		const std::string m_fileName;
+		fitsfile *m_fits;
+		const V2i m_size;
+		const bool m_uint16;
+		std::vector<uint16_t> m_uint16Buffer;
+
+};
+
+} // namespace
+
+//////////////////////////////////////////////////////////////////////////
+// FITSWriter
+//////////////////////////////////////////////////////////////////////////
+
+GAFFER_NODE_DEFINE_TYPE( FITSWriter );
+
+size_t FITSWriter::g_firstPlugIndex = 0;
+
+FITSWriter::FITSWriter( const std::string &name )
+	:	TaskNode( name )
+{
+	storeIndexOfNextChild( g_firstPlugIndex );
+	addChild( new ImagePlug( "in" ) );
+	addChild( new StringPlug( "fileName" ) );
+	addChild( new StringPlug( "channels", Plug::In, "*" ) );
+	addChild( new StringPlug( "dataType", Plug::In, "float" ) );
+	addChild( new ImagePlug( "out", Plug::Out, Plug::Default & ~Plug::Serialisable ) );
+
+	outPlug()->setInput( inPlug() );
+}
+
+FITSWriter::~FITSWriter()
+{
+}
+
+GafferImage::ImagePlug *FITSWriter::inPlug()
+{
+	return getChild<ImagePlug>( g_firstPlugIndex );
+}
+
+const GafferImage::ImagePlug *FITSWriter::inPlug() const
+{
+	return getChild<ImagePlug>( g_firstPlugIndex );
+}
+
+Gaffer::StringPlug *FITSWriter::fileNamePlug()
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 1 );
+}
+
+const Gaffer::StringPlug *FITSWriter::fileNamePlug() const
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 1 );
+}
+
+Gaffer::StringPlug *FITSWriter::channelsPlug()
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 2 );
+}
+
+const Gaffer::StringPlug *FITSWriter::channelsPlug() const
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 2 );
+}
+
+Gaffer::StringPlug *FITSWriter::dataTypePlug()
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 3 );
+}
+
+const Gaffer::StringPlug *FITSWriter::dataTypePlug() const
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 3 );
+}
+
+GafferImage::ImagePlug *FITSWriter::outPlug()
+{
+	return getChild<ImagePlug>( g_firstPlugIndex + 4 );
+}
+
+const GafferImage::ImagePlug *FITSWriter::outPlug() const
+{
+	return getChild<ImagePlug>( g_firstPlugIndex + 4 );
+}
+
+IECore::MurmurHash FITSWriter::hash( const Gaffer::Context *context ) const
+{
+	Context::Scope scope( context );
+	if( !inPlug()->getInput<ImagePlug>() || fileNamePlug()->getValue().empty() )
+	{
+		return IECore::MurmurHash();
+	}
+
+	IECore::MurmurHash h = TaskNode::hash( context );
+	h.append( fileNamePlug()->hash() );
+	h.append( channelsPlug()->hash() );
+	h.append( dataTypePlug()->hash() );
+	h.append( ImageAlgo::imageHash( inPlug() ) );
+
+	return h;
+}
+
+void FITSWriter::execute() const
+{
+	if( !inPlug()->getInput<ImagePlug>() )
+	{
+		throw IECore::Exception( "No input image." );
+	}
+
+	const std::string fileName = fileNamePlug()->getValue();
+	if( fileName.empty() )
+	{
+		throw IECore::Exception( "No file name specified." );
+	}
+
+	const std::string dataType = dataTypePlug()->getValue();
+	if( dataType != "float" && dataType != "uint16" )
+	{
+		throw IECore::Exception( "Unsupported data type \"" + dataType + "\"." );
+	}
+
+	Box2i dataWindow;
+	ConstCompoundDataPtr metadata;
+	std::vector<std::string> channelNames;
+	{
+		ImagePlug::GlobalScope globalScope( Context::current() );
+		if( inPlug()->deepPlug()->getValue() )
+		{
+			throw IECore::Exception( "Deep images are not supported." );
+		}
+
+		dataWindow = inPlug()->dataWindowPlug()->getValue();
+		metadata = inPlug()->metadataPlug()->getValue();
+
+		const std::string channels = channelsPlug()->getValue();
+		ConstStringVectorDataPtr channelNamesData = inPlug()->channelNamesPlug()->getValue();
+		for( const auto &channelName : ImageAlgo::sortedChannelNames( channelNamesData->readable() ) )
+		{
+			if( StringAlgo::matchMultiple( channelName, channels ) )
+			{
+				channelNames.push_back( channelName );
+			}
+		}
+	}
+
+	if( channelNames.empty() )
+	{
+		throw IECore::Exception( "No channels to write." );
+	}
+
+	if( BufferAlgo::empty( dataWindow ) )
+	{
+		throw IECore::Exception( "Empty data window." );
+	}
+
+	const boost::filesystem::path directory = boost::filesystem::path( fileName ).parent_path();
+	if( !directory.empty() )
+	{
+		boost::filesystem::create_directories( directory );
+	}
+
+	Writer writer( fileName, dataWindow.size(), channelNames.size(), dataType == "uint16" );
+	writer.writeMetadata( metadata.get() );
+
+	// Tiles are computed in parallel, and gathered in order from the bottom
+	// row to the top, which matches the order of rows in a FITS file. We
+	// assemble each row of tiles into full width rows for each plane, and
+	// write them as soon as the last tile in the row arrives.
+
+	const int width = dataWindow.size().x;
+	std::vector<std::vector<float>> rowBuffers( channelNames.size(), std::vector<float>( (size_t)width * ImagePlug::tileSize() ) );
+
+	ImageAlgo::parallelGatherTiles(
+		inPlug(),
+		// Tile
+		[&channelNames] ( const ImagePlug *imagePlug, const V2i &tileOrigin )
+		{
+			ImagePlug::ChannelDataScope channelDataScope( Context::current() );
+			channelDataScope.setTileOrigin( &tileOrigin );
+
+			std::vector<ConstFloatVectorDataPtr> result;
+			result.reserve( channelNames.size() );
+			for( const auto &channelName : channelNames )
+			{
+				channelDataScope.setChannelName( &channelName );
+				result.push_back( imagePlug->channelDataPlug()->getValue() );
+			}
+			return result;
+		},
+		// Gather
+		[&writer, &rowBuffers, &dataWindow, width] ( const ImagePlug *imagePlug, const V2i &tileOrigin, const std::vector<ConstFloatVectorDataPtr> &tileData )
+		{
+			const Box2i tileBound( tileOrigin, tileOrigin + V2i( ImagePlug::tileSize() ) );
+			const Box2i region = BufferAlgo::intersection( tileBound, dataWindow );
+
+			for( size_t c = 0; c < tileData.size(); ++c )
+			{
+				const std::vector<float> &tile = tileData[c]->readable();
+				float *buffer = rowBuffers[c].data();
+				for( int y = region.min.y; y < region.max.y; ++y )
+				{
+					memcpy(
+						buffer + (size_t)( y - region.min.y ) * width + ( region.min.x - dataWindow.min.x ),
+						&tile[ ( y - tileOrigin.y ) * ImagePlug::tileSize() + ( region.min.x - tileOrigin.x ) ],
+						region.size().x * sizeof( float )
+					);
+				}
+			}
+
+			if( region.max.x == dataWindow.max.x )
+			{
+				for( size_t c = 0; c < rowBuffers.size(); ++c )
+				{
+					writer.writeRows( c, region.min.y - dataWindow.min.y, region.size().y, rowBuffers[c].data() );
+				}
+			}
+		},
+		dataWindow,
+		ImageAlgo::BottomToTop
+	);
+
+	writer.close();
+}
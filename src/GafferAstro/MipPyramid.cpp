@@ -0,0 +1,233 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#include "GafferAstro/Private/MipPyramid.h"
+
+#include "GafferAstro/Private/Cache.h"
+
+#include "GafferImage/BufferAlgo.h"
+#include "GafferImage/ImagePlug.h"
+
+#include "IECore/Exception.h"
+
+#include "boost/filesystem/operations.hpp"
+#include "boost/format.hpp"
+
+#include "tbb/blocked_range.h"
+#include "tbb/parallel_for.h"
+#include "tbb/task_arena.h"
+
+#include <algorithm>
+#include <ctime>
+
+using namespace Imath;
+using namespace IECore;
+using namespace GafferImage;
+using namespace GafferAstro::Private;
+
+//////////////////////////////////////////////////////////////////////////
+// Internal utilities
+//////////////////////////////////////////////////////////////////////////
+
+namespace
+{
+
+// The number of rows of a level generated by each task.
+const int g_rowsPerTask = 32;
+
+// Averages each 2x2 block of `src` into a single pixel of `dst`, for rows
+// `[ begin, end )` of `dst`. `src` holds the source rows from `srcFirstRow`
+// onwards. At the edges of planes with odd sizes, the last row or column
+// is repeated.
+void downsample( const float *src, int srcFirstRow, const V2i &srcSize, float *dst, int dstWidth, int begin, int end )
+{
+	for( int y = begin; y < end; ++y )
+	{
+		const int y0 = 2 * y;
+		const int y1 = std::min( y0 + 1, srcSize.y - 1 );
+		const float *row0 = src + (size_t)( y0 - srcFirstRow ) * srcSize.x;
+		const float *row1 = src + (size_t)( y1 - srcFirstRow ) * srcSize.x;
+		float *d = dst + (size_t)y * dstWidth;
+		for( int x = 0; x < dstWidth; ++x )
+		{
+			const int x0 = 2 * x;
+			const int x1 = std::min( x0 + 1, srcSize.x - 1 );
+			d[x] = 0.25f * ( row0[x0] + row0[x1] + row1[x0] + row1[x1] );
+		}
+	}
+}
+
+// Levels are cached by plane key and level. The GetterKey carries
+// the information needed to generate the level.
+struct LevelCacheGetterKey
+{
+
+	LevelCacheGetterKey( const std::string &planeKey, const V2i &size, int level, const MipPyramid::RowReader &rowReader )
+		:	planeKey( planeKey ), size( size ), level( level ), rowReader( rowReader ),
+			key( boost::str( boost::format( "%s:%d" ) % planeKey % level ) )
+	{
+	}
+
+	operator const std::string &() const
+	{
+		return key;
+	}
+
+	const std::string &planeKey;
+	V2i size;
+	int level;
+	const MipPyramid::RowReader &rowReader;
+	std::string key;
+
+};
+
+MipPyramid::ConstLevelPtr levelCacheGetter( const LevelCacheGetterKey &key, size_t &cost );
+
+typedef Cache<std::string, MipPyramid::ConstLevelPtr, LevelCacheGetterKey> LevelCache;
+
+LevelCache *levelCache()
+{
+	static LevelCache *c = new LevelCache( "MipPyramid", levelCacheGetter, 1024 * 1024 * 1024 );
+	return c;
+}
+
+MipPyramid::ConstLevelPtr levelCacheGetter( const LevelCacheGetterKey &key, size_t &cost )
+{
+	std::shared_ptr<MipPyramid::Level> result = std::make_shared<MipPyramid::Level>();
+	result->size = MipPyramid::levelSize( key.size, key.level );
+	result->data.resize( (size_t)result->size.x * result->size.y );
+
+	// Other threads requesting this level are waiting for us, so isolate the
+	// parallel loop, to prevent this thread from picking up one of their
+	// tasks and waiting on itself.
+	if( key.level == 1 )
+	{
+		const V2i &srcSize = key.size;
+		tbb::this_task_arena::isolate(
+			[&key, &result, &srcSize] {
+				tbb::parallel_for(
+					tbb::blocked_range<int>( 0, result->size.y, g_rowsPerTask ),
+					[&key, &result, &srcSize] ( const tbb::blocked_range<int> &range ) {
+						const int minY = range.begin() * 2;
+						const int maxY = std::min( range.end() * 2, srcSize.y );
+						std::vector<float> rows( (size_t)( maxY - minY ) * srcSize.x );
+						key.rowReader( minY, maxY, rows.data() );
+						downsample( rows.data(), minY, srcSize, result->data.data(), result->size.x, range.begin(), range.end() );
+					}
+				);
+			}
+		);
+	}
+	else
+	{
+		MipPyramid::ConstLevelPtr below = levelCache()->get(
+			LevelCacheGetterKey( key.planeKey, key.size, key.level - 1, key.rowReader )
+		);
+		tbb::this_task_arena::isolate(
+			[&below, &result] {
+				tbb::parallel_for(
+					tbb::blocked_range<int>( 0, result->size.y, g_rowsPerTask ),
+					[&below, &result] ( const tbb::blocked_range<int> &range ) {
+						downsample( below->data.data(), 0, below->size, result->data.data(), result->size.x, range.begin(), range.end() );
+					}
+				);
+			}
+		);
+	}
+
+	cost = result->data.size() * sizeof( float );
+	return result;
+}
+
+} // namespace
+
+//////////////////////////////////////////////////////////////////////////
+// Public API
+//////////////////////////////////////////////////////////////////////////
+
+V2i MipPyramid::levelSize( const V2i &size, int level )
+{
+	V2i result = size;
+	for( int i = 0; i < level && ( result.x > 1 || result.y > 1 ); ++i )
+	{
+		result = V2i( ( result.x + 1 ) / 2, ( result.y + 1 ) / 2 );
+	}
+	return result;
+}
+
+std::string MipPyramid::fileKey( const std::string &fileName )
+{
+	boost::system::error_code error;
+	const std::time_t modificationTime = boost::filesystem::last_write_time( fileName, error );
+	return boost::str( boost::format( "%s:%d" ) % fileName % ( error ? 0 : modificationTime ) );
+}
+
+MipPyramid::ConstLevelPtr MipPyramid::level( const std::string &planeKey, const V2i &size, int level, const RowReader &rowReader )
+{
+	if( level < 1 )
+	{
+		throw IECore::Exception( "MipPyramid : Invalid level " + std::to_string( level ) );
+	}
+
+	return levelCache()->get( LevelCacheGetterKey( planeKey, size, level, rowReader ) );
+}
+
+ConstFloatVectorDataPtr MipPyramid::tile( const Level &level, const V2i &tileOrigin )
+{
+	const Box2i tileBound( tileOrigin, tileOrigin + V2i( ImagePlug::tileSize() ) );
+	const Box2i region = BufferAlgo::intersection( tileBound, Box2i( V2i( 0 ), level.size ) );
+	if( BufferAlgo::empty( region ) )
+	{
+		return ImagePlug::blackTile();
+	}
+
+	FloatVectorDataPtr result = new FloatVectorData( std::vector<float>( ImagePlug::tilePixels(), 0.0f ) );
+	std::vector<float> &tile = result->writable();
+
+	const int width = region.size().x;
+	for( int y = region.min.y; y < region.max.y; ++y )
+	{
+		const float *src = &level.data[ (size_t)y * level.size.x + region.min.x ];
+		std::copy( src, src + width, &tile[ ( y - tileOrigin.y ) * ImagePlug::tileSize() + region.min.x - tileOrigin.x ] );
+	}
+
+	return result;
+}
+
+void MipPyramid::clearCache()
+{
+	levelCache()->clear();
+}
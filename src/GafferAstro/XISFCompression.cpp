@@ -0,0 +1,294 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#include "GafferAstro/Private/XISFCompression.h"
+
+#include "IECore/Exception.h"
+
+#include "tbb/blocked_range.h"
+#include "tbb/parallel_for.h"
+
+#include <algorithm>
+#include <atomic>
+#include <cstdint>
+#include <cstring>
+#include <memory>
+#include <sstream>
+
+#include "pcl/Compression.h"
+#include "pcl/Exception.h"
+
+using namespace GafferAstro::Private;
+
+//////////////////////////////////////////////////////////////////////////
+// Internal utilities
+//////////////////////////////////////////////////////////////////////////
+
+namespace
+{
+
+std::unique_ptr<pcl::Compression> createCompression( const std::string &codec )
+{
+	std::unique_ptr<pcl::Compression> result;
+	if( codec == "zlib" )
+	{
+		result.reset( new pcl::ZLibCompression );
+	}
+	else if( codec == "lz4" )
+	{
+		result.reset( new pcl::LZ4Compression );
+	}
+	else if( codec == "lz4hc" )
+	{
+		result.reset( new pcl::LZ4HCCompression );
+	}
+	else if( codec == "zstd" )
+	{
+		result.reset( new pcl::ZstdCompression );
+	}
+
+	if( result )
+	{
+		// We provide our own parallelism, and shuffle whole
+		// blocks rather than individual sub-blocks.
+		result->DisableParallelProcessing();
+		result->DisableByteShuffling();
+	}
+
+	return result;
+}
+
+// Byte shuffling stores the first byte of every item, followed by the
+// second byte of every item and so on. Trailing bytes that don't make a
+// whole item are not shuffled.
+void shuffle( const char *src, char *dst, size_t size, size_t itemSize )
+{
+	const size_t numItems = size / itemSize;
+	tbb::parallel_for(
+		tbb::blocked_range<size_t>( 0, numItems, 64 * 1024 ),
+		[src, dst, numItems, itemSize] ( const tbb::blocked_range<size_t> &range ) {
+			for( size_t b = 0; b < itemSize; ++b )
+			{
+				char *d = dst + b * numItems;
+				for( size_t i = range.begin(); i < range.end(); ++i )
+				{
+					d[i] = src[i * itemSize + b];
+				}
+			}
+		}
+	);
+	memcpy( dst + numItems * itemSize, src + numItems * itemSize, size - numItems * itemSize );
+}
+
+void unshuffle( const char *src, char *dst, size_t size, size_t itemSize )
+{
+	const size_t numItems = size / itemSize;
+	tbb::parallel_for(
+		tbb::blocked_range<size_t>( 0, numItems, 64 * 1024 ),
+		[src, dst, numItems, itemSize] ( const tbb::blocked_range<size_t> &range ) {
+			for( size_t b = 0; b < itemSize; ++b )
+			{
+				const char *s = src + b * numItems;
+				for( size_t i = range.begin(); i < range.end(); ++i )
+				{
+					dst[i * itemSize + b] = s[i];
+				}
+			}
+		}
+	);
+	memcpy( dst + numItems * itemSize, src + numItems * itemSize, size - numItems * itemSize );
+}
+
+std::string message( const pcl::Exception &e )
+{
+	std::stringstream m;
+	m << e.Message();
+	return m.str();
+}
+
+} // namespace
+
+//////////////////////////////////////////////////////////////////////////
+// XISFCompression
+//////////////////////////////////////////////////////////////////////////
+
+bool XISFCompression::isSupported( const std::string &codec )
+{
+	return codec == "zlib" || codec == "lz4" || codec == "lz4hc" || codec == "zstd";
+}
+
+void XISFCompression::decompress( const XISFHeader::Image &image, const char *src, char *dst )
+{
+	if( !isSupported( image.codec ) )
+	{
+		throw IECore::Exception( "Unsupported compression codec \"" + image.codec + "\"" );
+	}
+
+	std::vector<size_t> srcOffsets;
+	std::vector<size_t> dstOffsets;
+	size_t srcOffset = 0;
+	size_t dstOffset = 0;
+	for( const auto &subblock : image.subblocks )
+	{
+		srcOffsets.push_back( srcOffset );
+		dstOffsets.push_back( dstOffset );
+		srcOffset += subblock.first;
+		dstOffset += subblock.second;
+	}
+
+	std::unique_ptr<char[]> shuffled;
+	char *uncompressed = dst;
+	if( image.byteShuffled && image.itemSize > 1 )
+	{
+		shuffled.reset( new char[image.uncompressedSize] );
+		uncompressed = shuffled.get();
+	}
+
+	tbb::parallel_for(
+		tbb::blocked_range<size_t>( 0, image.subblocks.size(), 1 ),
+		[&] ( const tbb::blocked_range<size_t> &range ) {
+			std::unique_ptr<pcl::Compression> compression = createCompression( image.codec );
+			for( size_t i = range.begin(); i < range.end(); ++i )
+			{
+				const uint8_t *begin = reinterpret_cast<const uint8_t *>( src + srcOffsets[i] );
+				pcl::Compression::Subblock subblock;
+				subblock.compressedData = pcl::ByteArray( begin, begin + image.subblocks[i].first );
+				subblock.uncompressedSize = image.subblocks[i].second;
+				pcl::Compression::subblock_list subblocks;
+				subblocks.Add( subblock );
+
+				size_t size = 0;
+				try
+				{
+					size = compression->Uncompress( uncompressed + dstOffsets[i], subblock.uncompressedSize, subblocks );
+				}
+				catch( const pcl::Exception &e )
+				{
+					throw IECore::Exception( message( e ) );
+				}
+
+				if( size != subblock.uncompressedSize )
+				{
+					throw IECore::Exception( "Unexpected size for decompressed sub-block" );
+				}
+			}
+		}
+	);
+
+	if( shuffled )
+	{
+		unshuffle( shuffled.get(), dst, image.uncompressedSize, image.itemSize );
+	}
+}
+
+bool XISFCompression::compress(
+	const std::string &codec, const char *data, size_t size, size_t itemSize, size_t subblockSize,
+	std::vector<char> &result, std::vector<std::pair<size_t, size_t>> &subblocks
+)
+{
+	if( !isSupported( codec ) )
+	{
+		throw IECore::Exception( "Unsupported compression codec \"" + codec + "\"" );
+	}
+
+	result.clear();
+	subblocks.clear();
+
+	std::unique_ptr<char[]> shuffled;
+	if( itemSize > 1 )
+	{
+		shuffled.reset( new char[size] );
+		shuffle( data, shuffled.get(), size, itemSize );
+		data = shuffled.get();
+	}
+
+	// Compress each sub-block in parallel. PCL may split a sub-block further
+	// if it exceeds the codec's maximum block size, and returns no sub-blocks
+	// if the data can't be compressed.
+	const size_t numSubblocks = std::max<size_t>( 1, ( size + subblockSize - 1 ) / subblockSize );
+	std::vector<pcl::Compression::subblock_list> compressed( numSubblocks );
+	std::atomic<bool> incompressible( false );
+
+	tbb::parallel_for(
+		tbb::blocked_range<size_t>( 0, numSubblocks, 1 ),
+		[&] ( const tbb::blocked_range<size_t> &range ) {
+			std::unique_ptr<pcl::Compression> compression = createCompression( codec );
+			for( size_t i = range.begin(); i < range.end() && !incompressible; ++i )
+			{
+				const size_t offset = i * subblockSize;
+				try
+				{
+					compressed[i] = compression->Compress( data + offset, std::min( subblockSize, size - offset ) );
+				}
+				catch( const pcl::Exception &e )
+				{
+					throw IECore::Exception( message( e ) );
+				}
+
+				if( compressed[i].IsEmpty() )
+				{
+					incompressible = true;
+				}
+			}
+		}
+	);
+
+	if( incompressible )
+	{
+		return false;
+	}
+
+	size_t compressedSize = 0;
+	for( const auto &list : compressed )
+	{
+		for( const auto &subblock : list )
+		{
+			compressedSize += subblock.compressedData.Length();
+		}
+	}
+
+	result.reserve( compressedSize );
+	for( const auto &list : compressed )
+	{
+		for( const auto &subblock : list )
+		{
+			result.insert( result.end(), subblock.compressedData.Begin(), subblock.compressedData.End() );
+			subblocks.push_back( { subblock.compressedData.Length(), subblock.uncompressedSize } );
+		}
+	}
+
+	return true;
+}
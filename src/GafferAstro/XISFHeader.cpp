@@ -0,0 +1,536 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+#include "GafferAstro/Private/XISFHeader.h"
+
+#include "GafferAstro/Private/FITSHeader.h"
+
+#include "IECore/Exception.h"
+#include "IECore/SimpleTypedData.h"
+#include "IECore/VectorTypedData.h"
+
+#include "boost/algorithm/string/classification.hpp"
+#include "boost/algorithm/string/split.hpp"
+#include "boost/lexical_cast.hpp"
+#include "boost/regex.hpp"
+
+#include <cctype>
+#include <cstdint>
+#include <istream>
+#include <map>
+
+using namespace IECore;
+using namespace GafferAstro::Private;
+
+//////////////////////////////////////////////////////////////////////////
+// Internal utilities
+//////////////////////////////////////////////////////////////////////////
+
+namespace
+{
+
+const char g_signature[] = "XISF0100";
+const size_t g_signatureSize = 8;
+// The signature, followed by the header length
+// and a reserved field.
+const size_t g_preambleSize = 16;
+// Real profiles are far smaller, so anything bigger is
+// assumed to be corrupt rather than being read.
+const size_t g_maxICCProfileSize = 16 * 1024 * 1024;
+
+// Matches an element, capturing its attributes and, unless it
+// is empty, its content.
+boost::regex elementExpression( const std::string &name )
+{
+	return boost::regex( "<" + name + "\\b([^>]*?)(?:/>|>([\\s\\S]*?)</" + name + "\\s*>)" );
+}
+
+// Replaces the predefined XML entities and character references.
+std::string unescape( const std::string &text )
+{
+	if( text.find( '&' ) == std::string::npos )
+	{
+		return text;
+	}
+
+	static const std::map<std::string, std::string> g_entities = {
+		{ "amp", "&" }, { "lt", "<" }, { "gt", ">" }, { "quot", "\"" }, { "apos", "'" }
+	};
+
+	std::string result;
+	size_t i = 0;
+	while( i < text.size() )
+	{
+		const size_t end = text[i] == '&' ? text.find( ';', i ) : std::string::npos;
+		if( end == std::string::npos )
+		{
+			result.push_back( text[i++] );
+			continue;
+		}
+
+		const std::string entity = text.substr( i + 1, end - i - 1 );
+		auto it = g_entities.find( entity );
+		if( it != g_entities.end() )
+		{
+			result += it->second;
+		}
+		else if( entity.size() > 1 && entity[0] == '#' )
+		{
+			// Character references outside of ASCII are rare in headers,
+			// so we don't bother encoding them as UTF-8.
+			const bool hex = entity[1] == 'x';
+			const long code = std::strtol( entity.c_str() + ( hex ? 2 : 1 ), nullptr, hex ? 16 : 10 );
+			result.push_back( code > 0 && code < 128 ? (char)code : '?' );
+		}
+		else
+		{
+			result += text.substr( i, end - i + 1 );
+		}
+		i = end + 1;
+	}
+
+	return result;
+}
+
+typedef std::map<std::string, std::string> Attributes;
+
+Attributes attributes( const std::string &element )
+{
+	static const boost::regex g_attributeExpression( "([\\w:]+)\\s*=\\s*\"([^\"]*)\"" );
+
+	Attributes result;
+	for( boost::sregex_iterator it( element.begin(), element.end(), g_attributeExpression ), eIt; it != eIt; ++it )
+	{
+		result[(*it)[1].str()] = unescape( (*it)[2].str() );
+	}
+	return result;
+}
+
+std::string attribute( const Attributes &attributes, const char *name )
+{
+	auto it = attributes.find( name );
+	return it != attributes.end() ? it->second : std::string();
+}
+
+// Converts a scalar or string property to the equivalent IECore::Data type.
+// Vector, matrix and complex properties, and those stored in data blocks
+// rather than inline, are not supported.
+DataPtr propertyData( const Attributes &a, const std::string &content )
+{
+	const std::string type = attribute( a, "type" );
+	const std::string value = attribute( a, "value" );
+
+	try
+	{
+		if( type == "String" || type == "TimePoint" )
+		{
+			if( !attribute( a, "location" ).empty() )
+			{
+				return nullptr;
+			}
+			return new StringData( a.count( "value" ) ? value : unescape( content ) );
+		}
+		else if( type == "Boolean" )
+		{
+			return new BoolData( value == "1" || value == "true" );
+		}
+		else if( type == "Int8" || type == "Int16" || type == "Int32" || type == "UInt8" || type == "UInt16" )
+		{
+			return new IntData( boost::lexical_cast<int>( value ) );
+		}
+		else if( type == "UInt32" || type == "Int64" )
+		{
+			return new Int64Data( boost::lexical_cast<int64_t>( value ) );
+		}
+		else if( type == "UInt64" )
+		{
+			return new UInt64Data( boost::lexical_cast<uint64_t>( value ) );
+		}
+		else if( type == "Float32" )
+		{
+			return new FloatData( boost::lexical_cast<float>( value ) );
+		}
+		else if( type == "Float64" )
+		{
+			return new DoubleData( boost::lexical_cast<double>( value ) );
+		}
+	}
+	catch( const boost::bad_lexical_cast & )
+	{
+		// Fall through to ignore malformed values
+	}
+
+	return nullptr;
+}
+
+void addProperties( const std::string &xml, CompoundDataMap &members )
+{
+	static const boost::regex g_propertyExpression = elementExpression( "Property" );
+	for( boost::sregex_iterator it( xml.begin(), xml.end(), g_propertyExpression ), eIt; it != eIt; ++it )
+	{
+		const Attributes a = attributes( (*it)[1].str() );
+		const std::string id = attribute( a, "id" );
+		if( id.empty() )
+		{
+			continue;
+		}
+
+		if( DataPtr data = propertyData( a, (*it)[2].str() ) )
+		{
+			members[id] = data;
+		}
+	}
+}
+
+CompoundDataPtr imageMetadata( const std::string &content )
+{
+	std::vector<FITSHeader::Card> cards;
+
+	static const boost::regex g_keywordExpression = elementExpression( "FITSKeyword" );
+	for( boost::sregex_iterator it( content.begin(), content.end(), g_keywordExpression ), eIt; it != eIt; ++it )
+	{
+		const Attributes a = attributes( (*it)[1].str() );
+		cards.push_back( FITSHeader::makeCard( attribute( a, "name" ), attribute( a, "value" ), attribute( a, "comment" ) ) );
+	}
+
+	CompoundDataPtr result = FITSHeader::cardsMetadata( cards );
+	addProperties( content, result->writable() );
+	return result;
+}
+
+std::vector<std::string> split( const std::string &value, const char *separators = ":" )
+{
+	std::vector<std::string> result;
+	boost::split( result, value, boost::is_any_of( separators ) );
+	return result;
+}
+
+// Decodes base64 or hexadecimal text, as used by inline data blocks,
+// ignoring whitespace. Returns false if the text is malformed.
+bool decode( const std::string &text, const std::string &encoding, std::vector<unsigned char> &result )
+{
+	static const std::string g_base64Digits = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/";
+	static const std::string g_hexDigits = "0123456789abcdef";
+
+	const bool base64 = encoding == "base64";
+	if( !base64 && encoding != "hex" )
+	{
+		return false;
+	}
+
+	unsigned int bits = 0;
+	int numBits = 0;
+	for( char c : text )
+	{
+		if( std::isspace( (unsigned char)c ) )
+		{
+			continue;
+		}
+		if( base64 && c == '=' )
+		{
+			break;
+		}
+
+		const size_t digit = base64 ? g_base64Digits.find( c ) : g_hexDigits.find( std::tolower( (unsigned char)c ) );
+		if( digit == std::string::npos )
+		{
+			return false;
+		}
+
+		bits = ( bits << ( base64 ? 6 : 4 ) ) | digit;
+		numBits += base64 ? 6 : 4;
+		if( numBits >= 8 )
+		{
+			numBits -= 8;
+			result.push_back( ( bits >> numBits ) & 0xff );
+		}
+	}
+
+	return true;
+}
+
+// Returns the ICC profile in an image element's content, reading it from
+// the file if it is an attachment, or decoding it if it is inline. Profiles
+// embedded in Data elements are not supported.
+UCharVectorDataPtr iccProfile( const std::string &content, std::istream &stream )
+{
+	static const boost::regex g_iccProfileExpression = elementExpression( "ICCProfile" );
+	boost::smatch match;
+	if( !boost::regex_search( content, match, g_iccProfileExpression ) )
+	{
+		return nullptr;
+	}
+
+	const std::vector<std::string> location = split( attribute( attributes( match[1].str() ), "location" ) );
+	UCharVectorDataPtr result = new UCharVectorData;
+	std::vector<unsigned char> &profile = result->writable();
+
+	if( location.size() == 3 && location[0] == "attachment" )
+	{
+		size_t offset, size;
+		try
+		{
+			offset = boost::lexical_cast<size_t>( location[1] );
+			size = boost::lexical_cast<size_t>( location[2] );
+		}
+		catch( const boost::bad_lexical_cast & )
+		{
+			return nullptr;
+		}
+
+		if( size > g_maxICCProfileSize )
+		{
+			return nullptr;
+		}
+
+		// Restore the stream afterwards, so that the read is
+		// invisible to the caller.
+		const std::streampos position = stream.tellg();
+		profile.resize( size );
+		stream.seekg( offset );
+		stream.read( reinterpret_cast<char *>( profile.data() ), size );
+		const bool complete = stream.gcount() == (std::streamsize)size;
+		stream.clear();
+		stream.seekg( position );
+		return complete ? result : nullptr;
+	}
+	else if( location.size() == 2 && location[0] == "inline" )
+	{
+		return decode( match[2].str(), location[1], profile ) ? result : nullptr;
+	}
+
+	return nullptr;
+}
+
+XISFHeader::Image parseImage( const std::string &element, const std::string &content, std::istream &stream )
+{
+	const Attributes a = attributes( element );
+	auto attribute = [&a] ( const char *name ) {
+		return ::attribute( a, name );
+	};
+
+	XISFHeader::Image result;
+	result.id = attribute( "id" );
+	result.width = result.height = result.numChannels = 0;
+	result.sampleFormat = attribute( "sampleFormat" );
+	result.pixelStorage = attribute( "pixelStorage" );
+	result.byteOrder = attribute( "byteOrder" );
+	result.compression = attribute( "compression" );
+	result.byteShuffled = false;
+	result.uncompressedSize = result.itemSize = 0;
+	result.attached = false;
+	result.dataOffset = result.dataSize = 0;
+	CompoundDataPtr metadata = imageMetadata( content );
+	if( UCharVectorDataPtr profile = iccProfile( content, stream ) )
+	{
+		metadata->writable()["XISF:ICCProfile"] = profile;
+	}
+	result.metadata = metadata;
+
+	try
+	{
+		// Geometry is `width:height[:depth...]:numChannels`. We
+		// only support two dimensional images.
+		const std::vector<std::string> geometry = split( attribute( "geometry" ) );
+		if( geometry.size() == 3 )
+		{
+			result.width = boost::lexical_cast<int>( geometry[0] );
+			result.height = boost::lexical_cast<int>( geometry[1] );
+			result.numChannels = boost::lexical_cast<int>( geometry[2] );
+		}
+
+		const std::vector<std::string> location = split( attribute( "location" ) );
+		if( location.size() == 3 && location[0] == "attachment" )
+		{
+			result.dataOffset = boost::lexical_cast<size_t>( location[1] );
+			result.dataSize = boost::lexical_cast<size_t>( location[2] );
+			result.attached = true;
+		}
+
+		const std::vector<std::string> compression = split( result.compression );
+		if( compression.size() >= 2 )
+		{
+			result.codec = compression[0];
+			const size_t shuffle = result.codec.rfind( "+sh" );
+			if( shuffle != std::string::npos && shuffle == result.codec.size() - 3 )
+			{
+				result.codec.erase( shuffle );
+				result.byteShuffled = true;
+			}
+			result.uncompressedSize = boost::lexical_cast<size_t>( compression[1] );
+			result.itemSize = compression.size() > 2 ? boost::lexical_cast<size_t>( compression[2] ) : 1;
+
+			// Sub-blocks are listed as `compressedSize,uncompressedSize:...`.
+			const std::string subblocks = attribute( "subblocks" );
+			if( subblocks.empty() )
+			{
+				result.subblocks.push_back( { result.dataSize, result.uncompressedSize } );
+			}
+			else
+			{
+				for( const auto &subblock : split( subblocks ) )
+				{
+					const std::vector<std::string> sizes = split( subblock, "," );
+					if( sizes.size() != 2 )
+					{
+						throw boost::bad_lexical_cast();
+					}
+					result.subblocks.push_back( {
+						boost::lexical_cast<size_t>( sizes[0] ), boost::lexical_cast<size_t>( sizes[1] )
+					} );
+				}
+			}
+		}
+	}
+	catch( const boost::bad_lexical_cast & )
+	{
+		throw IECore::Exception( "Invalid XISF image element" );
+	}
+
+	return result;
+}
+
+} // namespace
+
+//////////////////////////////////////////////////////////////////////////
+// XISFHeader::Image
+//////////////////////////////////////////////////////////////////////////
+
+size_t XISFHeader::Image::sampleSize() const
+{
+	static const std::map<std::string, size_t> g_sampleSizes = {
+		{ "UInt8", 1 }, { "UInt16", 2 }, { "UInt32", 4 }, { "UInt64", 8 },
+		{ "Float32", 4 }, { "Float64", 8 }, { "Complex32", 8 }, { "Complex64", 16 }
+	};
+
+	auto it = g_sampleSizes.find( sampleFormat );
+	return it != g_sampleSizes.end() ? it->second : 0;
+}
+
+bool XISFHeader::Image::isRawAttachment() const
+{
+	return
+		attached &&
+		compression.empty() &&
+		( pixelStorage.empty() || pixelStorage == "Planar" ) &&
+		( byteOrder.empty() || byteOrder == "little" ) &&
+		sampleSize() &&
+		dataSize >= (size_t)width * height * numChannels * sampleSize()
+	;
+}
+
+bool XISFHeader::Image::isCompressedAttachment() const
+{
+	if(
+		!attached || codec.empty() ||
+		!( pixelStorage.empty() || pixelStorage == "Planar" ) ||
+		!( byteOrder.empty() || byteOrder == "little" ) ||
+		!sampleSize() || !itemSize ||
+		uncompressedSize != (size_t)width * height * numChannels * sampleSize()
+	)
+	{
+		return false;
+	}
+
+	size_t compressedTotal = 0;
+	size_t uncompressedTotal = 0;
+	for( const auto &subblock : subblocks )
+	{
+		compressedTotal += subblock.first;
+		uncompressedTotal += subblock.second;
+	}
+
+	return compressedTotal <= dataSize && uncompressedTotal == uncompressedSize;
+}
+
+//////////////////////////////////////////////////////////////////////////
+// XISFHeader
+//////////////////////////////////////////////////////////////////////////
+
+XISFHeader::XISFHeader( std::istream &stream )
+	:	m_metadata( new CompoundData ), m_size( 0 )
+{
+	char preamble[g_preambleSize];
+	stream.read( preamble, g_preambleSize );
+	if( stream.gcount() != (std::streamsize)g_preambleSize || std::string( preamble, g_signatureSize ) != g_signature )
+	{
+		throw IECore::Exception( "Not a monolithic XISF file" );
+	}
+
+	const unsigned char *length = reinterpret_cast<const unsigned char *>( preamble + g_signatureSize );
+	const uint32_t headerLength = length[0] | length[1] << 8 | length[2] << 16 | (uint32_t)length[3] << 24;
+
+	std::string xml( headerLength, '\0' );
+	stream.read( &xml[0], headerLength );
+	if( stream.gcount() != (std::streamsize)headerLength )
+	{
+		throw IECore::Exception( "Unexpected end of file while reading XISF header" );
+	}
+	m_size = g_preambleSize + headerLength;
+
+	// We are only interested in a handful of elements, which can't be
+	// nested within one another, so a full XML parser would be overkill.
+	static const boost::regex g_imageExpression = elementExpression( "Image" );
+	for( boost::sregex_iterator it( xml.begin(), xml.end(), g_imageExpression ), eIt; it != eIt; ++it )
+	{
+		m_images.push_back( parseImage( (*it)[1].str(), (*it)[2].str(), stream ) );
+	}
+
+	static const boost::regex g_metadataExpression = elementExpression( "Metadata" );
+	boost::smatch match;
+	if( boost::regex_search( xml, match, g_metadataExpression ) )
+	{
+		addProperties( match[2].str(), m_metadata->writable() );
+	}
+}
+
+XISFHeader::~XISFHeader()
+{
+}
+
+const std::vector<XISFHeader::Image> &XISFHeader::images() const
+{
+	return m_images;
+}
+
+const IECore::CompoundData *XISFHeader::metadata() const
+{
+	return m_metadata.get();
+}
+
+size_t XISFHeader::size() const
+{
+	return m_size;
+}
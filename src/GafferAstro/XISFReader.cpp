@@ -38,8 +38,10 @@
 
 #include "GafferAstro/XISFReader.h"
 
-// The nested TaskMutex needs to be the first to include tbb
-#include "GafferAstro/Private/LRUCache.h"
+#include "GafferAstro/Private/Cache.h"
+#include "GafferAstro/Private/MipPyramid.h"
+#include "GafferAstro/Private/XISFCompression.h"
+#include "GafferAstro/Private/XISFHeader.h"
 
 #include "GafferImage/FormatPlug.h"
 #include "GafferImage/ImageAlgo.h"
@@ -53,14 +55,27 @@
 #include "IECore/FileSequence.h"
 #include "IECore/FileSequenceFunctions.h"
 #include "IECore/MessageHandler.h"
+#include "IECore/SimpleTypedData.h"
 
 #include "boost/bind.hpp"
 #include "boost/filesystem/path.hpp"
+#include "boost/iostreams/device/mapped_file.hpp"
+#include "boost/noncopyable.hpp"
 #include "boost/regex.hpp"
 
-#include "tbb/mutex.h"
+#include "tbb/task_arena.h"
+#include "tbb/task_group.h"
 
+#include <atomic>
+#include <condition_variable>
+#include <cstdint>
+#include <cstdlib>
+#include <cstring>
+#include <fstream>
 #include <memory>
+#include <mutex>
+#include <sstream>
+#include <tuple>
 
 #include "pcl/XISF.h"
 
@@ -71,6 +86,7 @@ using namespace IECore;
 using namespace GafferImage;
 using namespace Gaffer;
 using namespace GafferAstro;
+using namespace GafferAstro::Private;
 
 namespace
 {
@@ -120,22 +136,107 @@ class LogHandler : public pcl::XISFLogHandler
 
 const IECore::InternedString g_tileBatchIndexContextName( "__tileBatchIndex" );
 
+// A pcl::XISFReader may only be used by one thread at a time, so we keep a
+// small pool of readers per file, allowing channels to be read concurrently
+// without opening an unbounded number of descriptors.
+const size_t g_maxReadersPerFile = 4;
+
+// The approximate size of the data held by a tile batch. Batches for narrow
+// images are made taller to fill this budget, amortising the overhead of
+// each read and compute across more tiles.
+const size_t g_tileBatchBudget = 8 * 1024 * 1024;
+
+// The maximum width and height, in tiles, of tile batches for planes read
+// straight from the mapping. Any region of these can be read as cheaply as a
+// whole scanline, so small batches let a crop read little more than it needs.
+const int g_mappedTileBatchSize = 8;
+
+// The number of tile batches to read ahead of each batch that is requested.
+// Zero disables prefetching.
+std::atomic<size_t> g_prefetchDepth( 0 );
+
+// Statistics for tuning the prefetch depth.
+std::atomic<uint64_t> g_prefetchScheduled( 0 );
+std::atomic<uint64_t> g_prefetchHits( 0 );
+std::atomic<uint64_t> g_prefetchMisses( 0 );
+
+// Limits for the file cache. Files are costed by the memory they hold, but
+// never less than an equal share of the memory limit, so that both limits
+// are enforced by a single cost.
+std::atomic<size_t> g_openFilesLimit( 200 );
+std::atomic<size_t> g_memoryLimit( 2048 * 1024 * 1024ull );
+
+// Statistics for the file cache.
+std::atomic<uint64_t> g_openFiles( 0 );
+std::atomic<uint64_t> g_fileMemoryUsage( 0 );
+
+// Prefetches run in their own arena, so that threads waiting on unrelated
+// tasks in Gaffer's computes can't pick them up and be delayed by them.
+tbb::task_arena *prefetchArena()
+{
+	static tbb::task_arena *a = new tbb::task_arena;
+	return a;
+}
+
+typedef std::unique_ptr<pcl::XISFReader> ReaderPtr;
+
+ReaderPtr openReader( const std::string &fileName )
+{
+	ReaderPtr reader( new pcl::XISFReader );
+	reader->SetLogHandler( new LogHandler );
+	reader->Open( pcl::String( fileName.c_str() ) );
+	if( !reader->IsOpen() )
+	{
+		throw IECore::Exception( "XISFReader : Could not open " + fileName );
+	}
+	return reader;
+}
+
+// The formats we can convert directly from mapped data.
+enum class MappedFormat
+{
+	None,
+	Float32,
+	UInt16
+};
+
 struct ChannelMapEntry
 {
 	ChannelMapEntry( int subImage, int channelIndex )
-		: subImage( subImage ), channelIndex( channelIndex )
+		: subImage( subImage ), channelIndex( channelIndex ), mappedData( nullptr ), mappedFormat( MappedFormat::None ), compressed( false ), tileBatchSize( 1 )
 	{}
 
 	ChannelMapEntry( const ChannelMapEntry & ) = default;
 
 	ChannelMapEntry()
-		: subImage( 0 ), channelIndex( 0 )
+		: subImage( 0 ), channelIndex( 0 ), mappedData( nullptr ), mappedFormat( MappedFormat::None ), compressed( false ), tileBatchSize( 1 )
 	{}
 
 	int subImage;
 	int channelIndex;
+	// The start of the channel's plane within the mapped file, or null
+	// if the plane must be decompressed or read via PCL.
+	const char *mappedData;
+	// The format of the samples in the mapped or decompressed plane.
+	MappedFormat mappedFormat;
+	// True if the plane is decompressed by us rather than by PCL.
+	bool compressed;
+	// The size of the plane's tile batches, in tiles.
+	Imath::V2i tileBatchSize;
 };
 
+// Converts normalised 16 bit samples to float, matching the conversion
+// performed by PCL. This is a simple loop, so it is vectorised by the
+// compiler.
+void convertUInt16( const uint16_t *src, float *dst, size_t n )
+{
+	const float scale = 1.0f / 65535.0f;
+	for( size_t i = 0; i < n; ++i )
+	{
+		dst[i] = src[i] * scale;
+	}
+}
+
 // A divide that always rounds down, instead of towards zero
 //  ( note that b is assumed positive )
 int coordinateDivide( int a, int b )
@@ -161,213 +262,843 @@ V2i coordinateDivide( V2i a, V2i b )
 // a large enough chunk of data that it can be read from the file with minimal waste.  We cache tile batches
 // on XISFReader::tileBatchPlug, and then XISFReader::computeChannelData just needs to select the
 // correct tile batch index, access tileBatchPlug, and then return the tile at the correct tileBatchSubIndex.
-// A tile batch is one tile high, and the full width of the image.
+// Tile batches for planes read straight from the mapping are small square blocks of tiles, so that
+// a crop only reads the region around it. Other tile batches are the full width of the image, and as
+// many tiles high as will fit in the g_tileBatchBudget.
+//
+// Each tile batch holds a single channel, so that consumers of a subset of the channels don't pay to
+// decode and cache the others.
+//
+// Uncompressed images are usually stored as planar attachments, in which case we map the file and
+// convert scanlines straight from the mapping into tiles, bypassing PCL and its buffering entirely.
+// Compressed attachments are decompressed from the mapping the first time any of their planes are
+// read, with their sub-blocks decompressed in parallel, and the decompressed image is held by the
+// File so that subsequent tile batches are converted from memory.
+//
+// Tile batches are selected using V3i "tileBatchIndex".  The Z component is the index of the plane to load,
+// where planes are all the channels of all the images in the file, numbered consecutively. The X and Y
+// component select a region of the image.
 //
-// Tile batches are selected using V3i "tileBatchIndex".  The Z component is the subimage to load channels from.
-// The X and Y component select a region of the image.
+// When prefetching is enabled, each request for a tile batch schedules background reads of the batches
+// that follow it in the same plane. These are held by the File until they are requested, at which point
+// they are handed over to be cached on the tile batch plug.
 //
 class File
 {
 
 	public:
 
-		File( std::unique_ptr<pcl::XISFReader> reader )
-			: m_reader( std::move( reader ) )
+		File( const std::string &fileName, ReaderPtr reader )
+			: m_fileName( fileName ), m_mipKey( MipPyramid::fileKey( fileName ) ), m_numReaders( 1 )
 		{
+			// PCL doesn't expose the location of the data blocks, so we
+			// parse the header ourselves to find them.
+			try
+			{
+				std::ifstream stream( fileName, std::ios::binary );
+				m_header = new XISFHeader( stream );
+			}
+			catch( const std::exception &e )
+			{
+				throw IECore::Exception( "XISFReader : Could not read header of " + fileName + " : " + e.what() );
+			}
+
+			// The first image provides the main channels and defines the data window.
+			// The channels of any further images (rejection maps, weights etc) are
+			// prefixed with the image's id, or its index if it doesn't have one.
 			std::vector<std::string> channelNames;
 
-			if( m_reader->NumberOfImages() > 0 )
+			for( int image = 0; image < (int)reader->NumberOfImages(); ++image )
 			{
-				m_reader->SelectImage( 0 );
-				m_info = m_reader->ImageInfo();
+				reader->SelectImage( image );
+				m_imageInfo.push_back( reader->ImageInfo() );
+				const pcl::ImageInfo &info = m_imageInfo.back();
 
-				if( m_info.numberOfChannels == 1 )
+				std::vector<std::string> imageChannelNames;
+				if( info.numberOfChannels == 1 )
+				{
+					imageChannelNames = { "Y" };
+				}
+				else if( info.numberOfChannels == 3 )
 				{
-					channelNames.push_back( "Y" );
-					m_channelMap[ "Y" ] = ChannelMapEntry( 0, 0 );
+					imageChannelNames = { "R", "G", "B" };
 				}
-				else if( m_info.numberOfChannels == 3 )
+
+				std::string prefix;
+				if( image > 0 )
 				{
-					channelNames.push_back( "R" );
-					channelNames.push_back( "G" );
-					channelNames.push_back( "B" );
-					m_channelMap[ "R" ] = ChannelMapEntry( 0, 0 );
-					m_channelMap[ "G" ] = ChannelMapEntry( 0, 1 );
-					m_channelMap[ "B" ] = ChannelMapEntry( 0, 2 );
+					const std::string id = image < (int)m_header->images().size() ? m_header->images()[image].id : "";
+					prefix = ( id.empty() ? "image" + std::to_string( image ) : id ) + ".";
 				}
+
+				for( size_t i = 0; i < imageChannelNames.size(); ++i )
+				{
+					const std::string channelName = prefix + imageChannelNames[i];
+					if( m_channelMap.count( channelName ) )
+					{
+						continue;
+					}
+					channelNames.push_back( channelName );
+					m_channelMap[ channelName ] = m_planes.size();
+					m_planes.push_back( ChannelMapEntry( image, i ) );
+				}
+			}
+
+			if( !m_imageInfo.empty() )
+			{
+				m_info = m_imageInfo[0];
 			}
 
 			m_channelNamesData = new StringVectorData( channelNames );
 
-			// Set up a tile batch that is one tile high, and wide enough to hold everything from the beginning
-			// of a scanline to the end
-			m_tileBatchSize = V2i( 0, 1 ) +
-				ImagePlug::tileIndex( V2i( m_info.width + ImagePlug::tileSize() - 1, 0 ) ) -
-				ImagePlug::tileIndex( V2i( 0 ) );
+			// Metadata is converted up front, so that it is free to query
+			// once the file is in the cache.
+			CompoundDataPtr metadata = m_header->metadata()->copy();
+			if( !m_header->images().empty() )
+			{
+				for( const auto &m : m_header->images()[0].metadata->readable() )
+				{
+					metadata->writable()[m.first] = m.second;
+				}
+			}
+			m_metadata = metadata;
+
+			mapData();
+
+			// Set up a tile batch that is wide enough to hold everything from the beginning
+			// of a scanline to the end, and as many tiles high as fit in our budget, without
+			// exceeding the height of the image.
+			const V2i numTiles(
+				std::max( 1, ( m_info.width + ImagePlug::tileSize() - 1 ) / ImagePlug::tileSize() ),
+				std::max( 1, ( m_info.height + ImagePlug::tileSize() - 1 ) / ImagePlug::tileSize() )
+			);
+			const size_t tileRowSize = (size_t)numTiles.x * ImagePlug::tilePixels() * sizeof( float );
+			const V2i scanlineBatchSize( numTiles.x, std::max( 1, std::min<int>( g_tileBatchBudget / tileRowSize, numTiles.y ) ) );
+
+			// Planes read straight from the mapping can be read a region at a time, so
+			// their batches are limited in width as well. PCL can only read whole scanlines,
+			// and compressed planes are decompressed whole on first read, so splitting the
+			// width of their batches would gain nothing.
+			const V2i mappedBatchSize( std::min( g_mappedTileBatchSize, numTiles.x ), std::min( g_mappedTileBatchSize, numTiles.y ) );
+			for( auto &plane : m_planes )
+			{
+				plane.tileBatchSize = plane.mappedData ? mappedBatchSize : scanlineBatchSize;
+			}
+
+			// Keep the reader we were constructed with for reading data
+			m_readers.push_back( std::move( reader ) );
+
+			m_memoryUsage = estimateMemoryUsage();
+			g_openFiles++;
+			g_fileMemoryUsage += m_memoryUsage;
+		}
+
+		~File()
+		{
+			// Prefetches refer to the File, so must not outlive it. Queued
+			// prefetches are cancelled, and we wait for any in progress.
+			m_prefetchTasks.cancel();
+			prefetchArena()->execute( [this] { m_prefetchTasks.wait(); } );
+
+			g_openFiles--;
+			g_fileMemoryUsage -= m_memoryUsage;
+		}
+
+		// The approximate number of bytes held by the File and its readers.
+		size_t memoryUsage() const
+		{
+			return m_memoryUsage;
 		}
 
 
 		// Read a chunk of data from the file, formatted as a tile batch that will be stored on the tile batch plug
 		ConstObjectVectorPtr readTileBatch( V3i tileBatchIndex )
 		{
-			V2i batchFirstTile = V2i( tileBatchIndex.x, tileBatchIndex.y ) * m_tileBatchSize;
-			Box2i targetRegion = Box2i( batchFirstTile * ImagePlug::tileSize(),
-				( batchFirstTile + m_tileBatchSize ) * ImagePlug::tileSize()
+			ConstObjectVectorPtr result = takePrefetchedBatch( tileBatchIndex );
+			if( result )
+			{
+				g_prefetchHits++;
+			}
+			else
+			{
+				result = decodeTileBatch( tileBatchIndex );
+				g_prefetchMisses++;
+			}
+
+			schedulePrefetch( tileBatchIndex );
+			return result;
+		}
+
+		// Given a channelName and tileOrigin, return the information necessary to look up the data for this tile.
+		// The tileBatchIndex is used to find a tileBatch, and then the tileBatchSubIndex tells you the index
+		// within that tile to use
+		void findTile( const std::string &channelName, const Imath::V2i &tileOrigin, V3i &batchIndex, int &batchSubIndex ) const
+		{
+			if( !channelName.size() )
+			{
+				// For computing sample offset;
+				// This is a bit of a weird interface, I should probably fix it
+				batchIndex = tileBatchIndex( 0, tileOrigin );
+			}
+			else
+			{
+				batchIndex = tileBatchIndex( m_channelMap.at( channelName ), tileOrigin );
+			}
+			batchSubIndex = tileBatchSubIndex( batchIndex.z, tileOrigin );
+		}
+
+		// Returns the specified level of the preview pyramid for a channel,
+		// generating it if necessary.
+		MipPyramid::ConstLevelPtr mipLevel( const std::string &channelName, int level )
+		{
+			const int planeIndex = m_channelMap.at( channelName );
+			const ChannelMapEntry &plane = m_planes[planeIndex];
+			const pcl::ImageInfo &info = m_imageInfo[ plane.subImage ];
+			const V2i size( info.width, info.height );
+
+			return MipPyramid::level(
+				m_mipKey + ":" + std::to_string( planeIndex ), size, level,
+				[this, &plane, &size] ( int minY, int maxY, float *dst ) {
+					// Rows are stored top to bottom, so are flipped as they are copied.
+					const char *planeData = plane.compressed ? decompressedData( plane ) : plane.mappedData;
+					if( planeData )
+					{
+						for( int y = minY; y < maxY; ++y )
+						{
+							readMappedScanline( plane, planeData, size.y - 1 - y, 0, size.x, dst + (size_t)( y - minY ) * size.x );
+						}
+						return;
+					}
+
+					std::vector<float> data;
+					Box2i dataRegion;
+					readRegion( plane, Box2i( V2i( 0, minY ), V2i( size.x, maxY ) ), data, dataRegion );
+					for( int y = minY; y < maxY; ++y )
+					{
+						const float *src = &data[ (size_t)( maxY - 1 - y ) * size.x ];
+						std::copy( src, src + size.x, dst + (size_t)( y - minY ) * size.x );
+					}
+				}
 			);
+		}
+
+		const pcl::ImageInfo &info() const
+		{
+			return m_info;
+		}
 
-			// For scanline images, we always treat the tile batch as starting from the left of the data window
-			batchFirstTile.x = ImagePlug::tileIndex( V2i( 0 ) ).x;
+		ConstStringVectorDataPtr channelNamesData()
+		{
+			return m_channelNamesData;
+		}
 
-			targetRegion.min.x = 0;
-			targetRegion.max.x = m_info.width;
+		ConstCompoundDataPtr metadata()
+		{
+			return m_metadata;
+		}
+
+	private:
+
+		ConstObjectVectorPtr decodeTileBatch( V3i tileBatchIndex )
+		{
+			const ChannelMapEntry &plane = m_planes.at( tileBatchIndex.z );
+			const V2i &tileBatchSize = plane.tileBatchSize;
+
+			const V2i batchFirstTile = V2i( tileBatchIndex.x, tileBatchIndex.y ) * tileBatchSize;
+			Box2i targetRegion = Box2i( batchFirstTile * ImagePlug::tileSize(),
+				( batchFirstTile + tileBatchSize ) * ImagePlug::tileSize()
+			);
+
+			// Images other than the first may be a different size, in which case
+			// they are read from the bottom left, and clipped to the data window.
+			const pcl::ImageInfo &info = m_imageInfo[ plane.subImage ];
 
 			ObjectVectorPtr result = new ObjectVector();
 
 			// Do the actual read of data
 
+
+			const char *planeData = plane.compressed ? decompressedData( plane ) : plane.mappedData;
+
 			std::vector<float> fileData;
 			Box2i fileDataRegion;
-			const int nchannels = readRegion( tileBatchIndex.z, targetRegion, fileData, fileDataRegion );
+			if( planeData )
+			{
+				// We'll read straight from the mapping or decompressed data as we
+				// fill each tile.
+				fileDataRegion = BufferAlgo::intersection( targetRegion, Box2i( V2i( 0 ), V2i( info.width, info.height ) ) );
+			}
+			else
+			{
+				// PCL reads whole scanlines.
+				targetRegion.min.x = 0;
+				targetRegion.max.x = info.width;
+				readRegion( plane, targetRegion, fileData, fileDataRegion );
+			}
 			const V2i fileDataRegionSize = fileDataRegion.size();
-			size_t channelPixelOffset = fileDataRegionSize.x * fileDataRegionSize.y;
+			// The first row of the region in the file, which stores rows top to bottom
+			const int fileDataFirstRow = info.height - fileDataRegion.max.y;
 
-			// Unpack the channels back into their own tiles. readRegion stores all scanlines for each channel
-			// together, rather than in any interleaved fashion.
-			int tileBatchNumElements = nchannels * m_tileBatchSize.y * m_tileBatchSize.x;
+			// Unpack the channel into its own tiles.
+			int tileBatchNumElements = tileBatchSize.y * tileBatchSize.x;
 			result->members().resize( tileBatchNumElements );
 
 			ObjectVectorPtr resultChannels = result;
 
-			for( int c = 0; c < nchannels; c++ )
+			for( int ty = batchFirstTile.y; ty < batchFirstTile.y + tileBatchSize.y; ty++ )
 			{
-				const size_t subIndexPixelOffset = channelPixelOffset * c;
-
-				for( int ty = batchFirstTile.y; ty < batchFirstTile.y + m_tileBatchSize.y; ty++ )
+				for( int tx = batchFirstTile.x; tx < batchFirstTile.x + tileBatchSize.x; tx++ )
 				{
-					for( int tx = batchFirstTile.x; tx < batchFirstTile.x + m_tileBatchSize.x; tx++ )
+					V2i tileOffset = ImagePlug::tileSize() * V2i( tx, ty );
+					const int subIndex = tileBatchSubIndex( tileBatchIndex.z, tileOffset );
+
+					const Box2i tileRelativeFileRegion( fileDataRegion.min - tileOffset, fileDataRegion.max - tileOffset );
+					const Box2i tileRegion = BufferAlgo::intersection(
+						Box2i( V2i( 0 ), V2i( ImagePlug::tileSize() ) ), tileRelativeFileRegion
+					);
+
+					if( BufferAlgo::empty( tileRegion ) )
 					{
-						V2i tileOffset = ImagePlug::tileSize() * V2i( tx, ty );
-						const int subIndex = tileBatchSubIndex( c, tileOffset );
+						const FloatVectorData* emptyResult = ImagePlug::blackTile();
+						// Result will be treated as const as soon as we set it on the plug, and we're not
+						// going to modify any elements after setting them, so it's safe to store a const
+						// value in one of the elements
+						resultChannels->members()[ subIndex ] = const_cast<FloatVectorData*>( emptyResult );
+						continue;
+					}
 
-						const Box2i tileRelativeFileRegion( fileDataRegion.min - tileOffset, fileDataRegion.max - tileOffset );
-						const Box2i tileRegion = BufferAlgo::intersection(
-							Box2i( V2i( 0 ), V2i( ImagePlug::tileSize() ) ), tileRelativeFileRegion
-						);
+					FloatVectorDataPtr tileData = new IECore::FloatVectorData( std::vector<float>( ImagePlug::tilePixels() ) );
+					vector<float> &tile = tileData->writable();
 
-						if( BufferAlgo::empty( tileRegion ) )
+					for( int y = tileRegion.min.y; y < tileRegion.max.y; ++y )
+					{
+						// Flip scanlines in y as we use bottom origin not top
+						const int scanline = fileDataRegion.size().y - 1 - (y - tileRelativeFileRegion.min.y);
+						const int x = tileRegion.min.x - tileRelativeFileRegion.min.x;
+						const int width = tileRegion.max.x - tileRegion.min.x;
+						float *tileIndex = &tile[ y * ImagePlug::tileSize() + tileRegion.min.x ];
+						if( planeData )
 						{
-							const FloatVectorData* emptyResult = ImagePlug::blackTile();
-							// Result will be treated as const as soon as we set it on the plug, and we're not
-							// going to modify any elements after setting them, so it's safe to store a const
-							// value in one of the elements
-							resultChannels->members()[ subIndex ] = const_cast<FloatVectorData*>( emptyResult );
-							continue;
+							readMappedScanline( plane, planeData, fileDataFirstRow + scanline, x, width, tileIndex );
 						}
-
-						FloatVectorDataPtr tileData = new IECore::FloatVectorData( std::vector<float>( ImagePlug::tilePixels() ) );
-						vector<float> &tile = tileData->writable();
-
-						for( int y = tileRegion.min.y; y < tileRegion.max.y; ++y )
+						else
 						{
-							// Flip scanlines in y as we use bottom origin not top
-							const int scanline = fileDataRegion.size().y - 1 - (y - tileRelativeFileRegion.min.y);
-							float *tileIndex = &tile[ y * ImagePlug::tileSize() + tileRegion.min.x ];
-							float *dataIndex = &fileData[
-								subIndexPixelOffset + ( scanline * fileDataRegionSize.x + tileRegion.min.x - tileRelativeFileRegion.min.x )
-							];
-							memcpy( tileIndex, dataIndex, ( tileRegion.max.x - tileRegion.min.x ) * sizeof(*dataIndex) );
+							const float *dataIndex = &fileData[ scanline * fileDataRegionSize.x + x ];
+							memcpy( tileIndex, dataIndex, width * sizeof(*dataIndex) );
 						}
-						resultChannels->members()[ subIndex ] = tileData;
 					}
+					resultChannels->members()[ subIndex ] = tileData;
 				}
 			}
 
 			return result;
 		}
 
-		// Given a channelName and tileOrigin, return the information necessary to look up the data for this tile.
-		// The tileBatchIndex is used to find a tileBatch, and then the tileBatchSubIndex tells you the index
-		// within that tile to use
-		void findTile( const std::string &channelName, const Imath::V2i &tileOrigin, V3i &batchIndex, int &batchSubIndex ) const
+		size_t estimateMemoryUsage() const
 		{
-			if( !channelName.size() )
+			size_t result = sizeof( File ) + m_header->size();
+
+			// We hold a single decompressed copy of the images we decompress
+			// ourselves. PCL decompresses whole data blocks, and holds on to
+			// the result for subsequent reads, so each reader may hold a copy
+			// of any other compressed image.
+			for( size_t i = 0; i < m_imageInfo.size() && i < m_header->images().size(); ++i )
 			{
-				// For computing sample offset;
-				// This is a bit of a weird interface, I should probably fix it
-				batchIndex = tileBatchIndex( 0, tileOrigin );
-				batchSubIndex = tileBatchSubIndex( 0, tileOrigin );
+				const XISFHeader::Image &image = m_header->images()[i];
+				if( image.compression.empty() )
+				{
+					continue;
+				}
+
+				const size_t imageSize = (size_t)image.width * image.height * image.numChannels * image.sampleSize();
+				result += m_decompressedImages[i] ? imageSize : imageSize * g_maxReadersPerFile;
 			}
-			else
+
+			// Prefetched batches are held until they are requested.
+			size_t batchSize = 0;
+			for( const auto &plane : m_planes )
 			{
-				ChannelMapEntry channelMapEntry = m_channelMap.at( channelName );
-				batchIndex = tileBatchIndex( channelMapEntry.subImage, tileOrigin );
-				batchSubIndex = tileBatchSubIndex( channelMapEntry.channelIndex, tileOrigin );
+				batchSize = std::max( batchSize, (size_t)plane.tileBatchSize.x * plane.tileBatchSize.y * ImagePlug::tilePixels() * sizeof( float ) );
 			}
+			result += g_prefetchDepth * m_planes.size() * batchSize;
+
+			return result;
 		}
 
-		const pcl::ImageInfo &info() const
+		// Prefetching
+		// ===========
+
+		struct Prefetch
 		{
-			return m_info;
+			enum State
+			{
+				// Waiting for a background thread to start reading
+				Queued,
+				// Being read on a background thread
+				Reading,
+				// Claimed by a compute before a background thread started
+				// reading, so it will be read synchronously instead
+				Claimed,
+				Done
+			};
+
+			State state = Queued;
+			// Null if the read failed, in which case the batch is read
+			// again synchronously to report the error.
+			ConstObjectVectorPtr batch;
+		};
+
+		typedef std::shared_ptr<Prefetch> PrefetchPtr;
+
+		// Returns the prefetched batch for `tileBatchIndex`, waiting for it to
+		// finish if it is being read. Returns null if there is no prefetch or it
+		// failed.
+		ConstObjectVectorPtr takePrefetchedBatch( const V3i &tileBatchIndex )
+		{
+			std::unique_lock<std::mutex> lock( m_prefetchMutex );
+			auto it = m_prefetches.find( tileBatchIndex );
+			if( it == m_prefetches.end() )
+			{
+				return nullptr;
+			}
+
+			PrefetchPtr prefetch = it->second;
+			m_prefetches.erase( it );
+
+			if( prefetch->state == Prefetch::Queued )
+			{
+				// Don't wait for a task that may not get a thread until we
+				// return. Reading the batch ourselves is just as quick.
+				prefetch->state = Prefetch::Claimed;
+				return nullptr;
+			}
+
+			m_prefetchDone.wait( lock, [&prefetch] { return prefetch->state == Prefetch::Done; } );
+			return prefetch->batch;
 		}
 
-		ConstStringVectorDataPtr channelNamesData()
+		// Schedules background reads of the batches following `tileBatchIndex`
+		// in the direction its column of the plane is being traversed. Rows are
+		// stored top to bottom, so we assume downwards traversal until we see
+		// otherwise.
+		void schedulePrefetch( const V3i &tileBatchIndex )
 		{
-			return m_channelNamesData;
-		}
+			const size_t depth = g_prefetchDepth;
+			if( !depth )
+			{
+				return;
+			}
 
-	private:
+			const int batchHeight = m_planes.at( tileBatchIndex.z ).tileBatchSize.y * ImagePlug::tileSize();
+			const int numBatchRows = ( m_info.height + batchHeight - 1 ) / batchHeight;
+
+			// Prefetches are scheduled once we've released the lock, as
+			// entering the arena may wait for a prefetch that needs it.
+			std::vector<std::pair<PrefetchPtr, V3i>> scheduled;
+
+			{
+				std::lock_guard<std::mutex> lock( m_prefetchMutex );
+
+				// Batches from other columns are requested as each row of
+				// tiles is traversed, so direction is tracked per column.
+				auto previous = m_previousBatchRows.insert( { { tileBatchIndex.z, tileBatchIndex.x }, { tileBatchIndex.y, -1 } } ).first;
+				if( tileBatchIndex.y != previous->second.first )
+				{
+					previous->second = { tileBatchIndex.y, tileBatchIndex.y > previous->second.first ? 1 : -1 };
+				}
+				const int direction = previous->second.second;
+
+				// Discard finished batches that traversal has left behind, as they
+				// will probably never be requested (perhaps because they were
+				// already in the compute cache).
+				for( auto it = m_prefetches.begin(); it != m_prefetches.end(); )
+				{
+					if(
+						it->first.z == tileBatchIndex.z && it->first.x == tileBatchIndex.x &&
+						it->second->state == Prefetch::Done && std::abs( it->first.y - tileBatchIndex.y ) > (int)depth
+					)
+					{
+						it = m_prefetches.erase( it );
+					}
+					else
+					{
+						++it;
+					}
+				}
+
+				for( size_t i = 1; i <= depth; ++i )
+				{
+					// Bound the number of batches held, since they are
+					// only released when requested.
+					if( m_prefetches.size() >= depth * m_planes.size() )
+					{
+						break;
+					}
+
+					const V3i index( tileBatchIndex.x, tileBatchIndex.y + (int)i * direction, tileBatchIndex.z );
+					if( index.y < 0 || index.y >= numBatchRows || m_prefetches.count( index ) )
+					{
+						continue;
+					}
+
+					PrefetchPtr prefetch = std::make_shared<Prefetch>();
+					m_prefetches[index] = prefetch;
+					scheduled.push_back( { prefetch, index } );
+					g_prefetchScheduled++;
+				}
+			}
 
-		int readRegion( int subImage, const Box2i &targetRegion, std::vector<float> &data, Box2i &dataRegion )
+			if( scheduled.empty() )
+			{
+				return;
+			}
+
+			prefetchArena()->execute(
+				[this, &scheduled] {
+					for( const auto &s : scheduled )
+					{
+						PrefetchPtr prefetch = s.first;
+						const V3i index = s.second;
+						m_prefetchTasks.run(
+							[this, prefetch, index] {
+								this->prefetch( *prefetch, index );
+							}
+						);
+					}
+				}
+			);
+		}
+
+		void prefetch( Prefetch &prefetch, const V3i &tileBatchIndex )
 		{
-			tbb::mutex::scoped_lock lock( m_mutex );
+			{
+				std::lock_guard<std::mutex> lock( m_prefetchMutex );
+				if( prefetch.state != Prefetch::Queued )
+				{
+					return;
+				}
+				prefetch.state = Prefetch::Reading;
+			}
 
-			m_reader->SelectImage( subImage );
+			ConstObjectVectorPtr batch;
+			try
+			{
+				batch = decodeTileBatch( tileBatchIndex );
+			}
+			catch( ... )
+			{
+				// Leave the batch null, so it is read again when it is
+				// requested and the error is reported from the compute.
+			}
 
-			const Box2i fileDataWindow( V2i( 0 ), V2i( m_info.width, m_info.height ) );
+			{
+				std::lock_guard<std::mutex> lock( m_prefetchMutex );
+				prefetch.batch = batch;
+				prefetch.state = Prefetch::Done;
+			}
+			m_prefetchDone.notify_all();
+		}
+
+		void readRegion( const ChannelMapEntry &plane, const Box2i &targetRegion, std::vector<float> &data, Box2i &dataRegion )
+		{
+			const pcl::ImageInfo &info = m_imageInfo[ plane.subImage ];
+			const Box2i fileDataWindow( V2i( 0 ), V2i( info.width, info.height ) );
 			dataRegion = BufferAlgo::intersection( targetRegion, fileDataWindow );
+			if( BufferAlgo::empty( dataRegion ) )
+			{
+				// Only possible for images smaller than the first.
+				data.clear();
+				return;
+			}
 
 			const int numRows = dataRegion.size().y;
-			const size_t numPixels = numRows * dataRegion.size().x;
-			data.resize( m_info.numberOfChannels * numPixels );
+			data.resize( numRows * dataRegion.size().x );
+
+			// Channels are stored as separate planar blocks, and requests for different
+			// channels arrive concurrently, so each read takes a reader from the pool.
+			const int startRow = info.height - dataRegion.max.y;
+			ReaderLock reader( *this );
+			reader->SelectImage( plane.subImage );
+			reader->ReadSamples( data.data(), startRow, numRows, plane.channelIndex );
+		}
 
-			const int startRow = m_info.height - dataRegion.max.y;
-			for( int i = 0; i < m_info.numberOfChannels; ++i )
+		// Converts `width` samples starting at `x` in `row` of a mapped or
+		// decompressed plane into `dst`.
+		void readMappedScanline( const ChannelMapEntry &plane, const char *data, int row, int x, int width, float *dst ) const
+		{
+			const size_t offset = (size_t)row * m_imageInfo[ plane.subImage ].width + x;
+			switch( plane.mappedFormat )
 			{
-				m_reader->ReadSamples( &data[ i * numPixels ], startRow, numRows, i );
+				case MappedFormat::Float32 :
+					memcpy( dst, data + offset * sizeof( float ), width * sizeof( float ) );
+					break;
+				case MappedFormat::UInt16 :
+					convertUInt16( reinterpret_cast<const uint16_t *>( data ) + offset, dst, width );
+					break;
+				case MappedFormat::None :
+					break;
 			}
+		}
 
-			return m_info.numberOfChannels;
+		// Returns the start of the decompressed plane, decompressing the
+		// plane's image if this is the first time it has been read.
+		const char *decompressedData( const ChannelMapEntry &plane )
+		{
+			const XISFHeader::Image &image = m_header->images()[plane.subImage];
+			DecompressedImage &decompressed = *m_decompressedImages[plane.subImage];
+
+			// If decompression fails, the flag remains unset, so the error
+			// is reported again by the next read rather than being cached.
+			std::call_once(
+				decompressed.flag,
+				[this, &image, &decompressed] {
+					const char *src = m_mapping.data() + image.dataOffset;
+					std::unique_ptr<char[]> data( new char[image.uncompressedSize] );
+					try
+					{
+						// Isolate the parallel decompression so that this thread
+						// can't pick up an unrelated task that waits on the flag
+						// we hold.
+						tbb::this_task_arena::isolate(
+							[&image, src, &data] {
+								XISFCompression::decompress( image, src, data.get() );
+							}
+						);
+					}
+					catch( const std::exception &e )
+					{
+						throw IECore::Exception( "XISFReader : Could not decompress " + m_fileName + " : " + e.what() );
+					}
+					decompressed.data = std::move( data );
+				}
+			);
+
+			const size_t planeSize = (size_t)image.width * image.height * image.sampleSize();
+			return decompressed.data.get() + plane.channelIndex * planeSize;
 		}
 
-		// Given a subImage index, and a tile origin, return an index to identify the tile batch which
-		// where this channel data will be found
-		V3i tileBatchIndex( int subImage, V2i tileOrigin ) const
+		// Maps the data blocks of any planes stored as raw or compressed attachments,
+		// letting the OS page cache do the buffering. Anything we can't map is read via
+		// PCL instead.
+		void mapData()
+		{
+			m_decompressedImages.resize( m_imageInfo.size() );
+
+			bool mappable = false;
+			for( const auto &plane : m_planes )
+			{
+				mappable = mappable || mappedFormat( plane.subImage ) != MappedFormat::None;
+			}
+
+			if( !mappable )
+			{
+				return;
+			}
+
+			try
+			{
+				m_mapping.open( m_fileName );
+			}
+			catch( const std::exception & )
+			{
+				return;
+			}
+
+			if( !m_mapping.is_open() )
+			{
+				return;
+			}
+
+			for( auto &plane : m_planes )
+			{
+				const MappedFormat format = mappedFormat( plane.subImage );
+				const XISFHeader::Image &image = m_header->images()[plane.subImage];
+				if( format == MappedFormat::None || image.dataOffset + image.dataSize > m_mapping.size() )
+				{
+					continue;
+				}
+
+				plane.mappedFormat = format;
+				if( image.isCompressedAttachment() )
+				{
+					plane.compressed = true;
+					if( !m_decompressedImages[plane.subImage] )
+					{
+						m_decompressedImages[plane.subImage].reset( new DecompressedImage );
+					}
+				}
+				else
+				{
+					const size_t planeSize = (size_t)image.width * image.height * image.sampleSize();
+					plane.mappedData = m_mapping.data() + image.dataOffset + plane.channelIndex * planeSize;
+				}
+			}
+		}
+
+		MappedFormat mappedFormat( int subImage ) const
 		{
-			V2i tileBatchOrigin = coordinateDivide( ImagePlug::tileIndex( tileOrigin ), m_tileBatchSize );
-			tileBatchOrigin.x = 0;
-			return V3i( tileBatchOrigin.x, tileBatchOrigin.y, subImage );
+			if( subImage >= (int)m_header->images().size() )
+			{
+				return MappedFormat::None;
+			}
+
+			// We require the header to agree with PCL about the image geometry, and
+			// uncompressed data to be aligned so that we can access the samples
+			// directly. Compressed data must use a codec we can decompress.
+			const XISFHeader::Image &image = m_header->images()[subImage];
+			const pcl::ImageInfo &info = m_imageInfo[subImage];
+			const bool raw = image.isRawAttachment() && image.dataOffset % image.sampleSize() == 0;
+			const bool compressed = image.isCompressedAttachment() && XISFCompression::isSupported( image.codec );
+			if(
+				!( raw || compressed ) ||
+				image.width != info.width || image.height != info.height ||
+				image.numChannels != info.numberOfChannels
+			)
+			{
+				return MappedFormat::None;
+			}
+
+			if( image.sampleFormat == "Float32" )
+			{
+				return MappedFormat::Float32;
+			}
+			else if( image.sampleFormat == "UInt16" )
+			{
+				return MappedFormat::UInt16;
+			}
+
+			return MappedFormat::None;
 		}
 
-		// Given a channel index, and a tile origin, return the index within a tile batch where the correct
-		// tile will be found.
-		int tileBatchSubIndex( int channelIndex, V2i tileOrigin ) const
+		// Provides exclusive use of one of the file's readers for the
+		// lifetime of the lock.
+		class ReaderLock : boost::noncopyable
 		{
-			int tilePlaneSize = m_tileBatchSize.x * m_tileBatchSize.y;
+			public :
+
+				ReaderLock( File &file )
+					: m_file( file ), m_reader( file.acquireReader() )
+				{
+				}
+
+				~ReaderLock()
+				{
+					m_file.releaseReader( std::move( m_reader ) );
+				}
+
+				pcl::XISFReader *operator->() const
+				{
+					return m_reader.get();
+				}
+
+			private :
+
+				File &m_file;
+				ReaderPtr m_reader;
+		};
 
+		ReaderPtr acquireReader()
+		{
+			std::unique_lock<std::mutex> lock( m_readersMutex );
+			m_readerAvailable.wait( lock, [this] { return !m_readers.empty() || m_numReaders < g_maxReadersPerFile; } );
+
+			if( !m_readers.empty() )
+			{
+				ReaderPtr result = std::move( m_readers.back() );
+				m_readers.pop_back();
+				return result;
+			}
+
+			// Open a new reader outside the lock, so other threads
+			// can continue to use the existing ones in the meantime.
+			m_numReaders++;
+			lock.unlock();
+
+			try
+			{
+				return openReader( m_fileName );
+			}
+			catch( ... )
+			{
+				lock.lock();
+				m_numReaders--;
+				m_readerAvailable.notify_one();
+				throw;
+			}
+		}
+
+		void releaseReader( ReaderPtr reader )
+		{
+			{
+				std::lock_guard<std::mutex> lock( m_readersMutex );
+				m_readers.push_back( std::move( reader ) );
+			}
+			m_readerAvailable.notify_one();
+		}
+
+		// Given a plane index, and a tile origin, return an index to identify the tile batch which
+		// where this channel data will be found
+		V3i tileBatchIndex( int plane, V2i tileOrigin ) const
+		{
+			V2i tileBatchOrigin = coordinateDivide( ImagePlug::tileIndex( tileOrigin ), m_planes[plane].tileBatchSize );
+			return V3i( tileBatchOrigin.x, tileBatchOrigin.y, plane );
+		}
+
+		// Given a plane index and a tile origin, return the index within a tile batch
+		// where the correct tile will be found.
+		int tileBatchSubIndex( int plane, V2i tileOrigin ) const
+		{
+			const V2i &tileBatchSize = m_planes[plane].tileBatchSize;
 			V2i tileIndex = ImagePlug::tileIndex( tileOrigin );
-			V2i subIndex = tileIndex - coordinateDivide( tileIndex, m_tileBatchSize ) * m_tileBatchSize;
-			// For scanline images, horizontal index relative to data window
-			subIndex.x = tileIndex.x - ImagePlug::tileIndex( V2i( 0 ) ).x;
+			V2i subIndex = tileIndex - coordinateDivide( tileIndex, tileBatchSize ) * tileBatchSize;
 
-			return channelIndex * tilePlaneSize + subIndex.y * m_tileBatchSize.x + subIndex.x;
+			return subIndex.y * tileBatchSize.x + subIndex.x;
 		}
 
-		std::unique_ptr<pcl::XISFReader> m_reader;
+		std::string m_fileName;
+		std::string m_mipKey;
+		ConstXISFHeaderPtr m_header;
+		// The first image, which defines the data window
 		pcl::ImageInfo m_info;
+		std::vector<pcl::ImageInfo> m_imageInfo;
 		ConstStringVectorDataPtr m_channelNamesData;
-		std::map<std::string, ChannelMapEntry> m_channelMap;
-		Imath::V2i m_tileBatchSize;
-		tbb::mutex m_mutex;
+		ConstCompoundDataPtr m_metadata;
+		// Maps from channel name to index in m_planes
+		std::map<std::string, int> m_channelMap;
+		std::vector<ChannelMapEntry> m_planes;
+		boost::iostreams::mapped_file_source m_mapping;
+
+		struct DecompressedImage
+		{
+			std::once_flag flag;
+			std::unique_ptr<char[]> data;
+		};
+
+		// Indexed by image, and null for images we don't decompress.
+		std::vector<std::unique_ptr<DecompressedImage>> m_decompressedImages;
+
+		struct V3iLess
+		{
+			bool operator()( const V3i &a, const V3i &b ) const
+			{
+				return std::tie( a.z, a.y, a.x ) < std::tie( b.z, b.y, b.x );
+			}
+		};
+
+		std::mutex m_prefetchMutex;
+		std::condition_variable m_prefetchDone;
+		tbb::task_group m_prefetchTasks;
+		std::map<V3i, PrefetchPtr, V3iLess> m_prefetches;
+		// The most recently requested batch row and the direction of
+		// traversal, keyed by plane and batch column.
+		std::map<std::pair<int, int>, std::pair<int, int>> m_previousBatchRows;
+
+		std::mutex m_readersMutex;
+		std::condition_variable m_readerAvailable;
+		std::vector<ReaderPtr> m_readers;
+		size_t m_numReaders;
+
+		size_t m_memoryUsage;
 };
 
 
@@ -385,29 +1116,38 @@ struct CacheEntry
 
 CacheEntry fileCacheGetter( const std::string &fileName, size_t &cost )
 {
-	cost = 1;
-
 	CacheEntry result;
+	size_t memoryUsage = fileName.size();
 
-	std::unique_ptr<pcl::XISFReader> reader( new pcl::XISFReader );
-	reader->SetLogHandler( new LogHandler );
-	reader->Open( pcl::String( fileName.c_str() ) );
-	if( !reader->IsOpen() )
+	try
 	{
-		result.error.reset( new std::string( "XISFReader : Could not open " + fileName ) );
-		return result;
+		result.file.reset( new File( fileName, openReader( fileName ) ) );
+		memoryUsage = result.file->memoryUsage();
+	}
+	catch( const std::exception &e )
+	{
+		result.error.reset( new std::string( e.what() ) );
 	}
 
-	result.file.reset( new File( std::move( reader ) ) );
+	// Clamp to the memory limit, so that even huge files are cached.
+	const size_t memoryLimit = g_memoryLimit;
+	const size_t minimumCost = memoryLimit / std::max<size_t>( g_openFilesLimit, 1 );
+	cost = std::min( std::max( memoryUsage, minimumCost ), memoryLimit );
 
 	return result;
 }
 
-typedef IECorePreview::LRUCache<std::string, CacheEntry> FileHandleCache;
+typedef Cache<std::string, CacheEntry> FileHandleCache;
 
 FileHandleCache *fileCache()
 {
-	static FileHandleCache *c = new FileHandleCache( fileCacheGetter, 200 );
+	static FileHandleCache *c = [] {
+		FileHandleCache *result = new FileHandleCache( "XISFReader", fileCacheGetter, g_memoryLimit );
+		// The cache is never destroyed, so we close the files explicitly at
+		// exit, giving them a chance to cancel and wait for their prefetches.
+		std::atexit( [] { fileCache()->clear(); } );
+		return result;
+	}();
 	return c;
 }
 
@@ -491,6 +1231,7 @@ XISFReader::XISFReader( const std::string &name )
 	);
 	addChild( new IntPlug( "refreshCount" ) );
 	addChild( new IntPlug( "missingFrameMode", Plug::In, Error, /* min */ Error, /* max */ Hold ) );
+	addChild( new IntPlug( "mipLevel", Plug::In, 0, 0 ) );
 	addChild( new IntVectorDataPlug( "availableFrames", Plug::Out, new IntVectorData ) );
 	addChild( new ObjectVectorPlug( "__tileBatch", Plug::Out, new ObjectVector ) );
 
@@ -531,34 +1272,115 @@ const Gaffer::IntPlug *XISFReader::missingFrameModePlug() const
 	return getChild<IntPlug>( g_firstPlugIndex + 2 );
 }
 
+Gaffer::IntPlug *XISFReader::mipLevelPlug()
+{
+	return getChild<IntPlug>( g_firstPlugIndex + 3 );
+}
+
+const Gaffer::IntPlug *XISFReader::mipLevelPlug() const
+{
+	return getChild<IntPlug>( g_firstPlugIndex + 3 );
+}
+
 Gaffer::IntVectorDataPlug *XISFReader::availableFramesPlug()
 {
-	return getChild<IntVectorDataPlug>( g_firstPlugIndex + 3 );
+	return getChild<IntVectorDataPlug>( g_firstPlugIndex + 4 );
 }
 
 const Gaffer::IntVectorDataPlug *XISFReader::availableFramesPlug() const
 {
-	return getChild<IntVectorDataPlug>( g_firstPlugIndex + 3 );
+	return getChild<IntVectorDataPlug>( g_firstPlugIndex + 4 );
 }
 
 Gaffer::ObjectVectorPlug *XISFReader::tileBatchPlug()
 {
-	return getChild<ObjectVectorPlug>( g_firstPlugIndex + 4 );
+	return getChild<ObjectVectorPlug>( g_firstPlugIndex + 5 );
 }
 
 const Gaffer::ObjectVectorPlug *XISFReader::tileBatchPlug() const
 {
-	return getChild<ObjectVectorPlug>( g_firstPlugIndex + 4 );
+	return getChild<ObjectVectorPlug>( g_firstPlugIndex + 5 );
 }
 
 void XISFReader::setOpenFilesLimit( size_t maxOpenFiles )
 {
-	fileCache()->setMaxCost( maxOpenFiles );
+	if( maxOpenFiles == g_openFilesLimit )
+	{
+		return;
+	}
+
+	// The costs of cached files depend on the limits,
+	// so they must be reopened to apply the new ones.
+	g_openFilesLimit = maxOpenFiles;
+	fileCache()->clear();
 }
 
 size_t XISFReader::getOpenFilesLimit()
 {
-	return fileCache()->getMaxCost();
+	return g_openFilesLimit;
+}
+
+void XISFReader::setMemoryLimit( size_t bytes )
+{
+	if( bytes == g_memoryLimit )
+	{
+		return;
+	}
+
+	g_memoryLimit = bytes;
+	fileCache()->clear();
+	fileCache()->setMaxCost( bytes );
+}
+
+size_t XISFReader::getMemoryLimit()
+{
+	return g_memoryLimit;
+}
+
+IECore::CompoundDataPtr XISFReader::fileCacheStatistics()
+{
+	const Private::CacheBase::Statistics statistics = fileCache()->statistics();
+
+	CompoundDataPtr result = new CompoundData;
+	result->writable()["openFiles"] = new UInt64Data( g_openFiles );
+	result->writable()["memoryUsage"] = new UInt64Data( g_fileMemoryUsage );
+	result->writable()["hits"] = new UInt64Data( statistics.hits );
+	result->writable()["misses"] = new UInt64Data( statistics.misses );
+	return result;
+}
+
+void XISFReader::setPrefetchDepth( size_t numBatches )
+{
+	if( numBatches == g_prefetchDepth )
+	{
+		return;
+	}
+
+	// Files are costed by the prefetched batches they may hold,
+	// so they must be reopened to be costed for the new depth.
+	g_prefetchDepth = numBatches;
+	fileCache()->clear();
+}
+
+size_t XISFReader::getPrefetchDepth()
+{
+	return g_prefetchDepth;
+}
+
+IECore::CompoundDataPtr XISFReader::prefetchStatistics()
+{
+	CompoundDataPtr result = new CompoundData;
+	result->writable()["scheduled"] = new UInt64Data( g_prefetchScheduled );
+	result->writable()["hits"] = new UInt64Data( g_prefetchHits );
+	result->writable()["misses"] = new UInt64Data( g_prefetchMisses );
+	return result;
+}
+
+void XISFReader::resetPrefetchStatistics()
+{
+	g_prefetchScheduled = 0;
+	g_prefetchHits = 0;
+	g_prefetchMisses = 0;
 }
 
 void XISFReader::affects( const Gaffer::Plug *input, AffectedPlugsContainer &outputs ) const
@@ -582,6 +1404,12 @@ void XISFReader::affects( const Gaffer::Plug *input, AffectedPlugsContainer &out
 			outputs.push_back( it->get() );
 		}
 	}
+	else if( input == mipLevelPlug() )
+	{
+		outputs.push_back( outPlug()->formatPlug() );
+		outputs.push_back( outPlug()->dataWindowPlug() );
+		outputs.push_back( outPlug()->channelDataPlug() );
+	}
 }
 
 void XISFReader::hash( const ValuePlug *output, const Context *context, IECore::MurmurHash &h ) const
@@ -658,8 +1486,10 @@ Gaffer::ValuePlug::CachePolicy XISFReader::computeCachePolicy( const Gaffer::Val
 	if( output == tileBatchPlug() )
 	{
 		// Request blocking compute for tile batches, to avoid concurrent threads loading
-		// the same batch redundantly.
-		return ValuePlug::CachePolicy::Standard;
+		// the same batch redundantly. We use TaskCollaboration because compressed data
+		// blocks are decompressed and unshuffled using parallel tasks, which waiting
+		// threads can then help with.
+		return ValuePlug::CachePolicy::TaskCollaboration;
 	}
 	else if( output == outPlug()->channelDataPlug() )
 	{
@@ -690,6 +1520,7 @@ void XISFReader::hashFormat( const GafferImage::ImagePlug *output, const Gaffer:
 	hashFileName( context, h );
 	refreshCountPlug()->hash( h );
 	missingFrameModePlug()->hash( h );
+	mipLevelPlug()->hash( h );
 	GafferImage::Format format = FormatPlug::getDefaultFormat( context );
 	h.append( format.getDisplayWindow() );
 	h.append( format.getPixelAspect() );
@@ -712,7 +1543,7 @@ GafferImage::Format XISFReader::computeFormat( const Gaffer::Context *context, c
 	return GafferImage::Format(
 		Imath::Box2i(
 			Imath::V2i( 0 ),
-			Imath::V2i( spec.width, spec.height )
+			MipPyramid::levelSize( Imath::V2i( spec.width, spec.height ), mipLevelPlug()->getValue() )
 		),
 		1.0f
 	);
@@ -724,6 +1555,7 @@ void XISFReader::hashDataWindow( const GafferImage::ImagePlug *output, const Gaf
 	hashFileName( context, h );
 	refreshCountPlug()->hash( h );
 	missingFrameModePlug()->hash( h );
+	mipLevelPlug()->hash( h );
 }
 
 Imath::Box2i XISFReader::computeDataWindow( const Gaffer::Context *context, const ImagePlug *parent ) const
@@ -736,7 +1568,7 @@ Imath::Box2i XISFReader::computeDataWindow( const Gaffer::Context *context, cons
 	}
 
 	const pcl::ImageInfo &spec = file->info();
-	Imath::Box2i dataWindow( Imath::V2i( 0 ), Imath::V2i( spec.width, spec.height ) );
+	Imath::Box2i dataWindow( Imath::V2i( 0 ), MipPyramid::levelSize( Imath::V2i( spec.width, spec.height ), mipLevelPlug()->getValue() ) );
 	return dataWindow;
 }
 
@@ -750,8 +1582,14 @@ void XISFReader::hashMetadata( const GafferImage::ImagePlug *output, const Gaffe
 
 IECore::ConstCompoundDataPtr XISFReader::computeMetadata( const Gaffer::Context *context, const ImagePlug *parent ) const
 {
-	CompoundDataPtr result = new CompoundData;
-	return result;
+	std::string fileName = fileNamePlug()->getValue();
+	FilePtr file = retrieveFile( fileName, (MissingFrameMode)missingFrameModePlug()->getValue(), this, context );
+	if( !file )
+	{
+		return parent->metadataPlug()->defaultValue();
+	}
+
+	return file->metadata();
 }
 
 void XISFReader::hashChannelNames( const GafferImage::ImagePlug *output, const Gaffer::Context *context, IECore::MurmurHash &h ) const
@@ -784,6 +1622,7 @@ void XISFReader::hashChannelData( const GafferImage::ImagePlug *output, const Ga
 		hashFileName( context, h );
 		refreshCountPlug()->hash( h );
 		missingFrameModePlug()->hash( h );
+		mipLevelPlug()->hash( h );
 	}
 }
 
@@ -809,6 +1648,14 @@ IECore::ConstFloatVectorDataPtr XISFReader::computeChannelData( const std::strin
 		) );
 	}
 
+	const int mipLevel = mipLevelPlug()->getValue();
+	if( mipLevel > 0 )
+	{
+		// Previews are served from the pyramid rather than the tile batches,
+		// so only the reduced resolution data is held in the cache.
+		return MipPyramid::tile( *file->mipLevel( channelName, mipLevel ), tileOrigin );
+	}
+
 	V3i tileBatchIndex;
 	int subIndex;
 	file->findTile( channelName, tileOrigin, tileBatchIndex, subIndex );
@@ -827,5 +1674,6 @@ void XISFReader::plugSet( Gaffer::Plug *plug )
 	if( plug == refreshCountPlug() )
 	{
 		fileCache()->clear();
+		MipPyramid::clearCache();
 	}
 }
@@ -0,0 +1,714 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//	Redistribution and use in source and binary forms, with or without
+//	modification, are permitted provided that the following conditions are
+//	met:
+//
+//		* Redistributions of source code must retain the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer.
+//
+//		* Redistributions in binary form must reproduce the above
+//		  copyright notice, this list of conditions and the following
+//		  disclaimer in the documentation and/or other materials provided with
+//		  the distribution.
+//
+//		* Neither the name of Tom Cowland or the names of
+//		  any other contributors to this software may be used to endorse or
+//		  promote products derived from this software without specific prior
+//		  written permission.
+//
+//	THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//	IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//	THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//	PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//	CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//	EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//	PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//	PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//	LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//	NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//	SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+
+#include "GafferAstro/XISFWriter.h"
+
+#include "GafferAstro/Private/FITSHeader.h"
+#include "GafferAstro/Private/XISFCompression.h"
+
+#include "GafferImage/BufferAlgo.h"
+#include "GafferImage/ImageAlgo.h"
+
+#include "Gaffer/Context.h"
+
+#include "IECore/MessageHandler.h"
+#include "IECore/SimpleTypedData.h"
+#include "IECore/StringAlgo.h"
+
+#include "boost/algorithm/string/classification.hpp"
+#include "boost/algorithm/string/predicate.hpp"
+#include "boost/algorithm/string/replace.hpp"
+#include "boost/algorithm/string/split.hpp"
+#include "boost/filesystem/operations.hpp"
+#include "boost/filesystem/path.hpp"
+#include "boost/format.hpp"
+#include "boost/regex.hpp"
+
+#include <algorithm>
+#include <cmath>
+#include <cstdint>
+#include <cstring>
+#include <ctime>
+#include <fstream>
+#include <limits>
+#include <map>
+
+using namespace Imath;
+using namespace IECore;
+using namespace Gaffer;
+using namespace GafferImage;
+using namespace GafferDispatch;
+using namespace GafferAstro;
+using namespace GafferAstro::Private;
+
+//////////////////////////////////////////////////////////////////////////
+// Internal utilities
+//////////////////////////////////////////////////////////////////////////
+
+namespace
+{
+
+// Compressed blocks are split into sub-blocks of this size, which are
+// compressed in parallel, and can be decompressed in parallel by readers.
+const size_t g_subblockSize = 8 * 1024 * 1024;
+
+// Data blocks are aligned to this size, as they are by PixInsight.
+const size_t g_blockAlignment = 4096;
+
+std::string escape( const std::string &text )
+{
+	std::string result;
+	result.reserve( text.size() );
+	for( char c : text )
+	{
+		switch( c )
+		{
+			case '&' : result += "&amp;"; break;
+			case '<' : result += "&lt;"; break;
+			case '>' : result += "&gt;"; break;
+			case '"' : result += "&quot;"; break;
+			case '\'' : result += "&apos;"; break;
+			default : result.push_back( c );
+		}
+	}
+	return result;
+}
+
+// Formats a float so that it is read back as a float rather than
+// an integer.
+std::string formatFloat( double value, int precision )
+{
+	std::string result = boost::str( boost::format( "%." + std::to_string( precision ) + "g" ) % value );
+	if( result.find_first_of( ".eE" ) == std::string::npos )
+	{
+		result += ".0";
+	}
+	return result;
+}
+
+bool isFITSKeyword( const std::string &name )
+{
+	static const boost::regex g_expression( "[A-Z0-9_-]{1,8}" );
+	return boost::regex_match( name, g_expression );
+}
+
+bool isPropertyId( const std::string &name )
+{
+	static const boost::regex g_expression( "[_a-zA-Z][_a-zA-Z0-9]*(:[_a-zA-Z][_a-zA-Z0-9]*)*" );
+	return boost::regex_match( name, g_expression );
+}
+
+std::string fitsKeywordElement( const std::string &name, const std::string &value, const std::string &comment = "" )
+{
+	return boost::str(
+		boost::format( "<FITSKeyword name=\"%s\" value=\"%s\" comment=\"%s\"/>" ) %
+		name % escape( value ) % escape( comment )
+	);
+}
+
+// Returns FITSKeyword elements for metadata named like FITS keywords, and
+// Property elements for the rest. Metadata that is structural, or can't
+// be represented, is omitted. Properties in the reserved XISF namespace
+// describe the file as a whole, so are generated by `headerXML()` instead.
+std::string metadataElements( const CompoundData *metadata )
+{
+	std::string keywords;
+	std::string properties;
+
+	for( const auto &m : metadata->readable() )
+	{
+		const std::string &name = m.first.string();
+		const Data *data = m.second.get();
+
+		if( boost::starts_with( name, "XISF:" ) )
+		{
+			continue;
+		}
+
+		if( isFITSKeyword( name ) )
+		{
+			if( FITSHeader::isStructuralKeyword( name ) )
+			{
+				continue;
+			}
+
+			if( name == "COMMENT" || name == "HISTORY" )
+			{
+				if( const StringData *stringData = runTimeCast<const StringData>( data ) )
+				{
+					std::vector<std::string> lines;
+					boost::split( lines, stringData->readable(), boost::is_any_of( "\n" ) );
+					for( const auto &line : lines )
+					{
+						keywords += fitsKeywordElement( name, "", line );
+					}
+				}
+				continue;
+			}
+
+			std::string value;
+			switch( data->typeId() )
+			{
+				case StringDataTypeId :
+					value = "'" + boost::replace_all_copy( static_cast<const StringData *>( data )->readable(), "'", "''" ) + "'";
+					break;
+				case BoolDataTypeId :
+					value = static_cast<const BoolData *>( data )->readable() ? "T" : "F";
+					break;
+				case IntDataTypeId :
+					value = std::to_string( static_cast<const IntData *>( data )->readable() );
+					break;
+				case Int64DataTypeId :
+					value = std::to_string( static_cast<const Int64Data *>( data )->readable() );
+					break;
+				case FloatDataTypeId :
+				case DoubleDataTypeId :
+				{
+					const double d = data->typeId() == FloatDataTypeId ?
+						static_cast<const FloatData *>( data )->readable() :
+						static_cast<const DoubleData *>( data )->readable()
+					;
+					if( std::isfinite( d ) )
+					{
+						value = formatFloat( d, 17 );
+					}
+					break;
+				}
+				default :
+					break;
+			}
+
+			if( !value.empty() )
+			{
+				keywords += fitsKeywordElement( name, value );
+			}
+			continue;
+		}
+
+		if( !isPropertyId( name ) )
+		{
+			continue;
+		}
+
+		const std::string id = escape( name );
+		switch( data->typeId() )
+		{
+			case StringDataTypeId :
+				properties += boost::str(
+					boost::format( "<Property id=\"%s\" type=\"String\">%s</Property>" ) %
+					id % escape( static_cast<const StringData *>( data )->readable() )
+				);
+				break;
+			case BoolDataTypeId :
+				properties += boost::str(
+					boost::format( "<Property id=\"%s\" type=\"Boolean\" value=\"%d\"/>" ) %
+					id % static_cast<const BoolData *>( data )->readable()
+				);
+				break;
+			case IntDataTypeId :
+				properties += boost::str(
+					boost::format( "<Property id=\"%s\" type=\"Int32\" value=\"%d\"/>" ) %
+					id % static_cast<const IntData *>( data )->readable()
+				);
+				break;
+			case Int64DataTypeId :
+				properties += boost::str(
+					boost::format( "<Property id=\"%s\" type=\"Int64\" value=\"%d\"/>" ) %
+					id % static_cast<const Int64Data *>( data )->readable()
+				);
+				break;
+			case UInt64DataTypeId :
+				properties += boost::str(
+					boost::format( "<Property id=\"%s\" type=\"UInt64\" value=\"%d\"/>" ) %
+					id % static_cast<const UInt64Data *>( data )->readable()
+				);
+				break;
+			case FloatDataTypeId :
+				properties += boost::str(
+					boost::format( "<Property id=\"%s\" type=\"Float32\" value=\"%s\"/>" ) %
+					id % formatFloat( static_cast<const FloatData *>( data )->readable(), 9 )
+				);
+				break;
+			case DoubleDataTypeId :
+				properties += boost::str(
+					boost::format( "<Property id=\"%s\" type=\"Float64\" value=\"%s\"/>" ) %
+					id % formatFloat( static_cast<const DoubleData *>( data )->readable(), 17 )
+				);
+				break;
+			default :
+				break;
+		}
+	}
+
+	return keywords + properties;
+}
+
+std::string creationTime()
+{
+	const std::time_t now = std::time( nullptr );
+	std::tm utc;
+	gmtime_r( &now, &utc );
+	char result[32];
+	std::strftime( result, sizeof( result ), "%Y-%m-%dT%H:%M:%SZ", &utc );
+	return result;
+}
+
+// The layout of the single image we write, from which we generate the header.
+struct ImageLayout
+{
+	V2i size;
+	size_t numChannels;
+	// "UInt8", "UInt16" or "Float32".
+	std::string sampleFormat;
+	size_t dataSize;
+	// The compression and subblocks attributes, if compressed.
+	std::string compressionAttributes;
+	std::string metadata;
+};
+
+std::string headerXML( const ImageLayout &layout, size_t dataOffset )
+{
+	return boost::str(
+		boost::format(
+			"<?xml version=\"1.0\" encoding=\"UTF-8\"?>"
+			"<xisf version=\"1.0\" xmlns=\"http://www.pixinsight.com/xisf\" "
+			"xmlns:xsi=\"http://www.w3.org/2001/XMLSchema-instance\" "
+			"xsi:schemaLocation=\"http://www.pixinsight.com/xisf http://pixinsight.com/xisf/xisf-1.0.xsd\">"
+			"<Image geometry=\"%d:%d:%d\" sampleFormat=\"%s\"%s colorSpace=\"%s\" location=\"attachment:%d:%d\"%s>"
+			"%s"
+			"</Image>"
+			"<Metadata>"
+			"<Property id=\"XISF:CreationTime\" type=\"TimePoint\" value=\"%s\"/>"
+			"<Property id=\"XISF:CreatorApplication\" type=\"String\">GafferAstro</Property>"
+			"</Metadata>"
+			"</xisf>"
+		) %
+		layout.size.x % layout.size.y % layout.numChannels %
+		layout.sampleFormat %
+		( layout.sampleFormat == "Float32" ? " bounds=\"0:1\"" : "" ) %
+		( layout.numChannels == 3 ? "RGB" : "Gray" ) %
+		dataOffset % layout.dataSize % layout.compressionAttributes %
+		layout.metadata %
+		creationTime()
+	);
+}
+
+// Writes the header, returning the offset of the data block that follows it.
+size_t writeHeader( std::ofstream &file, const ImageLayout &layout )
+{
+	// The length of the header depends on the data offset it contains,
+	// so find the first aligned offset that leaves room for it.
+	size_t dataOffset = g_blockAlignment;
+	std::string xml = headerXML( layout, dataOffset );
+	while( 16 + xml.size() > dataOffset )
+	{
+		dataOffset += g_blockAlignment;
+		xml = headerXML( layout, dataOffset );
+	}
+
+	const uint32_t length = xml.size();
+	const char preamble[16] = {
+		'X', 'I', 'S', 'F', '0', '1', '0', '0',
+		char( length & 0xff ), char( ( length >> 8 ) & 0xff ), char( ( length >> 16 ) & 0xff ), char( ( length >> 24 ) & 0xff ),
+		0, 0, 0, 0
+	};
+
+	file.seekp( 0 );
+	file.write( preamble, sizeof( preamble ) );
+	file.write( xml.data(), xml.size() );
+	const std::vector<char> padding( dataOffset - 16 - xml.size(), 0 );
+	file.write( padding.data(), padding.size() );
+
+	return dataOffset;
+}
+
+// Converts normalised samples to integers covering the full range of `T`.
+template<typename T>
+void convertNormalized( const float *src, size_t n, char *dst )
+{
+	const float scale = std::numeric_limits<T>::max();
+	T *d = reinterpret_cast<T *>( dst );
+	for( size_t i = 0; i < n; ++i )
+	{
+		d[i] = (T)( std::min( std::max( src[i], 0.0f ), 1.0f ) * scale + 0.5f );
+	}
+}
+
+// Converts `n` samples to `sampleFormat`.
+void convert( const float *src, size_t n, const std::string &sampleFormat, char *dst )
+{
+	if( sampleFormat == "UInt8" )
+	{
+		convertNormalized<uint8_t>( src, n, dst );
+	}
+	else if( sampleFormat == "UInt16" )
+	{
+		convertNormalized<uint16_t>( src, n, dst );
+	}
+	else
+	{
+		memcpy( dst, src, n * sizeof( float ) );
+	}
+}
+
+} // namespace
+
+//////////////////////////////////////////////////////////////////////////
+// XISFWriter
+//////////////////////////////////////////////////////////////////////////
+
+GAFFER_NODE_DEFINE_TYPE( XISFWriter );
+
+size_t XISFWriter::g_firstPlugIndex = 0;
+
+XISFWriter::XISFWriter( const std::string &name )
+	:	TaskNode( name )
+{
+	storeIndexOfNextChild( g_firstPlugIndex );
+	addChild( new ImagePlug( "in" ) );
+	addChild( new StringPlug( "fileName" ) );
+	addChild( new StringPlug( "channels", Plug::In, "*" ) );
+	addChild( new StringPlug( "dataType", Plug::In, "float" ) );
+	addChild( new StringPlug( "compression", Plug::In, "none" ) );
+	addChild( new BoolPlug( "byteShuffling", Plug::In, true ) );
+	addChild( new ImagePlug( "out", Plug::Out, Plug::Default & ~Plug::Serialisable ) );
+
+	outPlug()->setInput( inPlug() );
+}
+
+XISFWriter::~XISFWriter()
+{
+}
+
+GafferImage::ImagePlug *XISFWriter::inPlug()
+{
+	return getChild<ImagePlug>( g_firstPlugIndex );
+}
+
+const GafferImage::ImagePlug *XISFWriter::inPlug() const
+{
+	return getChild<ImagePlug>( g_firstPlugIndex );
+}
+
+Gaffer::StringPlug *XISFWriter::fileNamePlug()
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 1 );
+}
+
+const Gaffer::StringPlug *XISFWriter::fileNamePlug() const
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 1 );
+}
+
+Gaffer::StringPlug *XISFWriter::channelsPlug()
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 2 );
+}
+
+const Gaffer::StringPlug *XISFWriter::channelsPlug() const
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 2 );
+}
+
+Gaffer::StringPlug *XISFWriter::dataTypePlug()
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 3 );
+}
+
+const Gaffer::StringPlug *XISFWriter::dataTypePlug() const
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 3 );
+}
+
+Gaffer::StringPlug *XISFWriter::compressionPlug()
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 4 );
+}
+
+const Gaffer::StringPlug *XISFWriter::compressionPlug() const
+{
+	return getChild<StringPlug>( g_firstPlugIndex + 4 );
+}
+
+Gaffer::BoolPlug *XISFWriter::byteShufflingPlug()
+{
+	return getChild<BoolPlug>( g_firstPlugIndex + 5 );
+}
+
+const Gaffer::BoolPlug *XISFWriter::byteShufflingPlug() const
+{
+	return getChild<BoolPlug>( g_firstPlugIndex + 5 );
+}
+
+GafferImage::ImagePlug *XISFWriter::outPlug()
+{
+	return getChild<ImagePlug>( g_firstPlugIndex + 6 );
+}
+
+const GafferImage::ImagePlug *XISFWriter::outPlug() const
+{
+	return getChild<ImagePlug>( g_firstPlugIndex + 6 );
+}
+
+IECore::MurmurHash XISFWriter::hash( const Gaffer::Context *context ) const
+{
+	Context::Scope scope( context );
+	if( !inPlug()->getInput<ImagePlug>() || fileNamePlug()->getValue().empty() )
+	{
+		return IECore::MurmurHash();
+	}
+
+	IECore::MurmurHash h = TaskNode::hash( context );
+	h.append( fileNamePlug()->hash() );
+	h.append( channelsPlug()->hash() );
+	h.append( dataTypePlug()->hash() );
+	h.append( compressionPlug()->hash() );
+	h.append( byteShufflingPlug()->hash() );
+	h.append( ImageAlgo::imageHash( inPlug() ) );
+
+	return h;
+}
+
+void XISFWriter::execute() const
+{
+	if( !inPlug()->getInput<ImagePlug>() )
+	{
+		throw IECore::Exception( "No input image." );
+	}
+
+	const std::string fileName = fileNamePlug()->getValue();
+	if( fileName.empty() )
+	{
+		throw IECore::Exception( "No file name specified." );
+	}
+
+	static const std::map<std::string, std::pair<std::string, size_t>> g_sampleFormats = {
+		{ "uint8", { "UInt8", sizeof( uint8_t ) } },
+		{ "uint16", { "UInt16", sizeof( uint16_t ) } },
+		{ "float", { "Float32", sizeof( float ) } },
+	};
+
+	const std::string dataType = dataTypePlug()->getValue();
+	auto sampleFormat = g_sampleFormats.find( dataType );
+	if( sampleFormat == g_sampleFormats.end() )
+	{
+		throw IECore::Exception( "Unsupported data type \"" + dataType + "\"." );
+	}
+
+	const std::string compression = compressionPlug()->getValue();
+	if( compression != "none" && !XISFCompression::isSupported( compression ) )
+	{
+		throw IECore::Exception( "Unsupported compression \"" + compression + "\"." );
+	}
+
+	Box2i dataWindow;
+	ConstCompoundDataPtr metadata;
+	std::vector<std::string> channelNames;
+	{
+		ImagePlug::GlobalScope globalScope( Context::current() );
+		if( inPlug()->deepPlug()->getValue() )
+		{
+			throw IECore::Exception( "Deep images are not supported." );
+		}
+
+		dataWindow = inPlug()->dataWindowPlug()->getValue();
+		metadata = inPlug()->metadataPlug()->getValue();
+
+		const std::string channels = channelsPlug()->getValue();
+		ConstStringVectorDataPtr channelNamesData = inPlug()->channelNamesPlug()->getValue();
+		for( const auto &channelName : ImageAlgo::sortedChannelNames( channelNamesData->readable() ) )
+		{
+			if( StringAlgo::matchMultiple( channelName, channels ) )
+			{
+				channelNames.push_back( channelName );
+			}
+		}
+	}
+
+	if( channelNames.size() != 1 && channelNames.size() != 3 )
+	{
+		throw IECore::Exception(
+			boost::str( boost::format( "Expected 1 or 3 channels to write, but found %d." ) % channelNames.size() )
+		);
+	}
+
+	if( BufferAlgo::empty( dataWindow ) )
+	{
+		throw IECore::Exception( "Empty data window." );
+	}
+
+	const boost::filesystem::path directory = boost::filesystem::path( fileName ).parent_path();
+	if( !directory.empty() )
+	{
+		boost::filesystem::create_directories( directory );
+	}
+
+	ImageLayout layout;
+	layout.size = dataWindow.size();
+	layout.numChannels = channelNames.size();
+	layout.sampleFormat = sampleFormat->second.first;
+	layout.metadata = metadataElements( metadata.get() );
+
+	const size_t sampleSize = sampleFormat->second.second;
+	const size_t rowSize = layout.size.x * sampleSize;
+	const size_t planeSize = rowSize * layout.size.y;
+	layout.dataSize = planeSize * layout.numChannels;
+
+	// Remove any existing file rather than truncating it, since it may be
+	// mapped by a reader.
+	boost::filesystem::remove( fileName );
+	std::ofstream file( fileName, std::ios::binary | std::ios::trunc );
+	if( !file )
+	{
+		throw IECore::Exception( "XISFWriter : Could not open \"" + fileName + "\" for writing" );
+	}
+
+	try
+	{
+		// XISF stores channels as consecutive planes, with rows from top to
+		// bottom. Uncompressed data can be written as it arrives, so we write
+		// the header up front, and then write each row of tiles as soon as it
+		// is complete. Compressed data must be buffered, because XISF compresses
+		// all the planes together.
+
+		const bool compress = compression != "none";
+		const size_t bandPlaneSize = rowSize * ImagePlug::tileSize();
+		std::vector<char> block( compress ? layout.dataSize : bandPlaneSize * layout.numChannels );
+
+		size_t dataOffset = 0;
+		if( !compress )
+		{
+			dataOffset = writeHeader( file, layout );
+		}
+
+		ImageAlgo::parallelGatherTiles(
+			inPlug(),
+			// Tile
+			[&channelNames] ( const ImagePlug *imagePlug, const V2i &tileOrigin )
+			{
+				ImagePlug::ChannelDataScope channelDataScope( Context::current() );
+				channelDataScope.setTileOrigin( &tileOrigin );
+
+				std::vector<ConstFloatVectorDataPtr> result;
+				result.reserve( channelNames.size() );
+				for( const auto &channelName : channelNames )
+				{
+					channelDataScope.setChannelName( &channelName );
+					result.push_back( imagePlug->channelDataPlug()->getValue() );
+				}
+				return result;
+			},
+			// Gather
+			[&] ( const ImagePlug *imagePlug, const V2i &tileOrigin, const std::vector<ConstFloatVectorDataPtr> &tileData )
+			{
+				const Box2i tileBound( tileOrigin, tileOrigin + V2i( ImagePlug::tileSize() ) );
+				const Box2i region = BufferAlgo::intersection( tileBound, dataWindow );
+				const size_t x = ( region.min.x - dataWindow.min.x ) * sampleSize;
+
+				for( size_t c = 0; c < tileData.size(); ++c )
+				{
+					const std::vector<float> &tile = tileData[c]->readable();
+					for( int y = region.min.y; y < region.max.y; ++y )
+					{
+						char *dst = compress ?
+							block.data() + c * planeSize + ( dataWindow.max.y - 1 - y ) * rowSize :
+							block.data() + c * bandPlaneSize + ( region.max.y - 1 - y ) * rowSize
+						;
+						convert(
+							&tile[ ( y - tileOrigin.y ) * ImagePlug::tileSize() + ( region.min.x - tileOrigin.x ) ],
+							region.size().x, layout.sampleFormat, dst + x
+						);
+					}
+				}
+
+				if( !compress && region.max.x == dataWindow.max.x )
+				{
+					const size_t firstRow = dataWindow.max.y - region.max.y;
+					for( size_t c = 0; c < tileData.size(); ++c )
+					{
+						file.seekp( dataOffset + c * planeSize + firstRow * rowSize );
+						file.write( block.data() + c * bandPlaneSize, region.size().y * rowSize );
+					}
+				}
+			},
+			dataWindow,
+			ImageAlgo::TopToBottom
+		);
+
+		if( compress )
+		{
+			std::vector<char> compressed;
+			std::vector<std::pair<size_t, size_t>> subblocks;
+			const size_t itemSize = byteShufflingPlug()->getValue() ? sampleSize : 1;
+			if( XISFCompression::compress( compression, block.data(), block.size(), itemSize, g_subblockSize, compressed, subblocks ) )
+			{
+				layout.dataSize = compressed.size();
+				layout.compressionAttributes = boost::str(
+					boost::format( " compression=\"%s%s:%d%s\"" ) %
+					compression % ( itemSize > 1 ? "+sh" : "" ) % block.size() %
+					( itemSize > 1 ? ":" + std::to_string( itemSize ) : "" )
+				);
+				if( subblocks.size() > 1 )
+				{
+					std::string sizes;
+					for( const auto &subblock : subblocks )
+					{
+						sizes += ( sizes.empty() ? "" : ":" ) + std::to_string( subblock.first ) + "," + std::to_string( subblock.second );
+					}
+					layout.compressionAttributes += " subblocks=\"" + sizes + "\"";
+				}
+				block.swap( compressed );
+			}
+
+			writeHeader( file, layout );
+			file.write( block.data(), block.size() );
+		}
+
+		file.close();
+		if( file.fail() )
+		{
+			throw IECore::Exception( "XISFWriter : Error writing \"" + fileName + "\"" );
+		}
+	}
+	catch( ... )
+	{
+		// Don't leave an incomplete file behind.
+		file.close();
+		boost::system::error_code ec;
+		boost::filesystem::remove( fileName, ec );
+		throw;
+	}
+}
@@ -0,0 +1,60 @@
+//////////////////////////////////////////////////////////////////////////
+//
+//  Copyright (c) 2021, Tom Cowland. All rights reserved.
+//
+//  Redistribution and use in source and binary forms, with or without
+//  modification, are permitted provided that the following conditions are
+//  met:
+//
+//      * Redistributions of source code must retain the above
+//        copyright notice, this list of conditions and the following
+//        disclaimer.
+//
+//      * Redistributions in binary form must reproduce the above
+//        copyright notice, this list of conditions and the following
+//        disclaimer in the documentation and/or other materials provided with
+//        the distribution.
+//
+//      * Neither the name of Tom Cowland nor the names of
+//        any other contributors to this software may be used to endorse or
+//        promote products derived from this software without specific prior
+//        written permission.
+//
+//  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS
+//  IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO,
+//  THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR
+//  PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR
+//  CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+//  EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+//  PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+//  PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+//  LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+//  NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+//  SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+//
+//////////////////////////////////////////////////////////////////////////
+#include "boost/python.hpp"
+
+#include "CacheAlgoBinding.h"
+
+#include "GafferAstro/CacheAlgo.h"
+
+using namespace boost::python;
+using namespace GafferAstro;
+
+void GafferAstroModule::bindCacheAlgo()
+{
+	object module( borrowed( PyImport_AddModule( "GafferAstro.CacheAlgo" ) ) );
+	scope().attr( "CacheAlgo" ) = module;
+	scope moduleScope( module );
+
+	enum_<CacheAlgo::EvictionPolicy>( "EvictionPolicy" )
+		.value( "LRU", CacheAlgo::LRU )
+		.value( "CostWeighted", CacheAlgo::CostWeighted )
+	;
+
+	def( "statistics", &CacheAlgo::statistics );
+	def( "resetStatistics", &CacheAlgo::resetStatistics );
+	def( "setEvictionPolicy", &CacheAlgo::setEvictionPolicy );
+	def( "getEvictionPolicy", &CacheAlgo::getEvictionPolicy );
+}
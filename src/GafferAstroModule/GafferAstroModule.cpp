@@ -36,6 +36,7 @@
 
 #include "boost/python.hpp"
 
+#include "CacheAlgoBinding.h"
 #include "ColorAlgoBinding.h"
 #include "NodeBinding.h"
 
@@ -45,6 +46,7 @@ using namespace GafferAstroModule;
 BOOST_PYTHON_MODULE( _GafferAstro )
 {
 
+	bindCacheAlgo();
 	bindColorAlgo();
 	bindNodes();
 
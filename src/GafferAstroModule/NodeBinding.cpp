@@ -40,13 +40,18 @@
 #include "GafferAstro/CollectChannels.h"
 #include "GafferAstro/Colorise.h"
 #include "GafferAstro/FITSReader.h"
+#include "GafferAstro/FITSWriter.h"
 #include "GafferAstro/HueSaturation.h"
 #include "GafferAstro/XISFReader.h"
+#include "GafferAstro/XISFWriter.h"
+
+#include "GafferDispatchBindings/TaskNodeBinding.h"
 
 #include "GafferBindings/DependencyNodeBinding.h"
 
 using namespace boost::python;
 using namespace GafferBindings;
+using namespace GafferDispatchBindings;
 using namespace GafferAstro;
 
 void GafferAstroModule::bindNodes()
@@ -54,9 +59,16 @@ void GafferAstroModule::bindNodes()
 
 	DependencyNodeClass<AssembleChannels>();
 	DependencyNodeClass<Colorise>();
-	DependencyNodeClass<FITSReader>();
+	DependencyNodeClass<FITSReader>()
+		.def( "setOpenFilesLimit", &FITSReader::setOpenFilesLimit )
+		.staticmethod( "setOpenFilesLimit" )
+		.def( "getOpenFilesLimit", &FITSReader::getOpenFilesLimit )
+		.staticmethod( "getOpenFilesLimit" )
+	;
+	TaskNodeClass<FITSWriter>();
 	DependencyNodeClass<CollectChannels>();
 	DependencyNodeClass<HueSaturation>();
+	TaskNodeClass<XISFWriter>();
 
 	{
 		scope s = GafferBindings::DependencyNodeClass<XISFReader>()
@@ -64,6 +76,20 @@ void GafferAstroModule::bindNodes()
 			.staticmethod( "setOpenFilesLimit" )
 			.def( "getOpenFilesLimit", &XISFReader::getOpenFilesLimit )
 			.staticmethod( "getOpenFilesLimit" )
+			.def( "setMemoryLimit", &XISFReader::setMemoryLimit )
+			.staticmethod( "setMemoryLimit" )
+			.def( "getMemoryLimit", &XISFReader::getMemoryLimit )
+			.staticmethod( "getMemoryLimit" )
+			.def( "fileCacheStatistics", &XISFReader::fileCacheStatistics )
+			.staticmethod( "fileCacheStatistics" )
+			.def( "setPrefetchDepth", &XISFReader::setPrefetchDepth )
+			.staticmethod( "setPrefetchDepth" )
+			.def( "getPrefetchDepth", &XISFReader::getPrefetchDepth )
+			.staticmethod( "getPrefetchDepth" )
+			.def( "prefetchStatistics", &XISFReader::prefetchStatistics )
+			.staticmethod( "prefetchStatistics" )
+			.def( "resetPrefetchStatistics", &XISFReader::resetPrefetchStatistics )
+			.staticmethod( "resetPrefetchStatistics" )
 		;
 
 		enum_<XISFReader::MissingFrameMode>( "MissingFrameMode" )
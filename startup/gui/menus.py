@@ -51,7 +51,9 @@ nodeMenu.append( "/Image/Channels/AssembleChannels", GafferAstro.AssembleChannel
 nodeMenu.append( "/Image/Channels/CollectChannels", GafferAstro.CollectChannels )
 nodeMenu.append( "/Image/File/MultiMonoImageReader", GafferAstro.MultiMonoImageReader )
 nodeMenu.append( "/Image/File/FITSReader", GafferAstro.FITSReader )
+nodeMenu.append( "/Image/File/FITSWriter", GafferAstro.FITSWriter )
 nodeMenu.append( "/Image/File/XISFReader", GafferAstro.XISFReader )
+nodeMenu.append( "/Image/File/XISFWriter", GafferAstro.XISFWriter )
 nodeMenu.append( "/Image/Transform/Scale", GafferAstro.Scale )
 nodeMenu.append( "/Image/Transform/Trim", GafferAstro.Trim )
 